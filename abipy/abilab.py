@@ -13,65 +13,131 @@ import collections
 from monty.os.path import which
 from monty.termcolor import cprint
 
-#######################
-### Pymatgen import ###
-#######################
-# Tools for unit conversion
-import pymatgen.core.units as units
-FloatWithUnit = units.FloatWithUnit
-ArrayWithUnit = units.ArrayWithUnit
-
 ####################
 ### Abipy import ###
 ####################
-from abipy.flowtk import Pseudo, PseudoTable, Mrgscr, Mrgddb, Mrggkk, Flow, Work, TaskManager, AbinitBuild, flow_main
+# Only lightweight modules are imported here. The other objects exported by abilab are
+# imported on first access (see __getattr__) so that scripts calling `abiopen`
+# do not pay the price of importing the full abipy stack.
 from abipy.core.release import __version__, min_abinit_version
 from abipy.core.globals import enable_notebook, in_notebook, disable_notebook
-from abipy.core import restapi
-from abipy.core.structure import (Lattice, Structure, StructureModifier, dataframes_from_structures,
-  mp_match_structure, mp_search, cod_search)
-from abipy.core.mixins import CubeFile
-from abipy.core.func1d import Function1D
-from abipy.core.kpoints import set_atol_kdiff
-from abipy.abio.robots import Robot
-from abipy.abio.inputs import AbinitInput, MultiDataset, AnaddbInput, OpticInput
-from abipy.abio.abivars import AbinitInputFile
-from abipy.abio.outputs import AbinitLogFile, AbinitOutputFile, OutNcFile, AboRobot #, CubeFile
-from abipy.tools.printing import print_dataframe
-from abipy.tools.notebooks import print_source, print_doc
-from abipy.tools.plotting import get_ax_fig_plt, get_axarray_fig_plt, get_ax3d_fig_plt #, plot_array, ArrayPlotter
-from abipy.abio.factories import *
-from abipy.electrons.ebands import (ElectronBands, ElectronBandsPlotter, ElectronDos, ElectronDosPlotter,
-    dataframe_from_ebands)
-from abipy.electrons.gsr import GsrFile, GsrRobot
-from abipy.electrons.eskw import EskwFile
-from abipy.electrons.psps import PspsFile
-from abipy.electrons.ddk import DdkFile
-from abipy.electrons.gw import SigresFile, SigresRobot
-from abipy.electrons.bse import MdfFile, MdfRobot
-from abipy.electrons.scissors import ScissorsBuilder
-from abipy.electrons.scr import ScrFile
-from abipy.electrons.denpot import (DensityNcFile, VhartreeNcFile, VxcNcFile, VhxcNcFile, PotNcFile,
-    DensityFortranFile, Cut3dDenPotNcFile)
-from abipy.electrons.fatbands import FatBandsFile
-from abipy.electrons.optic import OpticNcFile, OpticRobot
-from abipy.electrons.fold2bloch import Fold2BlochNcfile
-from abipy.dfpt.phonons import (PhbstFile, PhbstRobot, PhononBands, PhononBandsPlotter, PhdosFile, PhononDosPlotter,
-    PhdosReader, phbands_gridplot)
-from abipy.dfpt.ddb import DdbFile, DdbRobot
-from abipy.dfpt.anaddbnc import AnaddbNcFile, AnaddbNcRobot
-from abipy.dfpt.gruneisen import GrunsNcFile
-#from abipy.dfpt.vsound import SoundVelocity
-from abipy.dynamics.hist import HistFile, HistRobot
-from abipy.waves import WfkFile
-from abipy.eph.a2f import A2fFile, A2fRobot
-from abipy.eph.sigeph import SigEPhFile, SigEPhRobot
-from abipy.eph.eph_plotter import EphPlotter
-from abipy.wannier90 import WoutFile, AbiwanFile, AbiwanRobot
-from abipy.electrons.lobster import CoxpFile, ICoxpFile, LobsterDoscarFile, LobsterInput, LobsterAnalyzer
-
-# Abinit Documentation.
-from abipy.abio.abivars_db import get_abinit_variables, abinit_help, docvar
+
+# Name of the object exported by abilab --> module in which the object is defined.
+_LAZY_IMPORTS = collections.OrderedDict()
+for _modname, _names in [
+    # Tools for unit conversion
+    ("pymatgen.core.units", "FloatWithUnit ArrayWithUnit"),
+    ("abipy.flowtk", "Pseudo PseudoTable Mrgscr Mrgddb Mrggkk Flow Work TaskManager AbinitBuild flow_main"),
+    ("abipy.core.structure", "Lattice Structure StructureModifier dataframes_from_structures "
+                             "mp_match_structure mp_search cod_search"),
+    ("abipy.core.mixins", "CubeFile"),
+    ("abipy.core.func1d", "Function1D"),
+    ("abipy.core.kpoints", "set_atol_kdiff"),
+    ("abipy.abio.robots", "Robot"),
+    ("abipy.abio.inputs", "AbinitInput MultiDataset AnaddbInput OpticInput"),
+    ("abipy.abio.abivars", "AbinitInputFile"),
+    ("abipy.abio.outputs", "AbinitLogFile AbinitOutputFile OutNcFile AboRobot"),
+    ("abipy.tools.printing", "print_dataframe"),
+    ("abipy.tools.notebooks", "print_source print_doc"),
+    ("abipy.tools.plotting", "get_ax_fig_plt get_axarray_fig_plt get_ax3d_fig_plt"),
+    ("abipy.electrons.ebands", "ElectronBands ElectronBandsPlotter ElectronDos ElectronDosPlotter "
+                               "dataframe_from_ebands"),
+    ("abipy.electrons.gsr", "GsrFile GsrRobot"),
+    ("abipy.electrons.eskw", "EskwFile"),
+    ("abipy.electrons.psps", "PspsFile"),
+    ("abipy.electrons.ddk", "DdkFile"),
+    ("abipy.electrons.gw", "SigresFile SigresRobot"),
+    ("abipy.electrons.bse", "MdfFile MdfRobot"),
+    ("abipy.electrons.scissors", "ScissorsBuilder"),
+    ("abipy.electrons.scr", "ScrFile"),
+    ("abipy.electrons.denpot", "DensityNcFile VhartreeNcFile VxcNcFile VhxcNcFile PotNcFile "
+                               "DensityFortranFile Cut3dDenPotNcFile"),
+    ("abipy.electrons.fatbands", "FatBandsFile"),
+    ("abipy.electrons.optic", "OpticNcFile OpticRobot"),
+    ("abipy.electrons.fold2bloch", "Fold2BlochNcfile"),
+    ("abipy.dfpt.phonons", "PhbstFile PhbstRobot PhononBands PhononBandsPlotter PhdosFile PhononDosPlotter "
+                           "PhdosReader phbands_gridplot"),
+    ("abipy.dfpt.ddb", "DdbFile DdbRobot"),
+    ("abipy.dfpt.anaddbnc", "AnaddbNcFile AnaddbNcRobot"),
+    ("abipy.dfpt.gruneisen", "GrunsNcFile"),
+    ("abipy.dynamics.hist", "HistFile HistRobot"),
+    ("abipy.waves", "WfkFile"),
+    ("abipy.eph.a2f", "A2fFile A2fRobot"),
+    ("abipy.eph.sigeph", "SigEPhFile SigEPhRobot"),
+    ("abipy.eph.eph_plotter", "EphPlotter"),
+    ("abipy.wannier90", "WoutFile AbiwanFile AbiwanRobot"),
+    ("abipy.electrons.lobster", "CoxpFile ICoxpFile LobsterDoscarFile LobsterInput LobsterAnalyzer"),
+    # Abinit Documentation.
+    ("abipy.abio.abivars_db", "get_abinit_variables abinit_help docvar"),
+    ]:
+    for _name in _names.split():
+        _LAZY_IMPORTS[_name] = _modname
+
+# Modules exported by abilab.
+_LAZY_MODULES = {"units": "pymatgen.core.units", "restapi": "abipy.core.restapi"}
+
+# Modules whose public names are re-exported by abilab (from module import *)
+_LAZY_STAR_MODULES = ["abipy.abio.factories"]
+
+
+def _import_lazy(name):
+    """Import the object ``name`` exported by abilab. Raise AttributeError if unknown name."""
+    from importlib import import_module
+    if name in _LAZY_IMPORTS:
+        obj = getattr(import_module(_LAZY_IMPORTS[name]), name)
+    elif name in _LAZY_MODULES:
+        obj = import_module(_LAZY_MODULES[name])
+    else:
+        for modname in _LAZY_STAR_MODULES:
+            mod = import_module(modname)
+            if name in mod.__all__:
+                obj = getattr(mod, name)
+                break
+        else:
+            raise AttributeError("module `%s` has no attribute `%s`" % (__name__, name))
+
+    # Cache the object in the module namespace so that __getattr__ is called only once.
+    globals()[name] = obj
+    return obj
+
+
+def _public_names():
+    """List with the names exported by ``from abipy.abilab import *``."""
+    from importlib import import_module
+    names = [k for k in globals() if not k.startswith("_")]
+    names += [k for k in list(_LAZY_IMPORTS) + list(_LAZY_MODULES) if k not in names]
+    for modname in _LAZY_STAR_MODULES:
+        names += [k for k in import_module(modname).__all__ if k not in names]
+    return names
+
+
+def __getattr__(name):
+    """Import objects on first access (PEP 562)."""
+    if name == "__all__":
+        return _public_names()
+    if name.startswith("__"):
+        raise AttributeError("module `%s` has no attribute `%s`" % (__name__, name))
+    return _import_lazy(name)
+
+
+def __dir__():
+    return sorted(set(_public_names()))
+
+
+if sys.version_info < (3, 7):
+    # Module-level __getattr__ is not available: import everything now.
+    for _name in list(_LAZY_IMPORTS) + list(_LAZY_MODULES):
+        _import_lazy(_name)
+    from abipy.abio.factories import *
+
+
+def _import_robot_classes():
+    """
+    Import all the Robot subclasses exported by abilab.
+    Used by ``Robot`` to find its subclasses via ``__subclasses__``.
+    """
+    for name in _LAZY_IMPORTS:
+        if name.endswith("Robot"): _import_lazy(name)
 
 
 def _straceback():
@@ -80,60 +146,71 @@ def _straceback():
     return traceback.format_exc()
 
 # Abinit text files. Use OrderedDict for nice output in show_abiopen_exc2class.
+# Classes are specified with "module:name" strings and imported on demand (see _resolve_class).
 ext2file = collections.OrderedDict([
-    (".abi", AbinitInputFile),
-    (".in", AbinitInputFile),
-    (".abo", AbinitOutputFile),
-    (".out", AbinitOutputFile),
-    (".log", AbinitLogFile),
-    (".cif", Structure),
-    ("POSCAR", Structure),
-    (".cssr", Structure),
-    (".cube", CubeFile),
-    ("anaddb.nc", AnaddbNcFile),
-    ("DEN", DensityFortranFile),
-    (".psp8", Pseudo),
-    (".pspnc", Pseudo),
-    (".fhi", Pseudo),
-    ("JTH.xml", Pseudo),
-    (".wout", WoutFile),
+    (".abi", "abipy.abio.abivars:AbinitInputFile"),
+    (".in", "abipy.abio.abivars:AbinitInputFile"),
+    (".abo", "abipy.abio.outputs:AbinitOutputFile"),
+    (".out", "abipy.abio.outputs:AbinitOutputFile"),
+    (".log", "abipy.abio.outputs:AbinitLogFile"),
+    (".cif", "abipy.core.structure:Structure"),
+    ("POSCAR", "abipy.core.structure:Structure"),
+    (".cssr", "abipy.core.structure:Structure"),
+    (".cube", "abipy.core.mixins:CubeFile"),
+    ("anaddb.nc", "abipy.dfpt.anaddbnc:AnaddbNcFile"),
+    ("DEN", "abipy.electrons.denpot:DensityFortranFile"),
+    (".psp8", "abipy.flowtk:Pseudo"),
+    (".pspnc", "abipy.flowtk:Pseudo"),
+    (".fhi", "abipy.flowtk:Pseudo"),
+    ("JTH.xml", "abipy.flowtk:Pseudo"),
+    (".wout", "abipy.wannier90:WoutFile"),
     # Lobster files.
-    ("COHPCAR.lobster", CoxpFile),
-    ("COOPCAR.lobster", CoxpFile),
-    ("ICOHPLIST.lobster", ICoxpFile),
-    ("DOSCAR.lobster", LobsterDoscarFile),
+    ("COHPCAR.lobster", "abipy.electrons.lobster:CoxpFile"),
+    ("COOPCAR.lobster", "abipy.electrons.lobster:CoxpFile"),
+    ("ICOHPLIST.lobster", "abipy.electrons.lobster:ICoxpFile"),
+    ("DOSCAR.lobster", "abipy.electrons.lobster:LobsterDoscarFile"),
 ])
 
 # Abinit files require a special treatment.
 abiext2ncfile = collections.OrderedDict([
-    ("GSR.nc", GsrFile),
-    ("ESKW.nc", EskwFile),
-    ("DEN.nc", DensityNcFile),
-    ("OUT.nc", OutNcFile),
-    ("DDK.nc", DdkFile),
-    ("VHA.nc", VhartreeNcFile),
-    ("VXC.nc", VxcNcFile),
-    ("VHXC.nc", VhxcNcFile),
-    ("POT.nc", PotNcFile),
-    ("WFK.nc", WfkFile),
-    ("HIST.nc", HistFile),
-    ("PSPS.nc", PspsFile),
-    ("DDB", DdbFile),
-    ("PHBST.nc", PhbstFile),
-    ("PHDOS.nc", PhdosFile),
-    ("SCR.nc", ScrFile),
-    ("SIGRES.nc", SigresFile),
-    ("GRUNS.nc", GrunsNcFile),
-    ("MDF.nc", MdfFile),
-    ("FATBANDS.nc", FatBandsFile),
-    ("FOLD2BLOCH.nc", Fold2BlochNcfile),
-    ("CUT3DDENPOT.nc", Cut3dDenPotNcFile),
-    ("OPTIC.nc", OpticNcFile),
-    ("A2F.nc", A2fFile),
-    ("SIGEPH.nc", SigEPhFile),
-    ("ABIWAN.nc", AbiwanFile),
+    ("GSR.nc", "abipy.electrons.gsr:GsrFile"),
+    ("ESKW.nc", "abipy.electrons.eskw:EskwFile"),
+    ("DEN.nc", "abipy.electrons.denpot:DensityNcFile"),
+    ("OUT.nc", "abipy.abio.outputs:OutNcFile"),
+    ("DDK.nc", "abipy.electrons.ddk:DdkFile"),
+    ("VHA.nc", "abipy.electrons.denpot:VhartreeNcFile"),
+    ("VXC.nc", "abipy.electrons.denpot:VxcNcFile"),
+    ("VHXC.nc", "abipy.electrons.denpot:VhxcNcFile"),
+    ("POT.nc", "abipy.electrons.denpot:PotNcFile"),
+    ("WFK.nc", "abipy.waves:WfkFile"),
+    ("HIST.nc", "abipy.dynamics.hist:HistFile"),
+    ("PSPS.nc", "abipy.electrons.psps:PspsFile"),
+    ("DDB", "abipy.dfpt.ddb:DdbFile"),
+    ("PHBST.nc", "abipy.dfpt.phonons:PhbstFile"),
+    ("PHDOS.nc", "abipy.dfpt.phonons:PhdosFile"),
+    ("SCR.nc", "abipy.electrons.scr:ScrFile"),
+    ("SIGRES.nc", "abipy.electrons.gw:SigresFile"),
+    ("GRUNS.nc", "abipy.dfpt.gruneisen:GrunsNcFile"),
+    ("MDF.nc", "abipy.electrons.bse:MdfFile"),
+    ("FATBANDS.nc", "abipy.electrons.fatbands:FatBandsFile"),
+    ("FOLD2BLOCH.nc", "abipy.electrons.fold2bloch:Fold2BlochNcfile"),
+    ("CUT3DDENPOT.nc", "abipy.electrons.denpot:Cut3dDenPotNcFile"),
+    ("OPTIC.nc", "abipy.electrons.optic:OpticNcFile"),
+    ("A2F.nc", "abipy.eph.a2f:A2fFile"),
+    ("SIGEPH.nc", "abipy.eph.sigeph:SigEPhFile"),
+    ("ABIWAN.nc", "abipy.wannier90:AbiwanFile"),
 ])
 
+# Name of the pickle file used to save the Flow (same as Flow.PICKLE_FNAME).
+_FLOW_PICKLE_FNAME = "__AbinitFlow__.pickle"
+
+
+def _resolve_class(spec):
+    """Import and return the class specified by the "module:name" string ``spec``."""
+    from importlib import import_module
+    modname, name = spec.split(":")
+    return getattr(import_module(modname), name)
+
 
 def abiopen_ext2class_table():
     """
@@ -143,31 +220,80 @@ def abiopen_ext2class_table():
     from tabulate import tabulate
     table = []
 
-    for ext, cls in chain(ext2file.items(), abiext2ncfile.items()):
-        table.append((ext, str(cls)))
+    for ext, spec in chain(ext2file.items(), abiext2ncfile.items()):
+        table.append((ext, spec.replace(":", ".")))
 
     return tabulate(table, headers=["Extension", "Class"])
 
 
-def abifile_subclass_from_filename(filename):
+# Extensions of the compressed files supported by abiopen.
+_COMPRESSION_EXTS = (".gz", ".bz2", ".z")
+
+# DecompressionCache used by abiopen. Initialized on first use.
+_DECOMPRESSION_CACHE = None
+
+
+def set_decompression_cache(cache_dir=None, max_nbytes=1024 ** 3):
     """
-    Returns the appropriate class associated to the given filename.
+    Set the directory and the maximum size of the cache used by ``abiopen`` to store
+    the decompressed copies of gzipped/bzipped files. Return :class:`abipy.tools.diskcache.DecompressionCache`.
+
+    Args:
+        cache_dir: Directory of the cache. If None, a temporary directory is created
+            and removed when the interpreter exits. Use e.g. ``~/.abinit/abipy/decompressed``
+            to reuse the decompressed files across sessions.
+        max_nbytes: Maximum size of the cache in bytes. Least recently used files are removed first.
+            Files used by objects that have not been closed are never removed.
+    """
+    from abipy.tools.diskcache import DecompressionCache
+    global _DECOMPRESSION_CACHE
+    if cache_dir is None:
+        import atexit
+        import shutil
+        import tempfile
+        cache_dir = tempfile.mkdtemp(prefix="abipy_decompressed_")
+        atexit.register(shutil.rmtree, cache_dir, True)
+    _DECOMPRESSION_CACHE = DecompressionCache(cache_dir, max_nbytes=max_nbytes)
+    return _DECOMPRESSION_CACHE
+
+
+def get_decompression_cache():
+    """Return the :class:`abipy.tools.diskcache.DecompressionCache` used by ``abiopen`` for gzipped/bzipped files."""
+    if _DECOMPRESSION_CACHE is None:
+        return set_decompression_cache()
+    return _DECOMPRESSION_CACHE
+
+
+def _abifile_spec_from_filename(filename):
     """
-    if os.path.basename(filename) == Flow.PICKLE_FNAME:
-        return Flow
+    Return the "module:name" string with the class associated to the given filename. None if not found.
+    """
+    if os.path.basename(filename) == _FLOW_PICKLE_FNAME:
+        return "abipy.flowtk:Flow"
 
-    from abipy.tools.text import rreplace
-    for ext, cls in ext2file.items():
-        # This to support gzipped files.
-        if filename.endswith(".gz"): filename = rreplace(filename, ".gz", "", occurrence=1)
-        if filename.endswith(ext): return cls
+    # This to support gzipped/bzipped files.
+    root, ext = os.path.splitext(filename)
+    if ext.lower() in _COMPRESSION_EXTS: filename = root
+    for ext, spec in ext2file.items():
+        if filename.endswith(ext): return spec
 
     ext = filename.split("_")[-1]
     try:
         return abiext2ncfile[ext]
     except KeyError:
-        for ext, cls in abiext2ncfile.items():
-            if filename.endswith(ext): return cls
+        for ext, spec in abiext2ncfile.items():
+            if filename.endswith(ext): return spec
+
+    return None
+
+
+def abifile_subclass_from_filename(filename):
+    """
+    Returns the appropriate class associated to the given filename.
+    """
+    spec = _abifile_spec_from_filename(filename)
+    if spec is not None:
+        return _resolve_class(spec)
 
     msg = ("No class has been registered for file:\n\t%s\n\nFile extensions supported:\n\n%s" %
         (filename, abiopen_ext2class_table()))
@@ -202,11 +328,8 @@ def isabifile(filepath):
     """
     Return True if `filepath` can be opened with ``abiopen``.
     """
-    try:
-        abifile_subclass_from_filename(filepath)
-        return True
-    except ValueError:
-        return False
+    # Don't import the class here.
+    return _abifile_spec_from_filename(filepath) is not None
 
 
 def abiopen(filepath):
@@ -214,25 +337,58 @@ def abiopen(filepath):
     Factory function that opens any file supported by abipy.
     File type is detected from the extension
 
+    Gzipped and bzipped files are decompressed in chunks (the content is never loaded in memory)
+    into the cache returned by :func:`get_decompression_cache` since the parsers need random access
+    to the file. The ``filepath`` of the object points to the decompressed copy that is kept in the cache
+    until the object is closed.
+
     Args:
         filepath: string with the filename.
     """
     # Handle ~ in filepath.
     filepath = os.path.expanduser(filepath)
 
-    # Handle zipped files by creating temporary file with correct extension.
-    root, ext = os.path.splitext(filepath)
-    if ext in (".bz2", ".gz", ".z"):
-        from monty.io import zopen
-        with zopen(filepath, "rt") as f:
-            import tempfile
-            _, tmp_path = tempfile.mkstemp(suffix=os.path.basename(root), text=True)
-            cprint("Creating temporary file: %s" % tmp_path, "yellow")
-            with open(tmp_path, "wt") as t:
-                t.write(f.read())
-            filepath = tmp_path
-
-    if os.path.basename(filepath) == "__AbinitFlow__.pickle":
+    # Handle zipped files: the decompressed copy (with the correct extension) is taken from the cache.
+    if os.path.splitext(filepath)[1].lower() in _COMPRESSION_EXTS:
+        cache = get_decompression_cache()
+        path = cache.decompress(filepath, pin=True)
+        try:
+            abifile = _abiopen(path)
+        except Exception:
+            cache.unpin(path)
+            raise
+        _unpin_on_close(abifile, cache, path)
+        return abifile
+
+    return _abiopen(filepath)
+
+
+def _unpin_on_close(abifile, cache, path):
+    """
+    Release the pin of the decompressed file ``path`` when ``abifile`` is closed.
+    Objects without a close method (e.g. flows) keep the pin until the end of the session.
+    """
+    close = getattr(abifile, "close", None)
+    if close is None: return
+
+    def close_and_unpin():
+        try:
+            return close()
+        finally:
+            if abifile.__dict__.pop("close", None) is not None:
+                cache.unpin(path)
+
+    try:
+        abifile.close = close_and_unpin
+    except AttributeError:
+        # Objects with __slots__
+        pass
+
+
+def _abiopen(filepath):
+    """Open ``filepath`` with the class associated to the extension."""
+    if os.path.basename(filepath) == _FLOW_PICKLE_FNAME:
+        from abipy.flowtk import Flow
         return Flow.pickle_load(filepath)
 
     # Handle old output files produced by Abinit.
@@ -240,10 +396,12 @@ def abiopen(filepath):
     outnum = re.compile(r".+\.out[\d]+")
     abonum = re.compile(r".+\.abo[\d]+")
     if outnum.match(filepath) or abonum.match(filepath):
+        from abipy.abio.outputs import AbinitOutputFile
         return AbinitOutputFile.from_file(filepath)
 
     if os.path.basename(filepath) == "log":
         # Assume Abinit log file.
+        from abipy.abio.outputs import AbinitLogFile
         return AbinitLogFile.from_file(filepath)
 
     cls = abifile_subclass_from_filename(filepath)
@@ -269,6 +427,7 @@ def display_structure(obj, **kwargs):
                           "See also https://github.com/gmatteo/nbjsmol.")
 
     # Cast to structure, get string with cif data and pass it to nbjsmol.
+    from abipy.core.structure import Structure
     structure = Structure.as_structure(obj)
     return nbjsmol_display(structure.to(fmt="cif"), ext=".cif", **kwargs)
 
@@ -314,6 +473,7 @@ def abicheck(verbose=0):
     err_lines = []
     app = err_lines.append
 
+    from abipy.flowtk import TaskManager, AbinitBuild
     try:
         manager = TaskManager.from_user_config()
     except Exception:
@@ -4,6 +4,10 @@ Objects used to extract and plot results from output files in text format.
 from __future__ import print_function, division, unicode_literals, absolute_import
 
 import os
+import io
+import mmap
+import bisect
+import collections
 import numpy as np
 import pandas as pd
 
@@ -92,6 +96,13 @@ class AbinitOutputFile(AbinitTextFile, NotebookWriter):
     """
     # TODO: Extract number of errors and warnings.
 
+    # Lines delimiting the sections with the input variables in the header/footer.
+    _OUTVARS_MAGIC_START = {
+        "header": " -outvars: echo values of preprocessed input variables --------",
+        "footer": " -outvars: echo values of variables after computation  --------",
+    }
+    _OUTVARS_MAGIC_STOP = "================================================================================"
+
     def __init__(self, filepath):
         super(AbinitOutputFile, self).__init__(filepath)
         self.debug_level = 0
@@ -99,67 +110,35 @@ class AbinitOutputFile(AbinitTextFile, NotebookWriter):
 
     def _parse(self):
         """
-        header: String with the input variables
-        footer: String with the output variables
-        datasets: Dictionary mapping dataset index to list of strings.
+        Scan the file once and record the byte offsets of the different sections:
+
+            header: String with the input variables
+            footer: String with the output variables
+            datasets: Mapping dataset index --> string with the dataset section.
+
+        Text is decoded only when the sections are accessed.
         """
         # Get code version and find magic line signaling that the output file is completed.
         self.version, self.run_completed = None, False
         self.overall_cputime, self.overall_walltime = 0.0, 0.0
         self.proc0_cputime, self.proc0_walltime = 0.0, 0.0
+        self._stream_pos = 0
 
-        with open(self.filepath) as fh:
-            for line in fh:
-                if self.version is None and line.startswith(".Version"):
-                    self.version = line.split()[1]
-
-                if line.startswith("- Proc."):
-                    #- Proc.   0 individual time (sec): cpu=         25.5  wall=         26.1
-                    tokens = line.split()
-                    self.proc0_walltime = float(tokens[-1])
-                    self.proc0_cputime = float(tokens[-3])
-
-                if line.startswith("+Overall time"):
-                    #+Overall time at end (sec) : cpu=         25.5  wall=         26.1
-                    tokens = line.split()
-                    self.overall_cputime = float(tokens[-3])
-                    self.overall_walltime = float(tokens[-1])
-
-                if " Calculation completed." in line:
-                    self.run_completed = True
-
-        # Parse header to get important dimensions and variables
-        self.header, self.footer, self.datasets = [], [], OrderedDict()
-        where = "in_header"
-
-        with open(self.filepath, "rt") as fh:
-            for line in fh:
-                if "== DATASET" in line:
-                    # Save dataset number
-                    # == DATASET  1 ==================================================================
-                    where = int(line.replace("=", "").split()[-1])
-                    assert where not in self.datasets
-                    self.datasets[where] = []
-                elif "== END DATASET(S) " in line:
-                    where = "in_footer"
-
-                if where == "in_header":
-                    self.header.append(line)
-                elif where == "in_footer":
-                    self.footer.append(line)
-                else:
-                    # dataset number --> lines
-                    self.datasets[where].append(line)
-
-        self.header = "".join(self.header)
-        if self.debug_level: print("header:\n", self.header)
-        # Output files produced in dryrun_mode contain the following line:
-        # abinit : before driver, prtvol=0, debugging mode => will skip driver
-        self.dryrun_mode = "debugging mode => will skip driver" in self.header
-        #print("dryrun_mode:", self.dryrun_mode)
+        self._filesize = os.path.getsize(self.filepath)
+        with io.open(self.filepath, "rb") as fh:
+            if self._filesize == 0:
+                # Empty files cannot be memory-mapped.
+                self._scan(b"")
+            else:
+                mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+                try:
+                    self._scan(mm)
+                finally:
+                    mm.close()
 
-        #if " jdtset " in self.header: raise NotImplementedError("jdtset is not supported")
-        #if " udtset " in self.header: raise NotImplementedError("udtset is not supported")
+        if self.debug_level:
+            print("header_range:", self._header_range, "footer_range:", self._footer_range)
+            print("dataset ranges:", self.datasets._ranges)
 
         self.ndtset = len(self.datasets)
         if not self.datasets:
@@ -167,14 +146,6 @@ class AbinitOutputFile(AbinitTextFile, NotebookWriter):
             self.ndtset = 1
             self.datasets[1] = "Empty dataset"
 
-        for key, data in self.datasets.items():
-            if self.debug_level: print("data")
-            self.datasets[key] = "".join(data)
-            if self.debug_level: print(self.datasets[key])
-
-        self.footer = "".join(self.footer)
-        if self.debug_level: print("footer:\n", self.footer)
-
         self.initial_vars_global, self.initial_vars_dataset = self._parse_variables("header")
         self.final_vars_global, self.final_vars_dataset = None, None
         if self.run_completed:
@@ -184,35 +155,126 @@ class AbinitOutputFile(AbinitTextFile, NotebookWriter):
             else:
                 self.final_vars_global, self.final_vars_dataset = self._parse_variables("footer")
 
+    def _scan(self, buf):
+        """
+        Single pass over ``buf`` (mmap or bytes) with the content of the file.
+        Only the lines with the info needed by the parser are decoded.
+        """
+        def line_at(pos):
+            """Return (start, stop, decoded line) for the line containing byte ``pos``."""
+            start = buf.rfind(b"\n", 0, pos) + 1
+            stop = buf.find(b"\n", pos)
+            if stop == -1: stop = len(buf)
+            return start, stop, _decode(buf[start:stop])
+
+        def find_linestart(token, last=False):
+            """Byte offset of the first (last) line starting with ``token``. -1 if not found."""
+            at_start = buf[:len(token)] == token
+            if at_start and not last: return 0
+            pos = buf.rfind(b"\n" + token) if last else buf.find(b"\n" + token)
+            if pos != -1: return pos + 1
+            return 0 if at_start else -1
+
+        pos = find_linestart(b".Version")
+        if pos != -1:
+            self.version = line_at(pos)[2].split()[1]
+
+        pos = find_linestart(b"- Proc.", last=True)
+        if pos != -1:
+            #- Proc.   0 individual time (sec): cpu=         25.5  wall=         26.1
+            tokens = line_at(pos)[2].split()
+            self.proc0_walltime = float(tokens[-1])
+            self.proc0_cputime = float(tokens[-3])
+
+        pos = find_linestart(b"+Overall time", last=True)
+        if pos != -1:
+            #+Overall time at end (sec) : cpu=         25.5  wall=         26.1
+            tokens = line_at(pos)[2].split()
+            self.overall_cputime = float(tokens[-3])
+            self.overall_walltime = float(tokens[-1])
+
+        self.run_completed = buf.find(b" Calculation completed.") != -1
+
+        # Find the boundaries of the dataset sections.
+        # == DATASET  1 ==================================================================
+        footer_start = buf.find(b"== END DATASET(S) ")
+        if footer_start != -1: footer_start = line_at(footer_start)[0]
+        datasets_stop = footer_start if footer_start != -1 else len(buf)
+
+        starts = OrderedDict()
+        pos = buf.find(b"== DATASET", 0, datasets_stop)
+        while pos != -1:
+            start, stop, line = line_at(pos)
+            dtindex = int(line.replace("=", "").split()[-1])
+            assert dtindex not in starts
+            starts[dtindex] = start
+            pos = buf.find(b"== DATASET", stop, datasets_stop)
+
+        ranges = OrderedDict()
+        bounds = list(starts.values()) + [datasets_stop]
+        for i, dtindex in enumerate(starts):
+            ranges[dtindex] = (bounds[i], bounds[i + 1])
+        self.datasets = _FileSections(self.filepath, ranges)
+
+        self._header_range = (0, bounds[0])
+        self._footer_range = (footer_start, len(buf)) if footer_start != -1 else (len(buf), len(buf))
+
+        # Output files produced in dryrun_mode contain the following line:
+        # abinit : before driver, prtvol=0, debugging mode => will skip driver
+        self.dryrun_mode = buf.find(b"debugging mode => will skip driver", *self._header_range) != -1
+        #print("dryrun_mode:", self.dryrun_mode)
+
+        # Find the outvars blocks in header and footer (range of the lines between magic_start and magic_stop).
+        self._outvars_ranges = {}
+        for what, (lo, hi) in (("header", self._header_range), ("footer", self._footer_range)):
+            start = buf.find(self._OUTVARS_MAGIC_START[what].encode("ascii"), lo, hi)
+            if start == -1: continue
+            start = line_at(start)[1] + 1
+            stop = buf.find(self._OUTVARS_MAGIC_STOP.encode("ascii"), start, hi)
+            if stop == -1: continue
+            self._outvars_ranges[what] = (start, line_at(stop)[0])
+
+        # Offsets of the lines starting the SCF cycles.
+        self._scf_offsets = {}
+        for magic in (GroundStateScfCycle.MAGIC, D2DEScfCycle.MAGIC):
+            offsets = []
+            token = magic.encode("ascii")
+            pos = buf.find(token)
+            while pos != -1:
+                start, stop, line = line_at(pos)
+                if line.strip().startswith(magic): offsets.append(start)
+                pos = buf.find(token, stop)
+            self._scf_offsets[magic] = offsets
+
+    def _read_range(self, start, stop):
+        """Read and decode the bytes in [start, stop)."""
+        if stop <= start: return ""
+        with io.open(self.filepath, "rb") as fh:
+            fh.seek(start)
+            return _decode(fh.read(stop - start))
+
+    @property
+    def header(self):
+        """String with the header of the output file (input variables)."""
+        return self._read_range(*self._header_range)
+
+    @property
+    def footer(self):
+        """String with the footer of the output file (output variables)."""
+        return self._read_range(*self._footer_range)
+
     def _parse_variables(self, what):
         vars_global = OrderedDict()
         vars_dataset = OrderedDict([(k, OrderedDict()) for k in self.datasets.keys()])
         #print("keys", vars_dataset.keys())
 
-        lines = getattr(self, what).splitlines()
-        if what == "header":
-            magic_start = " -outvars: echo values of preprocessed input variables --------"
-        elif what == "footer":
-            magic_start = " -outvars: echo values of variables after computation  --------"
-        else:
+        if what not in ("header", "footer"):
             raise ValueError("Invalid value for what: `%s`" % str(what))
 
-        magic_stop = "================================================================================"
-
         # Select relevant portion with variables.
-        for i, line in enumerate(lines):
-            if magic_start in line:
-                break
-        else:
-            raise ValueError("Cannot find magic_start line: %s" % magic_start)
-        lines = lines[i+1:]
-
-        for i, line in enumerate(lines):
-            if magic_stop in line:
-                break
-        else:
-            raise ValueError("Cannot find magic_stop line: %s" % magic_stop)
-        lines = lines[:i]
+        if what not in self._outvars_ranges:
+            raise ValueError("Cannot find magic_start/magic_stop lines: %s" % self._OUTVARS_MAGIC_START[what])
+        lines = self._read_range(*self._outvars_ranges[what]).splitlines()
 
         # Parse data. Assume format:
         #   timopt          -1
@@ -625,17 +687,58 @@ class AbinitOutputFile(AbinitTextFile, NotebookWriter):
 
             return dims_dataset, spginfo_dataset
 
+    def seek(self, offset, whence=0):
+        """
+        Set the file's current position, like stdio's fseek().
+        Also used to reset the position used by ``next_gs_scf_cycle`` and ``next_d2de_scf_cycle``.
+        """
+        if whence == 0:
+            self._stream_pos = offset
+        elif whence == 1:
+            self._stream_pos += offset
+        elif whence == 2:
+            self._stream_pos = self._filesize + offset
+        # Don't open the file if we are not iterating over lines.
+        if "_file" in self.__dict__:
+            super(AbinitOutputFile, self).seek(offset, whence=whence)
+
+    def _iter_lines_from(self, offset):
+        """
+        Generator yielding the lines of the file starting at byte ``offset``.
+        Update the position used to search for SCF cycles.
+        """
+        self._stream_pos = offset
+        with io.open(self.filepath, "rb") as fh:
+            fh.seek(offset)
+            for line in fh:
+                self._stream_pos += len(line)
+                yield _decode(line)
+
+    def _next_scf_cycle(self, cls):
+        """Return the next ``cls`` SCF cycle after the current position. None if not found."""
+        offsets = self._scf_offsets[cls.MAGIC]
+        i = bisect.bisect_left(offsets, self._stream_pos)
+        if i == len(offsets):
+            self._stream_pos = self._filesize
+            return None
+
+        lines = self._iter_lines_from(offsets[i])
+        try:
+            return cls.from_stream(lines)
+        finally:
+            lines.close()
+
     def next_gs_scf_cycle(self):
         """
         Return the next :class:`GroundStateScfCycle` in the file. None if not found.
         """
-        return GroundStateScfCycle.from_stream(self)
+        return self._next_scf_cycle(GroundStateScfCycle)
 
     def next_d2de_scf_cycle(self):
         """
         Return :class:`GroundStateScfCycle` with information on the GS iterations. None if not found.
         """
-        return D2DEScfCycle.from_stream(self)
+        return self._next_scf_cycle(D2DEScfCycle)
 
     def plot(self, tight_layout=True, with_timer=False, show=True):
         """
@@ -774,6 +877,44 @@ class AbinitOutputFile(AbinitTextFile, NotebookWriter):
         return self._write_nb_nbpath(nb, nbpath)
 
 
+def _decode(b):
+    """Decode bytes read from file. Use universal newlines as in text mode."""
+    return b.decode("utf-8", "replace").replace("\r\n", "\n").replace("\r", "\n")
+
+
+class _FileSections(collections.Mapping):
+    """
+    Ordered mapping section index --> string with the text of the section.
+    Sections are stored as byte ranges and decoded from file only when accessed.
+    """
+
+    def __init__(self, filepath, ranges):
+        self.filepath = filepath
+        self._ranges = OrderedDict(ranges)
+
+    def __len__(self):
+        return len(self._ranges)
+
+    def __iter__(self):
+        return iter(self._ranges)
+
+    def __getitem__(self, key):
+        rng = self._ranges[key]
+        if is_string(rng): return rng
+        start, stop = rng
+        with io.open(self.filepath, "rb") as fh:
+            fh.seek(start)
+            return _decode(fh.read(stop - start))
+
+    def __setitem__(self, key, value):
+        """Add section with string ``value`` or (start, stop) byte range."""
+        self._ranges[key] = value
+
+    def get_range(self, key):
+        """Return (start, stop) byte range of the section."""
+        return self._ranges[key]
+
+
 def validate_output_parser(abitests_dir=None, output_files=None):  # pragma: no cover
     """
     Validate/test Abinit output parser.
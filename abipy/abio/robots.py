@@ -10,6 +10,7 @@ import os
 import six
 import inspect
 import itertools
+import threading
 import numpy as np
 
 from collections import OrderedDict, deque
@@ -52,6 +53,8 @@ class Robot(NotebookWriter):
         """
         self._abifiles, self._do_close = OrderedDict(), OrderedDict()
         self._exceptions = deque(maxlen=100)
+        # Pool used to create lazy placeholders in add_file. None if files are opened immediately.
+        self._lazy_pool = None
 
         for label, abifile in args:
             self.add_file(label, abifile)
@@ -59,13 +62,16 @@ class Robot(NotebookWriter):
     @classmethod
     def get_supported_extensions(self):
         """List of strings with extensions supported by Robot subclasses."""
-        # This is needed to have all subclasses.
-        from abipy.abilab import Robot
+        # This is needed to have all subclasses (abilab imports the modules on demand).
+        from abipy import abilab
+        abilab._import_robot_classes()
         return sorted([cls.EXT for cls in Robot.__subclasses__()])
 
     @classmethod
     def class_for_ext(cls, ext):
         """Return the Robot subclass associated to the given extension."""
+        from abipy import abilab
+        abilab._import_robot_classes()
         for subcls in cls.__subclasses__():
             if subcls.EXT in (ext, ext.upper()):
                 return subcls
@@ -80,7 +86,7 @@ class Robot(NotebookWriter):
                          str(cls.get_supported_extensions()))
 
     @classmethod
-    def from_dir(cls, top, walk=True, abspath=False):
+    def from_dir(cls, top, walk=True, abspath=False, lazy=False, max_open=None):
         """
         This class method builds a robot by scanning all files located within directory `top`.
         This method should be invoked with a concrete robot class, for example:
@@ -91,29 +97,40 @@ class Robot(NotebookWriter):
             top (str): Root directory
 	    walk: if True, directories inside `top` are included as well.
             abspath: True if paths in index should be absolute. Default: Relative to `top`.
+            lazy: True if files should be opened on first access (see :meth:`from_files`).
+            max_open: Max number of files kept open at the same time in lazy mode. None for no limit.
         """
-        new = cls(*cls._open_files_in_dir(top, walk))
+        if lazy:
+            items = [(f, f) for f in cls._find_files_in_dir(top, walk)]
+            new = cls._from_lazy_items(items, max_open=max_open)
+        else:
+            new = cls(*cls._open_files_in_dir(top, walk))
         if not abspath: new.trim_paths(start=top)
         return new
 
     @classmethod
-    def from_dirs(cls, dirpaths, walk=True, abspath=False):
+    def from_dirs(cls, dirpaths, walk=True, abspath=False, lazy=False, max_open=None):
         """
         Similar to `from_dir` but accepts a list of directories instead of a single directory.
 
         Args:
 	    walk: if True, directories inside `top` are included as well.
             abspath: True if paths in index should be absolute. Default: Relative to `top`.
+            lazy, max_open: See :meth:`from_dir`.
         """
-        items = []
-        for top in list_strings(dirpaths):
-            items.extend(cls._open_files_in_dir(top, walk))
-        new = cls(*items)
+        if lazy:
+            items = [(f, f) for top in list_strings(dirpaths) for f in cls._find_files_in_dir(top, walk)]
+            new = cls._from_lazy_items(items, max_open=max_open)
+        else:
+            items = []
+            for top in list_strings(dirpaths):
+                items.extend(cls._open_files_in_dir(top, walk))
+            new = cls(*items)
         if not abspath: new.trim_paths(start=os.getcwd())
         return new
 
     @classmethod
-    def from_dir_glob(cls, pattern, walk=True, abspath=False):
+    def from_dir_glob(cls, pattern, walk=True, abspath=False, lazy=False, max_open=None):
         """
         This class method builds a robot by scanning all files located within the directories
         matching `pattern` as implemented by glob.glob
@@ -125,36 +142,61 @@ class Robot(NotebookWriter):
             pattern: Pattern string
 	    walk: if True, directories inside `top` are included as well.
             abspath: True if paths in index should be absolute. Default: Relative to getcwd().
+            lazy, max_open: See :meth:`from_dir`.
         """
         import glob
-        items = []
-        for top in filter(os.path.isdir, glob.iglob(pattern)):
-            items += cls._open_files_in_dir(top, walk=walk)
-        new = cls(*items)
+        tops = list(filter(os.path.isdir, glob.iglob(pattern)))
+        if lazy:
+            items = [(f, f) for top in tops for f in cls._find_files_in_dir(top, walk)]
+            new = cls._from_lazy_items(items, max_open=max_open)
+        else:
+            items = []
+            for top in tops:
+                items += cls._open_files_in_dir(top, walk=walk)
+            new = cls(*items)
         if not abspath: new.trim_paths(start=os.getcwd())
         return new
 
     @classmethod
-    def _open_files_in_dir(cls, top, walk):
-        """Open files in directory tree starting from `top`. Return list of Abinit files."""
+    def _find_files_in_dir(cls, top, walk):
+        """Return list with the absolute paths of the files handled by the robot in directory tree `top`."""
         if not os.path.isdir(top):
             raise ValueError("%s: no such directory" % str(top))
-        from abipy.abilab import abiopen
-        items = []
+        paths = []
         if walk:
             for dirpath, dirnames, filenames in os.walk(top):
                 filenames = [f for f in filenames if cls.class_handles_filename(f)]
-                for f in filenames:
-                    abifile = abiopen(os.path.join(dirpath, f))
-                    if abifile is not None: items.append((abifile.filepath, abifile))
+                paths.extend(os.path.abspath(os.path.join(dirpath, f)) for f in filenames)
         else:
             filenames = [f for f in os.listdir(top) if cls.class_handles_filename(f)]
-            for f in filenames:
-                abifile = abiopen(os.path.join(top, f))
-                if abifile is not None: items.append((abifile.filepath, abifile))
+            paths.extend(os.path.abspath(os.path.join(top, f)) for f in filenames)
+
+        return paths
+
+    @classmethod
+    def _open_files_in_dir(cls, top, walk):
+        """Open files in directory tree starting from `top`. Return list of Abinit files."""
+        from abipy.abilab import abiopen
+        items = []
+        for path in cls._find_files_in_dir(top, walk):
+            abifile = abiopen(path)
+            if abifile is not None: items.append((abifile.filepath, abifile))
 
         return items
 
+    @classmethod
+    def _from_lazy_items(cls, items, max_open=None):
+        """
+        Build a robot from a list of (label, filepath) tuples.
+        Files are added as lazy placeholders that are opened on first access.
+        """
+        new = cls()
+        new._lazy_pool = _OpenFilesPool(max_open=max_open)
+        for label, filepath in items:
+            new.add_file(label, filepath)
+
+        return new
+
     @classmethod
     def class_handles_filename(cls, filename):
         """True if robot class handles filename."""
@@ -166,17 +208,28 @@ class Robot(NotebookWriter):
                 filename.endswith("." + cls.EXT))  # This for .abo
 
     @classmethod
-    def from_files(cls, filenames, labels=None, abspath=False):
+    def from_files(cls, filenames, labels=None, abspath=False, lazy=False, max_open=None):
         """
         Build a Robot from a list of `filenames`.
         if labels is None, labels are automatically generated from absolute paths.
 
         Args:
             abspath: True if paths in index should be absolute. Default: Relative to `top`.
+            lazy: True if files should be opened on first attribute access.
+                Lazy placeholders forward all attribute lookups to the object returned by ``abiopen``.
+            max_open: Max number of files kept open at the same time in lazy mode. None for no limit.
+                The least recently used files are closed (and reopened when needed) when the limit is reached.
         """
         filenames = list_strings(filenames)
         from abipy.abilab import abiopen
         filenames = [f for f in filenames if cls.class_handles_filename(f)]
+
+        if lazy:
+            items = [(os.path.abspath(f) if labels is None else labels[i], f) for i, f in enumerate(filenames)]
+            new = cls._from_lazy_items(items, max_open=max_open)
+            if labels is None and not abspath: new.trim_paths(start=None)
+            return new
+
         items = []
         for i, f in enumerate(filenames):
             try:
@@ -195,7 +248,8 @@ class Robot(NotebookWriter):
         return new
 
     @classmethod
-    def from_flow(cls, flow, outdirs="all", nids=None, ext=None, task_class=None):
+    def from_flow(cls, flow, outdirs="all", nids=None, ext=None, task_class=None,
+                  lazy=False, max_open=None):
         """
         Build a robot from a |Flow| object.
 
@@ -211,6 +265,7 @@ class Robot(NotebookWriter):
             ext: File extension associated to the robot. Mainly used if method is invoked with the BaseClass
             task_class: Task class or string with the class name used to select the tasks in the flow.
                 None implies no filtering.
+            lazy, max_open: See :meth:`from_files`.
 
         Usage example:
 
@@ -227,6 +282,8 @@ class Robot(NotebookWriter):
             ``Robot`` subclass.
         """
         robot = cls() if ext is None else cls.class_for_ext(ext)()
+        if lazy:
+            robot._lazy_pool = _OpenFilesPool(max_open=max_open)
         all_opts = ("flow", "work", "task")
 
         if outdirs == "all":
@@ -319,8 +376,12 @@ class Robot(NotebookWriter):
                 True if the file should be added to the plotter.
         """
         if is_string(abifile):
-            from abipy.abilab import abiopen
-            abifile = abiopen(abifile)
+            if self._lazy_pool is not None:
+                # File will be opened on first access.
+                abifile = _LazyAbiFile(abifile, self._lazy_pool)
+            else:
+                from abipy.abilab import abiopen
+                abifile = abiopen(abifile)
             if filter_abifile is not None and not filter_abifile(abifile):
                 abifile.close()
                 return
@@ -333,6 +394,11 @@ class Robot(NotebookWriter):
 
         self._abifiles[label] = abifile
 
+    @property
+    def num_open_files(self):
+        """Number of files opened by the lazy placeholders of the robot."""
+        return sum(1 for f in self.abifiles if isinstance(f, _LazyAbiFile) and f.is_open)
+
     #def pop_filepath(self, filepath):
     #    """
     #    Remove the file with the given `filepath` and close it.
@@ -809,6 +875,94 @@ Expecting callable or attribute name or key in abifile.params""" % (type(hue), s
         import pandas as pd
         return pd.DataFrame(rows, index=row_names, columns=list(rows[0].keys()))
 
+    # Columns added to the results store to detect new or modified files.
+    _STORE_KEYS = ("filepath", "mtime", "size", "results_key")
+
+    def export_results(self, filepath, method="get_dataframe", refresh=True, **kwargs):
+        """
+        Export the |pandas-DataFrame| produced by ``method`` to a columnar store (Parquet or HDF5 file).
+        The format is detected from the extension of ``filepath``: ``.parquet`` or ``.pq`` for Parquet
+        (requires pyarrow or fastparquet), ``.h5``, ``.hdf`` or ``.hdf5`` for HDF5 (requires pytables).
+
+        Rows are keyed by the absolute path, the modification time and the size of the file.
+        The name of the method and its keyword arguments are saved in the "results_key" column.
+        If ``refresh`` and the store already exists, only new or modified files are processed
+        (lazy files are not opened if their rows are still valid), and rows of files
+        that are no longer in the robot are removed. All the rows are recomputed if the store
+        has been produced with a different method or different keyword arguments.
+
+        Args:
+            filepath: Path of the output file.
+            method: Name of the robot method returning a |pandas-DataFrame| with one or more rows per file
+                and the robot labels as index e.g. "get_dataframe", "get_params_dataframe".
+            refresh: False to recompute the results for all files.
+            kwargs: Keyword arguments passed to ``method``.
+
+        Return: |pandas-DataFrame| with the results for all files in the robot.
+        """
+        import pandas as pd
+        _store_format(filepath)
+        results_key = _results_key(method, kwargs)
+        old = read_results_store(filepath) if refresh and os.path.exists(filepath) else None
+        if old is not None and not (all(k in old for k in self._STORE_KEYS) and
+                                    (old["results_key"] == results_key).all()):
+            # Store produced by another method or with other arguments.
+            old = None
+
+        # Stat the files in the robot. Files are not opened here.
+        label_of, stats = OrderedDict(), OrderedDict()
+        for label, abifile in self.items():
+            label_of[abifile.filepath] = label
+            st = os.stat(abifile.filepath)
+            stats[abifile.filepath] = (st.st_mtime, st.st_size)
+
+        frames = []
+        if old is not None:
+            mask = np.array([p in stats and stats[p] == (mtime, size)
+                             for p, mtime, size in zip(old["filepath"], old["mtime"], old["size"])], dtype=bool)
+            if mask.any():
+                keep = old[mask].copy()
+                keep.index = [label_of[p] for p in keep["filepath"]]
+                frames.append(keep)
+
+        done = set(frames[0]["filepath"]) if frames else set()
+        todo = [abifile for abifile in self.abifiles if abifile.filepath not in done]
+        if todo:
+            # Call method with a temporary robot containing the new/modified files. Labels are absolute paths.
+            sub = self.__class__(*[(abifile.filepath, abifile) for abifile in todo])
+            new = getattr(sub, method)(**kwargs)
+            path_of = {}
+            for abifile in todo:
+                path_of[abifile.filepath] = abifile.filepath
+                try:
+                    path_of[os.path.relpath(abifile.filepath)] = abifile.filepath
+                except OSError:
+                    pass
+            try:
+                paths = [path_of[str(label)] for label in new.index]
+            except KeyError as exc:
+                raise ValueError("Cannot map the index of the DataFrame returned by `%s` to the files: %s" % (
+                    method, str(exc)))
+
+            new = new.copy()
+            new["filepath"] = paths
+            new["mtime"] = [stats[p][0] for p in paths]
+            new["size"] = [stats[p][1] for p in paths]
+            new["results_key"] = results_key
+            new.index = [label_of[p] for p in paths]
+            frames.append(new)
+
+        if not frames:
+            raise ValueError("Robot does not contain files.")
+
+        # Follow the order of the files in the robot.
+        df = pd.concat(frames) if len(frames) > 1 else frames[0]
+        order = {p: i for i, p in enumerate(stats)}
+        df = df.iloc[np.argsort([order[p] for p in df["filepath"]], kind="mergesort")]
+
+        write_results_store(df, filepath)
+        return df
+
     ##############################################
     # Helper functions to plot pandas dataframes #
     ##############################################
@@ -1119,4 +1273,155 @@ class HueGroup(object):
     #        try:
     #            return "%.3f" % self.hvalue
     #        except:
-    #            return str(self.hvalue)
\ No newline at end of file
+    #            return str(self.hvalue)
+
+
+def _store_format(filepath):
+    """Return the format of the results store from the extension of ``filepath``."""
+    ext = os.path.splitext(filepath)[1].lower()
+    if ext in (".parquet", ".pq"): return "parquet"
+    if ext in (".h5", ".hdf", ".hdf5"): return "hdf5"
+    raise ValueError("Cannot detect format of results store from extension: `%s`. "
+                     "Use .parquet or .h5" % str(filepath))
+
+
+def _results_key(method, kwargs):
+    """
+    String with the name of the method and the keyword arguments used to compute the results.
+    Arguments are sorted by name and represented with repr.
+    """
+    return "%s(%s)" % (method, ", ".join("%s=%r" % (k, kwargs[k]) for k in sorted(kwargs)))
+
+
+def write_results_store(df, filepath):
+    """
+    Write |pandas-DataFrame| ``df`` produced by :meth:`Robot.export_results` to ``filepath``
+    in Parquet or HDF5 format (see :meth:`Robot.export_results`).
+    """
+    fmt = _store_format(filepath)
+    if fmt == "parquet":
+        df.to_parquet(filepath)
+    else:
+        # Fixed format supports columns with arrays.
+        df.to_hdf(filepath, "robot_results", mode="w", format="fixed")
+
+
+def read_results_store(filepath):
+    """
+    Read the |pandas-DataFrame| saved by :meth:`Robot.export_results` in ``filepath``.
+    """
+    import pandas as pd
+    fmt = _store_format(filepath)
+    if fmt == "parquet":
+        return pd.read_parquet(filepath)
+    else:
+        return pd.read_hdf(filepath, "robot_results")
+
+
+class _OpenFilesPool(object):
+    """
+    Keeps track of the lazy placeholders with an open file.
+    The least recently used files are closed when the number of open files exceeds ``max_open``.
+    """
+
+    def __init__(self, max_open=None):
+        self.max_open = max_open
+        self._lru = OrderedDict()
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._lru)
+
+    def touch(self, proxy):
+        """Register access to ``proxy``. Close idle files if the limit is reached."""
+        evicted = []
+        with self._lock:
+            self._lru.pop(id(proxy), None)
+            self._lru[id(proxy)] = proxy
+            if self.max_open is not None:
+                while len(self._lru) > max(1, self.max_open):
+                    evicted.append(self._lru.popitem(last=False)[1])
+
+        for p in evicted:
+            p._release()
+
+    def discard(self, proxy):
+        """Remove ``proxy`` from the pool."""
+        with self._lock:
+            self._lru.pop(id(proxy), None)
+
+
+class _LazyAbiFile(object):
+    """
+    Placeholder for an abipy file that is opened with ``abiopen`` on first attribute access.
+    The file may be closed by the pool if too many files are open, in this case it is reopened
+    (and the cached data are recomputed) at the next access.
+    """
+
+    def __init__(self, filepath, pool):
+        self.filepath = os.path.abspath(filepath)
+        self._pool = pool
+        self._abifile = None
+        self._lock = threading.RLock()
+
+    def __getattr__(self, name):
+        # Invoked only if the attribute is not found in the placeholder.
+        if name.startswith("__") or name in ("filepath", "_pool", "_abifile", "_lock"):
+            raise AttributeError(name)
+        return getattr(self.open(), name)
+
+    def __repr__(self):
+        return "<%s, %s>" % (self.__class__.__name__, self.relpath)
+
+    def __str__(self):
+        return str(self.open())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def relpath(self):
+        """Relative path."""
+        try:
+            return os.path.relpath(self.filepath)
+        except OSError:
+            # current working directory may not be defined!
+            return self.filepath
+
+    @property
+    def is_open(self):
+        """True if the underlying file is open."""
+        return self._abifile is not None
+
+    def open(self):
+        """Open the file if needed. Return the abipy object."""
+        with self._lock:
+            if self._abifile is None:
+                from abipy.abilab import abiopen
+                abifile = abiopen(self.filepath)
+                if abifile is None:
+                    raise ValueError("abiopen cannot handle file: %s" % self.filepath)
+                self._abifile = abifile
+            abifile = self._abifile
+
+        self._pool.touch(self)
+        return abifile
+
+    def _release(self):
+        """Close the underlying file. The file will be reopened at the next access."""
+        with self._lock:
+            if self._abifile is not None:
+                try:
+                    self._abifile.close()
+                except Exception as exc:
+                    print("Exception while closing: ", self.filepath)
+                    print(exc)
+                self._abifile = None
+
+    def close(self):
+        """Close the file."""
+        self._release()
+        self._pool.discard(self)
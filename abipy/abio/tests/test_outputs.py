@@ -113,6 +113,31 @@ class AbinitOutputTest(AbipyTest):
              if self.has_nbformat():
                 abo.write_notebook(nbpath=self.get_tmpname(text=True))
 
+    def test_lazy_sections(self):
+        """Testing lazy dataset sections and SCF cycles in AbinitOutputFile."""
+        abo_path = abidata.ref_file("refs/gs_dfpt.abo")
+        with open(abo_path, "rt") as fh:
+            text = fh.read()
+
+        with AbinitOutputFile(abo_path) as abo:
+            assert list(abo.datasets.keys()) == [1, 2, 3]
+            assert abo.header + "".join(abo.datasets.values()) + abo.footer == text
+            assert abo.datasets[2].lstrip().startswith("== DATASET  2")
+            assert abo.footer.lstrip().startswith("== END DATASET(S)")
+            start, stop = abo.datasets.get_range(1)
+            assert stop == abo.datasets.get_range(2)[0]
+
+            # All the SCF cycles are found, seek(0) restarts the search.
+            for i in range(2):
+                abo.seek(0)
+                assert abo.next_gs_scf_cycle() is not None
+                assert abo.next_gs_scf_cycle() is None
+                ncycles = 0
+                abo.seek(0)
+                while abo.next_d2de_scf_cycle() is not None:
+                    ncycles += 1
+                assert ncycles == 3
+
     def test_dryrun_output(self):
         """Testing AbinitOutputFile with file produced in dry-run mode."""
         with abilab.abiopen(abidata.ref_file("refs/dryrun.abo")) as abo:
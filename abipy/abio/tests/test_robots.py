@@ -38,3 +38,106 @@ class RobotTest(AbipyTest):
 
         if self.has_nbformat():
             assert robot.get_baserobot_code_cells()
+
+    def test_lazy_opening(self):
+        """Testing robots with lazy placeholders."""
+        filepaths = [abidata.ref_file("si_scf_GSR.nc"), abidata.ref_file("si_nscf_GSR.nc")]
+        with abilab.GsrRobot.from_files(filepaths) as ref_robot:
+            ref_energies = [gsr.energy for gsr in ref_robot.abifiles]
+
+        # Lazy mode with at most one file open at the same time.
+        with abilab.GsrRobot.from_files(filepaths, lazy=True, max_open=1) as robot:
+            assert len(robot) == 2
+            assert robot.num_open_files == 0
+            repr(robot)
+            assert robot.num_open_files == 0
+            assert robot.abifiles[0].energy == ref_energies[0]
+            assert robot.num_open_files == 1
+            assert robot.abifiles[1].energy == ref_energies[1]
+            assert robot.num_open_files == 1
+            assert not robot.abifiles[0].is_open
+            # The file is reopened on access.
+            assert robot.abifiles[0].structure == ref_robot.abifiles[0].structure
+            assert robot.abifiles[0].is_open
+            assert robot.get_dataframe() is not None
+
+        assert robot.num_open_files == 0
+
+        # Lazy robot from directory.
+        top = os.path.dirname(filepaths[0])
+        with abilab.GsrRobot.from_dir(top, walk=False, lazy=True) as robot:
+            assert len(robot) == len([f for f in os.listdir(top) if f.endswith("_GSR.nc")])
+            assert robot.num_open_files == 0
+
+    def test_export_results(self):
+        """Testing export of robot results to columnar store with incremental refresh."""
+        exts = []
+        try:
+            import tables
+            exts.append(".h5")
+        except ImportError:
+            pass
+        try:
+            import pyarrow
+            exts.append(".parquet")
+        except ImportError:
+            pass
+        if not exts:
+            raise self.SkipTest("Neither pytables nor pyarrow are installed")
+
+        import shutil
+        tmpdir = self.mkdtemp()
+        filepaths = []
+        for basename in ("si_scf_GSR.nc", "si_nscf_GSR.nc"):
+            filepaths.append(os.path.join(tmpdir, basename))
+            shutil.copy(abidata.ref_file(basename), filepaths[-1])
+
+        for ext in exts:
+            store = os.path.join(tmpdir, "results" + ext)
+            with abilab.GsrRobot.from_files(filepaths[:1]) as robot:
+                df = robot.export_results(store, with_geo=False)
+                assert len(df) == 1
+                assert all(k in df for k in ("filepath", "mtime", "size", "results_key", "energy"))
+                assert df["results_key"].values[0] == "get_dataframe(with_geo=False)"
+
+            # Add a new file. The first file is not reopened.
+            with abilab.GsrRobot.from_files(filepaths, lazy=True) as robot:
+                df = robot.export_results(store, with_geo=False)
+                assert len(df) == 2
+                assert robot.num_open_files == 1
+                assert not robot.abifiles[0].is_open
+                assert list(df["filepath"]) == [os.path.abspath(p) for p in filepaths]
+
+            # Touch the second file: only this file is reopened.
+            st = os.stat(filepaths[1])
+            os.utime(filepaths[1], (st.st_atime, st.st_mtime + 10))
+            with abilab.GsrRobot.from_files(filepaths, lazy=True) as robot:
+                df = robot.export_results(store, with_geo=False)
+                assert len(df) == 2
+                assert not robot.abifiles[0].is_open and robot.abifiles[1].is_open
+                assert df["mtime"].values[1] == os.stat(filepaths[1]).st_mtime
+
+            # Remove first file from the robot.
+            with abilab.GsrRobot.from_files(filepaths[1:], lazy=True) as robot:
+                df = robot.export_results(store, with_geo=False)
+                assert len(df) == 1
+                assert robot.num_open_files == 0
+
+            from abipy.abio.robots import read_results_store
+            assert len(read_results_store(store)) == 1
+
+            # Different kwargs or method: all the rows are recomputed.
+            with abilab.GsrRobot.from_files(filepaths[1:], lazy=True) as robot:
+                df_geo = robot.export_results(store, with_geo=True)
+                assert robot.num_open_files == 1
+                assert set(df_geo.columns) > set(df.columns)
+                assert df_geo["results_key"].values[0] == "get_dataframe(with_geo=True)"
+                df_nogeo = robot.export_results(store, with_geo=False)
+                assert set(df_nogeo.columns) == set(df.columns)
+                df_params = robot.export_results(store, method="get_params_dataframe")
+                assert set(df_params.columns) != set(df.columns)
+                assert df_params["results_key"].values[0] == "get_params_dataframe()"
+
+        with self.assertRaises(ValueError):
+            with abilab.GsrRobot.from_files(filepaths) as robot:
+                robot.export_results(os.path.join(tmpdir, "results.foo"))
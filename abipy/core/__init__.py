@@ -1,7 +1,43 @@
 """Core objects."""
-from .kpoints import *
-from .structure import *
-from .symmetries import *
-from .gsphere import *
-from .mesh3d import *
-from .fields import *
+import sys
+
+if sys.version_info < (3, 7):
+    from .kpoints import *
+    from .structure import *
+    from .symmetries import *
+    from .gsphere import *
+    from .mesh3d import *
+    from .fields import *
+
+else:
+    # The public names of these modules are imported on first access (PEP 562)
+    # so that lightweight modules such as abipy.core.release can be imported quickly.
+    _STAR_MODULES = ["kpoints", "structure", "symmetries", "gsphere", "mesh3d", "fields"]
+
+    def _public_names():
+        from importlib import import_module
+        names = []
+        for modname in _STAR_MODULES:
+            names.extend(import_module("." + modname, __name__).__all__)
+        return names
+
+    def __getattr__(name):
+        import os
+        if name == "__all__":
+            return _public_names()
+        if name.startswith("__") or os.path.exists(os.path.join(os.path.dirname(__file__), name + ".py")):
+            # Submodules are handled by the import system.
+            raise AttributeError("module `%s` has no attribute `%s`" % (__name__, name))
+
+        from importlib import import_module
+        for modname in _STAR_MODULES:
+            mod = import_module("." + modname, __name__)
+            if name in mod.__all__:
+                obj = getattr(mod, name)
+                globals()[name] = obj
+                return obj
+
+        raise AttributeError("module `%s` has no attribute `%s`" % (__name__, name))
+
+    def __dir__():
+        return sorted(set(list(globals()) + _public_names()))
@@ -10,6 +10,7 @@ import os
 from collections import OrderedDict
 from monty.collections import AttrDict
 from monty.functools import lazy_property
+from monty.io import zopen
 from monty.string import is_string
 from monty.termcolor import cprint
 from monty.inspect import all_subclasses
@@ -20,9 +21,9 @@ from abipy.core.structure import Structure
 from abipy.core.mesh3d import Mesh3D
 from abipy.core.func1d import Function1D
 from abipy.core.mixins import Has_Structure
-from abipy.tools import transpose_last3dims, duck
+from abipy.tools import transpose_last3dims
 from abipy.tools.plotting import add_fig_kwargs, get_ax_fig_plt, get_axarray_fig_plt
-from abipy.iotools import Visualizer, xsf, ETSF_Reader, cube
+from abipy.iotools import Visualizer, xsf, ETSF_Reader, cube, chgcar as iochgcar
 
 
 __all__ = [
@@ -327,6 +328,46 @@ class _Field(Has_Structure):
         else:
             raise visu.Error("Don't know how to export data for visualizer %s" % appname)
 
+    def to_npz(self, filepath):
+        """
+        Save the field in numpy npz format (binary, lossless). Read it back with ``from_npz``.
+        """
+        import json
+        np.savez_compressed(filepath, datar=self.datar,
+                            dims=np.array([self.nspinor, self.nsppol, self.nspden]),
+                            structure_json=np.array(json.dumps(self.structure.as_dict())),
+                            field_cls=np.array(self.__class__.__name__))
+
+    @classmethod
+    def from_npz(cls, filepath):
+        """Build the field from a file produced by ``to_npz``."""
+        import json
+        with np.load(filepath) as data:
+            nspinor, nsppol, nspden = [int(n) for n in data["dims"]]
+            structure = Structure.from_dict(json.loads(str(data["structure_json"])))
+            return cls(nspinor=nspinor, nsppol=nsppol, nspden=nspden, datar=data["datar"],
+                       structure=structure, iorder="c")
+
+    def to_hdf5(self, filepath):
+        """
+        Save the field in HDF5 format (binary, lossless). Requires h5py. Read it back with ``from_hdf5``.
+        """
+        import json, h5py
+        with h5py.File(filepath, "w") as fh:
+            fh.create_dataset("datar", data=self.datar, compression="gzip")
+            fh.attrs["nspinor"], fh.attrs["nsppol"], fh.attrs["nspden"] = self.nspinor, self.nsppol, self.nspden
+            fh.attrs["structure_json"] = json.dumps(self.structure.as_dict())
+            fh.attrs["field_cls"] = self.__class__.__name__
+
+    @classmethod
+    def from_hdf5(cls, filepath):
+        """Build the field from a file produced by ``to_hdf5``."""
+        import json, h5py
+        with h5py.File(filepath, "r") as fh:
+            structure = Structure.from_dict(json.loads(fh.attrs["structure_json"]))
+            return cls(nspinor=int(fh.attrs["nspinor"]), nsppol=int(fh.attrs["nsppol"]),
+                       nspden=int(fh.attrs["nspden"]), datar=fh["datar"][...], structure=structure, iorder="c")
+
     def get_interpolator(self):
         """
         Return an interpolator object that interpolates periodic functions in real space.
@@ -452,7 +493,7 @@ class _Field(Has_Structure):
 
         return fig
 
-    def integrate_in_spheres(self, rcut_symbol=None, out=False):
+    def integrate_in_spheres(self, rcut_symbol=None, out=False, max_nbytes=2**27):
         """
         Integrate field (e.g. density/potential) inside atom-centered spheres of given radius.
         Can be used to get a rough estimate of the charge/magnetization associated to a given site.
@@ -460,10 +501,14 @@ class _Field(Has_Structure):
         Args:
             rcut_symbol: dictionary mapping chemical element to the radius of the sphere in Angstrom.
                 or number if each element should have the same sphere. If None, covalent radii are used.
+                Radii can also be given as a list of numbers (e.g. for convergence studies)
+                in which case all the radii are computed in a single pass.
             out: Set it to False to disable output of final results
+            max_nbytes: Max memory in bytes used for the [natom, nG] array with the structure factors.
 
         Return:
             |pandas-DataFrame| with computed results (integrated density, integrated magnetization, ...)
+            One row for each (atom, radius).
         """
         # Initialize rcut_symbol map.
         if rcut_symbol is None:
@@ -471,49 +516,66 @@ class _Field(Has_Structure):
             rcut_symbol = {s: CovalentRadius.radius[s] for s in self.structure.symbol_set}
             #rcut_symbol = {s: 2 for s in self.structure.symbol_set}
             #rcut_symbol = {s: 1 for s in self.structure.symbol_set}
-        elif duck.is_number_like(rcut_symbol):
-            rcut_symbol = {s: float(rcut_symbol) for s in self.structure.symbol_set}
+        elif not isinstance(rcut_symbol, collections.Mapping):
+            rcut_symbol = {s: rcut_symbol for s in self.structure.symbol_set}
+        radii_symbol = {s: [float(r) for r in np.ravel(rcut_symbol[s])] for s in self.structure.symbol_set}
 
-        # Spline bessel integrals.
+        # Spline bessel integrals, one for each radius (splines are cached in the bessel module).
         datag = np.reshape(self.datag, (self.nspden, -1))
-        #print("datag[0]", datag[0, 0] * self.structure.volume, datag.shape)
         gvecs = self.mesh.gvecs
         gmods = self.mesh.gmods
         gmax = gmods.max()
         from abipy.tools import bessel
-        splines = {s: bessel.spline_int_jlqr(0, gmax, rcut_symbol[s]) for s in self.structure.symbol_set}
+        all_radii = sorted(set(r for radii in radii_symbol.values() for r in radii))
+        frac_coords = np.reshape([site.frac_coords for site in self.structure], (-1, 3))
+        symbols = [site.specie.symbol for site in self.structure]
+        atom_inds = {rcut: np.array([i for i, s in enumerate(symbols) if rcut in radii_symbol[s]], dtype=np.int)
+                     for rcut in all_radii}
+        radial = {rcut: bessel.spline_int_jlqr(0, gmax, rcut)(gmods) for rcut in all_radii}
 
         # 4 pi sum_G n(G) e^{iGRo} int_0^{rcut} r**2 j_l(Gr} dr
+        # The structure factors are computed for all atoms at once in blocks of G-vectors.
+        natom, ng = len(frac_coords), len(gvecs)
+        results = {rcut: np.zeros((len(atom_inds[rcut]), self.nspden), dtype=np.complex) for rcut in all_radii}
+        chunksize = max(1, int(max_nbytes // (16 * natom)))
+        for start in range(0, ng, chunksize):
+            gslice = slice(start, min(start + chunksize, ng))
+            phases = np.exp(2j * np.pi * np.dot(frac_coords, gvecs[gslice].T))
+            for rcut in all_radii:
+                fg = datag[:, gslice] * radial[rcut][gslice]
+                results[rcut] += np.dot(phases[atom_inds[rcut]], fg.T)
+
         rows = []
-        for iatom, site in enumerate(self.structure):
-            symbol = site.specie.symbol
-            phases = np.exp(2j * np.pi * np.dot(gvecs, site.frac_coords))
-            fg = datag * phases * splines[symbol](gmods)
-            res_nspden = np.sum(fg, axis=1)  * (4 * np.pi)
-            #print("result:", res_nspden, res_nspden.shape, (datag * fg).shape)
-
-            # Compute densities and magnetization.
-            ntot, nup, ndown, mx, my, mz = 6 * (None,)
-            if self.nspinor == 1:
+        for rcut in all_radii:
+            for res_nspden, iatom in zip(results[rcut] * (4 * np.pi), atom_inds[rcut]):
+                # Compute densities and magnetization.
                 res_nspden = res_nspden.real
-                if self.nspden == 1:
+                ntot, nup, ndown, mx, my, mz = 6 * (None,)
+                if self.nspinor == 1:
+                    if self.nspden == 1:
+                        ntot = res_nspden[0]
+                    elif self.nspden == 2:
+                        nup, ndown = res_nspden
+                        ntot, mz = nup + ndown, nup - ndown
+
+                elif self.nspinor == 2:
+                    # Non-collinear case: (n, mx, my, mz) components.
                     ntot = res_nspden[0]
-                elif self.nspden == 2:
-                    nup, ndown = res_nspden
-                    ntot, mz = nup + ndown, nup - ndown
-
-            elif self.nspinor == 2:
-                raise NotImplementedError()
-                ntot, mx, my, mz = scalvec_from_spinmat(res_nspden)
-                nup, ndown = 0.5 * (ntot + mz), 0.5 * (ntot - mz)
-
-            # Fill DataFrame row.
-            rows.append(OrderedDict([
-                ("iatom", iatom), ("symbol", symbol),
-                ("ntot", ntot), ("nup", nup), ("ndown", ndown),
-                ("mx", mx), ("my", my), ("mz", mz),
-                ("rsph_ang", rcut_symbol[symbol]), ("frac_coords", site.frac_coords),
-            ]))
+                    if self.nspden == 4:
+                        mx, my, mz = res_nspden[1:]
+                        nup, ndown = 0.5 * (ntot + mz), 0.5 * (ntot - mz)
+
+                # Fill DataFrame row.
+                site = self.structure[iatom]
+                rows.append(OrderedDict([
+                    ("iatom", iatom), ("symbol", symbols[iatom]),
+                    ("ntot", ntot), ("nup", nup), ("ndown", ndown),
+                    ("mx", mx), ("my", my), ("mz", mz),
+                    ("rsph_ang", rcut), ("frac_coords", site.frac_coords),
+                ]))
+
+        # Sort rows by atom index and radius.
+        rows = sorted(rows, key=lambda row: (row["iatom"], row["rsph_ang"]))
 
         import pandas as pd
         df = pd.DataFrame(rows, columns=list(rows[0].keys()))
@@ -577,7 +639,7 @@ class Density(_DensityField):
 
     @classmethod
     def ae_core_density_on_mesh(cls, valence_density, structure, rhoc, maxr=2.0, nelec=None, tol=0.01,
-                                method='get_sites_in_sphere', small_dist_mesh=(8, 8, 8), small_dist_factor=1.5):
+                                method='mesh3d_dist_gridpoints', small_dist_mesh=(8, 8, 8), small_dist_factor=1.5):
         """
         Initialize the all electron core density of the structure from the pseudopotentials *rhoc* files.
         For points close to the atoms, the value at the grid point would be defined as the average on a finer grid
@@ -595,9 +657,9 @@ class Density(_DensityField):
                 to the value specified in nelec. Default 0.01 (1% error).
             method: different methods to perform the calculation:
 
+                * mesh3d_dist_gridpoints: based on ``Mesh3D.get_gridpoints_in_spheres``. Splines are evaluated
+                    on all the (grid point, site) pairs at once. Much faster than ``get_sites_in_sphere``.
                 * get_sites_in_sphere: based on ``Structure.get_sites_in_sphere``.
-                * mesh3d_dist_gridpoints: based on ``Mesh3D.dist_gridpoints_in_spheres``. Generally faster than
-                    ``get_sites_in_sphere``, but tests can be made for specific cases.
                 * get_sites_in_sphere_legacy: as get_sites_in_sphere, but part of the procedure is not vectorized
                 * mesh3d_dist_gridpoints_legacy: as mesh3d_dist_gridpoints, but part of the procedure is not vectorized
 
@@ -704,29 +766,40 @@ class Density(_DensityField):
                         total /= (nnx*nny*nnz)
                         core_den[0, igp_uc[0], igp_uc[1], igp_uc[2]] += total
         elif method == 'mesh3d_dist_gridpoints':
-            import time
-            site_coords = [site.coords for site in structure]
-            start = time.time()
-            dist_gridpoints_sites = valence_density.mesh.dist_gridpoints_in_spheres(points=site_coords, radius=maxr)
+            mesh = valence_density.mesh
+            site_coords = np.array([site.coords for site in structure])
+            res = mesh.get_gridpoints_in_spheres(points=site_coords, radius=maxr)
             nnx, nny, nnz = small_dist_mesh
-            meshgrid = np.meshgrid(np.linspace(-0.5, 0.5, nnx, endpoint=False)+0.5/nnx,
-                                            np.linspace(-0.5, 0.5, nny, endpoint=False) + 0.5/nny,
-                                            np.linspace(-0.5, 0.5, nnz, endpoint=False) + 0.5/nnz)
+            meshgrid = np.meshgrid(np.linspace(-0.5, 0.5, nnx, endpoint=False) + 0.5 / nnx,
+                                   np.linspace(-0.5, 0.5, nny, endpoint=False) + 0.5 / nny,
+                                   np.linspace(-0.5, 0.5, nnz, endpoint=False) + 0.5 / nnz)
             coords_grid = np.outer(meshgrid[0], dvx) + np.outer(meshgrid[1], dvy) + np.outer(meshgrid[2], dvz)
-            for isite, dist_gridpoints_site in enumerate(dist_gridpoints_sites):
-                for igp_uc, dist, igp in dist_gridpoints_site:
-                    if dist > smallradius:
-                        core_den[0, igp_uc[0], igp_uc[1], igp_uc[2]] += rhoc_atom_splines[isite](dist)
-                    # For small distances, integrate over the small volume dv around the point as the core density
-                    # is extremely high close to the atom
-                    else:
-                        total = 0.0
-                        rpoint = valence_density.mesh.rpoint(ix=igp[0], iy=igp[1], iz=igp[2])
-                        grid_loc = rpoint + coords_grid
-                        distances = np.linalg.norm(grid_loc-site_coords[isite], axis=1)
-                        total = np.sum(rhoc_atom_splines[isite](distances))
-                        total /= (nnx*nny*nnz)
-                        core_den[0, igp_uc[0], igp_uc[1], igp_uc[2]] += total
+
+            values = np.empty(len(res.dists))
+            far = res.dists > smallradius
+            near = ~far
+            # Vectors from the sites to the (unwrapped) grid points close to the atoms.
+            near_vecs = np.dot(res.images[near], [dvx, dvy, dvz]) - site_coords[res.point_inds[near]]
+
+            # Group the sites sharing the same spline so that each spline is evaluated once on all its points.
+            site2spline = {}
+            for isite, r in enumerate(rhoc):
+                site2spline.setdefault(id(r), []).append(isite)
+
+            for isites in site2spline.values():
+                spline = rhoc_atom_splines[isites[0]]
+                in_group = np.in1d(res.point_inds, isites)
+                mask = in_group & far
+                values[mask] = spline(res.dists[mask])
+
+                # For small distances, integrate over the small volume dv around the point as the core density
+                # is extremely high close to the atom
+                vecs = near_vecs[in_group[near]]
+                if len(vecs):
+                    distances = np.linalg.norm(vecs[:, None, :] + coords_grid[None, :, :], axis=-1)
+                    values[in_group & near] = np.reshape(spline(distances.ravel()), distances.shape).mean(axis=1)
+
+            core_den[0] += np.reshape(np.bincount(res.grid_inds, weights=values, minlength=mesh.size), mesh.shape)
 
         elif method == 'get_sites_in_sphere':
             nnx, nny, nnz = small_dist_mesh
@@ -893,18 +966,19 @@ class Density(_DensityField):
     def export_to_cube(self, filename, spin='total'):
         """
         Export real space density to CUBE file ``filename``.
+        A compressed file is produced if filename ends with .gz or .bz2
         """
         if spin != 'total':
             raise ValueError('Argument "spin" should be "total"')
 
-        with open(filename, mode="wt") as fh:
+        with zopen(filename, mode="wt") as fh:
             cube.cube_write_structure_mesh(file=fh, structure=self.structure, mesh=self.mesh)
             cube.cube_write_data(file=fh, data=self.total_rhor, mesh=self.mesh)
 
     @classmethod
     def from_cube(cls, filename, spin='total'):
         """
-        Read real space density to CUBE file ``filename``.
+        Read real space density to CUBE file ``filename``. Accepts compressed files (.gz, .bz2).
         Return new :class:`Density` instance.
         """
         if spin != 'total':
@@ -922,6 +996,7 @@ class Density(_DensityField):
         """
         Convert a :class:`Density` object into a ``Chgar`` object.
         If ``filename`` is not None, density is written to this file in Chgar format
+        (compressed if filename ends with .gz or .bz2).
 
         Return:
             :class:`Chgcar` instance.
@@ -948,11 +1023,10 @@ class Density(_DensityField):
         elif self.nspinor == 2:
             raise NotImplementedError("pymatgen Chgcar does not implement nspinor == 2")
 
-        chgcar = Chgcar(Poscar(self.structure), data_dict)
         if filename is not None:
-            chgcar.write_file(filename)
+            iochgcar.chgcar_write(filename, self.structure, data_dict)
 
-        return chgcar
+        return Chgcar(Poscar(self.structure), data_dict)
 
     @classmethod
     def from_chgcar_poscar(cls, chgcar, poscar):
@@ -960,23 +1034,29 @@ class Density(_DensityField):
         Build a :class`Density` object from Vasp data.
 
         Args:
-            chgcar: Either string with the name of a CHGCAR file or :class:`Chgcar` pymatgen object.
+            chgcar: Either string with the name of a CHGCAR file (possibly compressed) or :class:`Chgcar` pymatgen object.
             poscar: Either string with the name of a POSCAR file or :class:`Poscar` pymatgen object.
 
         .. warning:
 
             The present version does not support non-collinear calculations.
-            The Chgcar object provided by pymatgen does not provided enough information
-            to understand if the calculation is collinear or no.
+            NotImplementedError is raised if the CHGCAR file contains the four data blocks
+            (total, diff_x, diff_y, diff_z) written by VASP in the non-collinear case.
         """
         if is_string(chgcar):
-            chgcar = Chgcar.from_file(chgcar)
+            # Much faster than Chgcar.from_file for large meshes.
+            _, chgcar_data = iochgcar.chgcar_read(chgcar)
+        else:
+            chgcar_data = chgcar.data
         if is_string(poscar):
             poscar = Poscar.from_file(poscar, check_for_POTCAR=False, read_velocities=False)
 
-        nx, ny, nz = chgcar.dim
+        if "diff_x" in chgcar_data:
+            raise NotImplementedError("Non-collinear CHGCAR files are not supported")
+
+        nx, ny, nz = chgcar_data["total"].shape
         nspinor = 1
-        nsppol = 2 if chgcar.is_spin_polarized else 1
+        nsppol = 2 if "diff" in chgcar_data else 1
         nspden = 2 if nsppol == 2 else 1
 
         # Convert pymatgen chgcar data --> abipy representation.
@@ -984,9 +1064,9 @@ class Density(_DensityField):
 
         if nspinor == 1:
             if nsppol == 1:
-                abipy_datar = chgcar.data["total"]
+                abipy_datar = chgcar_data["total"].copy()
             elif nsppol == 2:
-                total, diff = chgcar.data["total"], chgcar.data["diff"]
+                total, diff = chgcar_data["total"], chgcar_data["diff"]
                 abipy_datar[0] = 0.5 * (total + diff)
                 abipy_datar[1] = 0.5 * (total - diff)
             else:
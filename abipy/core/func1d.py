@@ -6,9 +6,12 @@ for performing common tasks such as algebraic operations, integrations, differen
 from __future__ import print_function, division, unicode_literals, absolute_import
 
 import six
+import hashlib
 import itertools
 import numpy as np
 
+from collections import OrderedDict
+
 from six.moves import cStringIO
 from monty.functools import lazy_property
 from abipy.tools.plotting import add_fig_kwargs, get_ax_fig_plt, data_from_cplx_mode
@@ -16,9 +19,126 @@ from abipy.tools.derivatives import finite_diff
 
 __all__ = [
     "Function1D",
+    "kk_real_from_imag",
+    "kk_imag_from_real",
 ]
 
 
+# Cache with the Kramers-Kronig kernels: sha1 of mesh --> (mesh, kernel_re, kernel_im)
+_KK_KERNELS = OrderedDict()
+_KK_MAXSIZE = 4
+
+# Kernels are stored (and cached) only for meshes with at most _KK_MAX_CACHED_NPTS points.
+# For larger meshes, the transform is computed with blocks of kernel rows so that memory scales as O(npts).
+_KK_MAX_CACHED_NPTS = 4096
+
+# Max number of elements of the [nrows, npts] temporary arrays used to build a block of kernel rows.
+_KK_BLOCK_NELEMS = 2 ** 21
+
+
+def _pv_hat_weights(xmesh, cs):
+    """
+    Return matrix W[i, j] with the principal value of the integral of phi_j(x) / (x - cs[i])
+    where phi_j is the piecewise-linear hat function centered on xmesh[j].
+    The logarithmic singularities at the grid points cancel out between adjacent segments.
+    """
+    d = np.abs(xmesh[None, :] - cs[:, None])
+    d[d == 0] = 1
+    logs = np.log(d)
+    lfact = logs[:, 1:] - logs[:, :-1]
+    h = np.diff(xmesh)
+
+    w = np.zeros((len(cs), len(xmesh)))
+    w[:, :-1] += (xmesh[None, 1:] - cs[:, None]) * lfact / h - 1
+    w[:, 1:] += (cs[:, None] - xmesh[None, :-1]) * lfact / h + 1
+    return w
+
+
+def _iter_kk_kernel_blocks(wmesh):
+    """
+    Generate (start, stop, kernel_re, kernel_im) with the rows [start:stop] of the Kramers-Kronig kernels.
+    The number of rows is chosen so that the temporary arrays have at most _KK_BLOCK_NELEMS elements.
+    """
+    npts = len(wmesh)
+    nrows = max(1, _KK_BLOCK_NELEMS // max(npts, 1))
+    for start in range(0, npts, nrows):
+        stop = min(start + nrows, npts)
+        # x / (x^2 - w^2) = [1/(x-w) + 1/(x+w)] / 2 and w / (x^2 - w^2) = [1/(x-w) - 1/(x+w)] / 2
+        a = _pv_hat_weights(wmesh, wmesh[start:stop])
+        b = _pv_hat_weights(wmesh, -wmesh[start:stop])
+        yield start, stop, (a + b) / np.pi, (a - b) / np.pi
+
+
+def _kk_kernels(wmesh):
+    """
+    Matrices K_re, K_im such that Re = K_re Im and Im = -K_im Re (KK relations on [wmesh[0], wmesh[-1]]).
+    The integrand is linearly interpolated between the points and the principal value is
+    computed analytically. Results are cached.
+    """
+    wmesh = np.ascontiguousarray(wmesh, dtype=np.double)
+    key = hashlib.sha1(wmesh.tobytes()).hexdigest()
+    if key in _KK_KERNELS:
+        mesh, kernel_re, kernel_im = _KK_KERNELS[key]
+        if np.array_equal(mesh, wmesh):
+            return kernel_re, kernel_im
+
+    npts = len(wmesh)
+    kernel_re, kernel_im = np.empty((npts, npts)), np.empty((npts, npts))
+    for start, stop, kre, kim in _iter_kk_kernel_blocks(wmesh):
+        kernel_re[start:stop], kernel_im[start:stop] = kre, kim
+
+    _KK_KERNELS[key] = (wmesh.copy(), kernel_re, kernel_im)
+    if len(_KK_KERNELS) > _KK_MAXSIZE:
+        _KK_KERNELS.popitem(last=False)
+
+    return kernel_re, kernel_im
+
+
+def _kk_transform(wmesh, values, which):
+    """
+    Apply the kernel ``which`` (0 for K_re, 1 for K_im) to the last axis of ``values``.
+    Large meshes are processed with blocks of kernel rows that are not stored.
+    """
+    wmesh = np.ascontiguousarray(wmesh, dtype=np.double)
+    values = np.asarray(values, dtype=np.double)
+    if len(wmesh) <= _KK_MAX_CACHED_NPTS:
+        return np.dot(values, _kk_kernels(wmesh)[which].T)
+
+    out = np.empty(values.shape)
+    for start, stop, kre, kim in _iter_kk_kernel_blocks(wmesh):
+        out[..., start:stop] = np.dot(values, (kre, kim)[which].T)
+    return out
+
+
+def kk_real_from_imag(wmesh, imag_values):
+    r"""
+    Compute the real part of a response function from its imaginary part with the Kramers-Kronig relation:
+    :math:`\Re\chi(\omega) = \frac{2}{\pi} P\int \frac{\omega' \Im\chi(\omega')}{\omega'^2 - \omega^2} d\omega'`
+
+    Args:
+        wmesh: Positive frequency mesh.
+        imag_values: Array [..., nw]. Several spectra (e.g. tensor components) are transformed
+            with a single matrix-matrix product.
+
+    Return: Array with the same shape as imag_values.
+    """
+    return _kk_transform(wmesh, imag_values, 0)
+
+
+def kk_imag_from_real(wmesh, real_values):
+    r"""
+    Compute the imaginary part of a response function from its real part with the Kramers-Kronig relation:
+    :math:`\Im\chi(\omega) = -\frac{2\omega}{\pi} P\int \frac{\Re\chi(\omega')}{\omega'^2 - \omega^2} d\omega'`
+
+    Args:
+        wmesh: Positive frequency mesh.
+        real_values: Array [..., nw].
+
+    Return: Array with the same shape as real_values.
+    """
+    return -_kk_transform(wmesh, real_values, 1)
+
+
 class Function1D(object):
     """Immutable object representing a (real|complex) function of real variable."""
 
@@ -385,7 +505,7 @@ class Function1D(object):
     #    smooth_vals = smooth(self.values, window_len=window_len, window=window)
     #    return self.__class__(self.mesh, smooth_vals)
 
-    def real_from_kk(self, with_div=True):
+    def real_from_kk(self, with_div=True, method="kernel"):
         """
         Compute the Kramers-Kronig transform of the imaginary part
         to get the real part. Assume self represents the Fourier
@@ -394,10 +514,17 @@ class Function1D(object):
         Args:
             with_div: True if the divergence should be treated numerically.
                 If False, the divergence is ignored, results are less accurate
-                but the calculation is faster.
+                but the calculation is faster. Used only if method == "quad".
+            method: "kernel" to use the cached kernel matrix (see :func:`kk_real_from_imag`),
+                "quad" for the point-by-point numerical integration.
 
         .. seealso:: <https://en.wikipedia.org/wiki/Kramers%E2%80%93Kronig_relations>
         """
+        if method == "kernel":
+            return self.__class__(self.mesh, kk_real_from_imag(self.mesh, self.values.imag))
+        if method != "quad":
+            raise ValueError("Invalid method: %s" % str(method))
+
         from scipy.integrate import cumtrapz, quad
         from scipy.interpolate import UnivariateSpline
         wmesh = self.mesh
@@ -425,7 +552,7 @@ class Function1D(object):
 
         return self.__class__(self.mesh, (2 / np.pi) * kk_values)
 
-    def imag_from_kk(self, with_div=True):
+    def imag_from_kk(self, with_div=True, method="kernel"):
         """
         Compute the Kramers-Kronig transform of the real part
         to get the imaginary part. Assume self represents the Fourier
@@ -434,10 +561,17 @@ class Function1D(object):
         Args:
             with_div: True if the divergence should be treated numerically.
                 If False, the divergence is ignored, results are less accurate
-                but the calculation is faster.
+                but the calculation is faster. Used only if method == "quad".
+            method: "kernel" to use the cached kernel matrix (see :func:`kk_imag_from_real`),
+                "quad" for the point-by-point numerical integration.
 
         .. seealso:: <https://en.wikipedia.org/wiki/Kramers%E2%80%93Kronig_relations>
         """
+        if method == "kernel":
+            return self.__class__(self.mesh, kk_imag_from_real(self.mesh, self.values.real))
+        if method != "quad":
+            raise ValueError("Invalid method: %s" % str(method))
+
         from scipy.integrate import cumtrapz, quad
         from scipy.interpolate import UnivariateSpline
         wmesh = self.mesh
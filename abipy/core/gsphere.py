@@ -25,6 +25,8 @@ class GSphere(collections.Sequence):
             kpoint: Reduced coordinates of the k-point.
             gvecs: Array with the reduced coordinates of the G-vectors.
             istwfk: Storage option (time-reversal symmetry, see abinit variable)
+                If istwfk > 1, only half of the G-vectors are stored and the coefficients
+                of the other half are given by :math:`u(-G-G_0) = u(G)^*` with :math:`G_0 = 2k`.
         """
         self.ecut = ecut
         self.lattice = lattice
@@ -34,8 +36,14 @@ class GSphere(collections.Sequence):
         self.npw = self.gvecs.shape[0]
 
         self.istwfk = istwfk
-        if istwfk != 1:
-            raise NotImplementedError("istwfk %d is not implemented" % self.istwfk)
+        if istwfk not in range(1, 10):
+            raise ValueError("Invalid value for istwfk: %s" % str(istwfk))
+        if istwfk != 1 and not np.allclose(2 * self.kpoint.frac_coords, np.rint(2 * self.kpoint.frac_coords)):
+            raise ValueError("istwfk %d requires 2k = G0 while k = %s" % (istwfk, str(self.kpoint.frac_coords)))
+
+        # Cache with the index tables used to transfer data between the sphere and the FFT box.
+        # mesh.shape --> (indices of G, indices of -G-G0 or None)
+        self._fft_indices = {}
 
     @property
     def gvecs(self):
@@ -146,77 +154,79 @@ class GSphere(collections.Sequence):
     #  """Returns the number of divisions of the FFT box enclosing the sphere."""
     #  #return ndivs
 
+    @property
+    def g0(self):
+        """Integer vector :math:`G_0 = 2k` used for istwfk > 1."""
+        return np.array(np.rint(2 * self.kpoint.frac_coords), dtype=np.int)
+
+    def get_fft_indices(self, mesh_shape):
+        """
+        Return the index tables used to transfer data between the G-sphere
+        and the FFT box of shape ``mesh_shape``. Results are cached.
+
+        Return:
+            (inds, inv_inds) where ``inds`` are the indices of the G-vectors in the flattened FFT box
+            (C order) and ``inv_inds`` the indices of :math:`-G-G_0` (None if istwfk == 1).
+        """
+        shape = tuple(int(n) for n in mesh_shape)
+        if shape in self._fft_indices:
+            return self._fft_indices[shape]
+
+        gvecs, ngfft = self.gvecs, np.array(shape)
+        if np.any(gvecs >= ngfft) or np.any(gvecs < -ngfft):
+            raise ValueError("FFT mesh %s is too small for the G-sphere" % str(shape))
+
+        # Wrap negative components as in Fortran: if (i1 < 0) i1 = i1 + n1
+        inds = np.ravel_multi_index((gvecs % ngfft).T, shape)
+        inv_inds = None
+        if self.istwfk != 1:
+            inv_inds = np.ravel_multi_index(((-gvecs - self.g0) % ngfft).T, shape)
+
+        self._fft_indices[shape] = (inds, inv_inds)
+        return inds, inv_inds
+
     def tofftmesh(self, mesh, arr_on_sphere):
         """
         Insert the array ``arr_on_sphere`` given on the sphere inside the FFT mesh.
+        All the leading dimensions (e.g. bands, spinors) are treated with a single scatter operation.
+        If istwfk > 1, the coefficients of the G-vectors that are not stored are reconstructed
+        with :math:`u(-G-G_0) = u(G)^*`.
 
         Args:
-            mesh:
-            arr_on_sphere:
+            mesh: |Mesh3D| object.
+            arr_on_sphere: array of shape [..., npw]
         """
         arr_on_sphere = np.atleast_2d(arr_on_sphere)
         ishape = arr_on_sphere.shape
-        s0 = ishape[0]
         assert self.npw == ishape[-1]
 
-        arr_on_mesh = np.zeros((s0,) + mesh.shape, dtype=arr_on_sphere.dtype)
-
-        if self.istwfk == 1:
-            #do ipw=1,npw
-            #  i1=kg_k(1,ipw); if(i1<0)i1=i1+n1; i1=i1+1
-            #  i2=kg_k(2,ipw); if(i2<0)i2=i2+n2; i2=i2+1
-            #  i3=kg_k(3,ipw); if(i3<0)i3=i3+n3; i3=i3+1
-            #end do
-
-            n1, n2, n3 = mesh.shape
-            for sph_idx, gvec in enumerate(self.gvecs):
-                i1 = gvec[0]
-                if i1 < 0: i1 = i1 + n1
-                i2 = gvec[1]
-                if i2 < 0: i2 = i2 + n2
-                i3 = gvec[2]
-                if i3 < 0: i3 = i3 + n3
-                arr_on_mesh[..., i1, i2, i3] = arr_on_sphere[..., sph_idx]
+        inds, inv_inds = self.get_fft_indices(mesh.shape)
+        arr_on_sphere = np.reshape(arr_on_sphere, (-1, self.npw))
+        arr_on_mesh = np.zeros((arr_on_sphere.shape[0], mesh.size), dtype=arr_on_sphere.dtype)
 
-        else:
-            raise NotImplementedError("istwfk = %s not implemented" % self.istwfk)
+        if inv_inds is not None:
+            # Time-reversal first so that stored values are used for self-conjugated points e.g. G = 0.
+            arr_on_mesh[:, inv_inds] = arr_on_sphere.conj()
+        arr_on_mesh[:, inds] = arr_on_sphere
 
-        if s0 == 1:
+        if ishape[:-1] == (1,):
             # Reinstate input shape
-            arr_on_mesh.shape = mesh.shape
+            return arr_on_mesh.reshape(mesh.shape)
 
-        return arr_on_mesh
+        return arr_on_mesh.reshape(ishape[:-1] + tuple(mesh.shape))
 
     def fromfftmesh(self, mesh, arr_on_mesh):
         """
         Transfer ``arr_on_mesh`` given on the FFT mesh to the G-sphere.
+        All the leading dimensions are treated with a single gather operation.
         """
-        indim =  arr_on_mesh.ndim
-        arr_on_mesh = mesh.reshape(arr_on_mesh)
-        ishape = arr_on_mesh.shape
-        s0 = ishape[0]
-
-        arr_on_sphere = np.empty((s0,) + (self.npw,), dtype=arr_on_mesh.dtype)
-
-        if self.istwfk == 1:
-            #do ig=1,npwout
-            #  i1=kg_kout(1,ig); if (i1<0) i1=i1+n1; i1=i1+1
-            #  i2=kg_kout(2,ig); if (i2<0) i2=i2+n2; i2=i2+1
-            #  i3=kg_kout(3,ig); if (i3<0) i3=i3+n3; i3=i3+1
-            #end do
-            n1, n2, n3 = mesh.shape
-
-            for sph_idx, gvec in enumerate(self.gvecs):
-                i1 = gvec[0]
-                if i1 < 0: i1 = i1 + n1
-                i2 = gvec[1]
-                if i2 < 0: i2 = i2 + n2
-                i3 = gvec[2]
-                if i3 < 0: i3 = i3 + n3
-                arr_on_sphere[..., sph_idx] = arr_on_mesh[..., i1, i2, i3]
+        indim = arr_on_mesh.ndim
+        arr_on_mesh = np.reshape(arr_on_mesh, (-1, mesh.size))
+        s0 = arr_on_mesh.shape[0]
 
-        else:
-            raise NotImplementedError("istwfk %s is not implemented" % self.istwfk)
+        # Only the G-vectors stored in the sphere are needed if istwfk > 1.
+        inds, _ = self.get_fft_indices(mesh.shape)
+        arr_on_sphere = arr_on_mesh[:, inds]
 
         if s0 == 1 and indim == 1:
             # Reinstate input shape
@@ -224,6 +234,88 @@ class GSphere(collections.Sequence):
 
         return arr_on_sphere
 
+    def vdot(self, ug1, ug2):
+        r"""
+        Scalar product :math:`\sum_G u_1(G)^* u_2(G)` over the full G-sphere.
+        If istwfk > 1, the contribution of the G-vectors that are not stored
+        is obtained from :math:`u(-G-G_0) = u(G)^*` and the result is real.
+
+        Args:
+            ug1, ug2: arrays of shape [..., npw] defined on this sphere.
+        """
+        svdot = np.vdot(ug1, ug2)
+        if self.istwfk == 1: return svdot
+
+        # Each pair (G, -G-G0) contributes 2 Re[u1(G)^* u2(G)].
+        # For istwfk == 2, G = 0 is the only G-vector mapped onto itself.
+        svdot = 2 * svdot.real
+        ig0 = self._gamma_index
+        if ig0 is not None:
+            ug1, ug2 = np.reshape(ug1, (-1, self.npw)), np.reshape(ug2, (-1, self.npw))
+            svdot -= np.vdot(ug1[:, ig0], ug2[:, ig0]).real
+
+        return svdot
+
+    @property
+    def _gamma_index(self):
+        """Index of G = 0 if istwfk == 2 and G = 0 is in the sphere, None otherwise."""
+        if self.istwfk != 2: return None
+        ig0 = np.nonzero(np.all(self.gvecs == 0, axis=1))[0]
+        return ig0[0] if len(ig0) else None
+
+    def gemm_vdot(self, ug1, ug2):
+        r"""
+        Matrix of scalar products :math:`\langle u_{1,i}|u_{2,j}\rangle` over the full G-sphere
+        computed with a single matrix-matrix product.
+
+        Args:
+            ug1: array of shape [n1, ..., npw] defined on this sphere.
+            ug2: array of shape [n2, ..., npw] defined on this sphere.
+
+        Return: [n1, n2] array (real if istwfk > 1).
+        """
+        ug1 = np.reshape(ug1, (len(ug1), -1))
+        ug2 = np.reshape(ug2, (len(ug2), -1))
+        mat = np.dot(ug1.conj(), ug2.T)
+        if self.istwfk == 1: return mat
+
+        # See vdot for the treatment of the G-vectors that are not stored.
+        mat = 2 * mat.real
+        ig0 = self._gamma_index
+        if ig0 is not None:
+            # istwfk == 2 implies nspinor == 1 so G = 0 is the column ig0.
+            mat -= np.outer(ug1[:, ig0].conj(), ug2[:, ig0]).real
+
+        return mat
+
+    def get_common_indices(self, other, gshift=None):
+        r"""
+        Find the G-vectors belonging to both spheres.
+
+        Args:
+            other: |GSphere| object.
+            gshift: Optional integer vector. If given, G in self is matched with G + gshift in other.
+                Useful to compute :math:`\langle u_k|u_{k+q}\rangle` when :math:`k+q = k' + G_0`
+                as :math:`u_{k+q}(G) = u_{k'}(G + G_0)`.
+
+        Return: (inds, other_inds) arrays with the indices of the common G-vectors in self and other.
+        """
+        gvecs1 = self.gvecs
+        gvecs2 = other.gvecs if gshift is None else other.gvecs - np.asarray(gshift, dtype=np.int)
+
+        # Map G-vectors to integer keys on the box enclosing both spheres.
+        gmin = np.minimum(gvecs1.min(axis=0), gvecs2.min(axis=0))
+        shape = np.maximum(gvecs1.max(axis=0), gvecs2.max(axis=0)) - gmin + 1
+        keys1 = np.ravel_multi_index((gvecs1 - gmin).T, shape)
+        keys2 = np.ravel_multi_index((gvecs2 - gmin).T, shape)
+
+        sort2 = np.argsort(keys2)
+        pos = np.searchsorted(keys2, keys1, sorter=sort2)
+        pos[pos == len(keys2)] = 0
+        found = keys2[sort2[pos]] == keys1
+
+        return np.nonzero(found)[0], sort2[pos[found]]
+
     #def rotate(self, symmop):
     #    """
     #    Returns a new `GSphere` centered on Sk.
@@ -55,6 +55,25 @@ _SPGLIB_SYMPREC = 1e-5
 _SPGLIB_ANGLE_TOLERANCE = -1.0
 
 
+# Number of bins along each reduced direction used to hash k-points (see KpointList.find).
+# Points are wrapped to [0, 1[ hence points differing by a reciprocal lattice vector share the same bin.
+_KHASH_NDIV = 10 ** 4
+
+
+def _khash_ints(frac_coords):
+    """
+    Integer coordinates of the bins associated to the reduced coordinates `frac_coords`.
+    Returns |numpy-array| with shape [..., 3].
+    """
+    return np.rint(np.asarray(frac_coords) % 1 * _KHASH_NDIV).astype(np.int64) % _KHASH_NDIV
+
+
+def _khash_keys(ints):
+    """Combine the integer coordinates of the bins into a single int64 key."""
+    ints = np.asarray(ints, dtype=np.int64)
+    return (ints[..., 0] * _KHASH_NDIV + ints[..., 1]) * _KHASH_NDIV + ints[..., 2]
+
+
 def set_atol_kdiff(new_atol):
     """
     Change the value of the tolerance ``_ATOL_KDIFF`` used to compare k-points.
@@ -130,6 +149,118 @@ def wrap_to_bz(x):
     return x % 1
 
 
+class _KpointHashTable(object):
+    """
+    Hash table used to find points in reduced coordinates modulo reciprocal lattice vectors.
+    Points are wrapped to [0, 1[ and distributed in bins of size 1 / _KHASH_NDIV.
+    Lookups compare with `issamek` only the points in the bins around the query
+    so that the tolerance semantics are the same as in `issamek`.
+    """
+
+    def __init__(self, frac_coords):
+        """
+        Args:
+            frac_coords: [npts, 3] array with the reduced coordinates of the points.
+        """
+        self.frac_coords = np.reshape(frac_coords, (-1, 3)).astype(np.double)
+        # Max absolute value of the reduced coordinates. Used to compute the search radius.
+        self.kmax = np.abs(self.frac_coords).max() if len(self.frac_coords) else 0.0
+
+    def __len__(self):
+        return len(self.frac_coords)
+
+    @lazy_property
+    def bin2inds(self):
+        """
+        Dictionary mapping the integer coordinates of the bin
+        to the list of indices of the points in the bin (increasing order).
+        """
+        d = {}
+        for ik, ints in enumerate(map(tuple, _khash_ints(self.frac_coords).tolist())):
+            d.setdefault(ints, []).append(ik)
+        return d
+
+    @lazy_property
+    def sorted_keys_perm(self):
+        """
+        Sorted keys of the bins and permutation (sorted position --> point index).
+        Used for vectorized lookups in `find_indices`.
+        """
+        keys = _khash_keys(_khash_ints(self.frac_coords))
+        perm = np.argsort(keys, kind="mergesort")
+        return keys[perm], perm
+
+    def search_radius(self, frac_coords, atol):
+        """
+        Radius (reduced coordinates) of the region around `frac_coords` that may contain points
+        considered equal by `issamek`. Note that np.allclose uses rtol=1e-5 relative to the difference.
+        """
+        return atol + 1e-5 * (np.abs(frac_coords).max(axis=-1) + self.kmax)
+
+    def find_all(self, frac_coords, atol=None, first=False):
+        """
+        Return list with the indices of the points equal to `frac_coords` (modulo G) in increasing order.
+        Only the bins close to `frac_coords` are scanned. If `first`, stop at the first match.
+        """
+        if atol is None: atol = _ATOL_KDIFF
+        frac_coords = np.reshape(frac_coords, (3,)).astype(np.double)
+        if len(self) == 0: return []
+
+        rn = self.search_radius(frac_coords, atol) * _KHASH_NDIV
+        ranges = [np.unique(np.arange(int(np.rint(x - rn)), int(np.rint(x + rn)) + 1) % _KHASH_NDIV)
+                  for x in (frac_coords % 1) * _KHASH_NDIV]
+
+        if np.prod([len(r) for r in ranges]) > 64:
+            # Tolerance is too large for the hash table. Linear search.
+            cands = range(len(self))
+        else:
+            bin2inds = self.bin2inds
+            cands = sorted(ik for ints in product(*[r.tolist() for r in ranges]) for ik in bin2inds.get(ints, []))
+
+        found = []
+        for ik in cands:
+            if issamek(self.frac_coords[ik], frac_coords, atol=atol):
+                found.append(ik)
+                if first: break
+
+        return found
+
+    def find_indices(self, frac_coords, atol=None):
+        """
+        Vectorized lookup. Return |numpy-array| of shape [len(frac_coords)] with the index
+        of the first point equal to the input point (modulo G). -1 if not found.
+        """
+        if atol is None: atol = _ATOL_KDIFF
+        frac_coords = np.reshape(frac_coords, (-1, 3)).astype(np.double)
+        inds = -np.ones(len(frac_coords), dtype=np.int)
+        if len(self) == 0 or len(frac_coords) == 0: return inds
+
+        # Points whose search region is fully contained in one bin are handled with a single lookup.
+        # The others (close to the border of the bin or with more than one candidate in the bin)
+        # are treated with the scalar version.
+        w = (frac_coords % 1) * _KHASH_NDIV
+        rn = self.search_radius(frac_coords, atol) * _KHASH_NDIV
+        near = np.any(0.5 - np.abs(w - np.rint(w)) <= rn[:, None], axis=1)
+
+        sorted_keys, perm = self.sorted_keys_perm
+        qkeys = _khash_keys(_khash_ints(frac_coords))
+        pos = np.minimum(np.searchsorted(sorted_keys, qkeys), len(sorted_keys) - 1)
+        in_bin = (sorted_keys[pos] == qkeys) & ~near
+
+        cands = perm[pos[in_bin]]
+        diff = self.frac_coords[cands] - frac_coords[in_bin]
+        ok = np.all(np.abs(np.rint(diff) - diff) <= atol + 1e-5 * np.abs(diff), axis=1)
+        iqs = np.nonzero(in_bin)[0]
+        inds[iqs[ok]] = cands[ok]
+
+        # Scalar version for the remaining points.
+        for iq in np.concatenate((np.nonzero(near)[0], iqs[~ok])):
+            found = self.find_all(frac_coords[iq], atol=atol, first=True)
+            if found: inds[iq] = found[0]
+
+        return inds
+
+
 def rc_list(mp, sh, pbc=False, order="bz"):
     """
     Returns a |numpy-array| with the linear mesh used to sample one dimension of the reciprocal space.
@@ -231,20 +362,19 @@ def map_grid2ibz(structure, ibz, ngkpt, has_timrev, pbc=False):
         raise ValueError("Structure does not contain Abinit spacegroup info!")
 
     # Extract rotations in reciprocal space (FM part).
-    symrec_fm = [o.rot_g for o in abispg.fm_symmops]
+    symrec_fm = np.array([o.rot_g for o in abispg.fm_symmops])
 
-    # Compute TS k_ibz.
-    bzgrid2ibz = -np.ones(ngkpt, dtype=np.int)
+    # Compute TS k_ibz for all the points in the IBZ at once.
+    # rot_gps has shape [nibz, nsym, ntsign, 3] so that later points in the IBZ have precedence
+    # when the same grid point is generated more than once.
+    gp_ibz = np.array(np.rint(np.reshape(ibz, (-1, 3)) * ngkpt), dtype=np.int)
+    rot_gps = np.einsum("sij,kj->ksi", symrec_fm, gp_ibz)
+    rot_gps = np.stack([rot_gps, -rot_gps], axis=2) if has_timrev else rot_gps[:, :, None, :]
+    nimg = rot_gps.shape[1] * rot_gps.shape[2]
+    gp_bz = rot_gps.reshape(-1, 3) % ngkpt
 
-    for ik_ibz, kibz in enumerate(ibz):
-        gp_ibz = np.array(np.rint(kibz * ngkpt), dtype=np.int)
-        for rot in symrec_fm:
-            rot_gp = np.matmul(rot, gp_ibz)
-            gp_bz = rot_gp % ngkpt
-            bzgrid2ibz[gp_bz[0], gp_bz[1], gp_bz[2]] = ik_ibz
-            if has_timrev:
-                gp_bz = (-rot_gp) % ngkpt
-                bzgrid2ibz[gp_bz[0], gp_bz[1], gp_bz[2]] = ik_ibz
+    bzgrid2ibz = -np.ones(ngkpt, dtype=np.int)
+    bzgrid2ibz[gp_bz[:, 0], gp_bz[:, 1], gp_bz[:, 2]] = np.repeat(np.arange(len(gp_ibz)), nimg)
 
     if pbc:
         # Add periodic replicas.
@@ -308,6 +438,58 @@ def kptopt2str(kptopt, verbose=0):
     return t[0] if verbose == 0 else t[0] + "\n" + t[1]
 
 
+def map_kpoints_with_symrecs(kpoints, ref_kpoints, symrecs, has_timrev, atol=None):
+    """
+    Vectorized mapping between a list of k-points and a list of reference k-points
+    related by the symmetry operations ``symrecs``: ``k = tsign S k_ref + G0``.
+    All the reference points are rotated at once and the images are stored in a hash table
+    (points are wrapped to [0, 1[ and binned on a fine integer grid)
+    that is then used to look up all the k-points in bulk.
+
+    Args:
+        kpoints: [nk, 3] array with the reduced coordinates of the k-points.
+        ref_kpoints: [nref, 3] array with the reduced coordinates of the reference k-points.
+        symrecs: [nsym, 3, 3] arrays with the symmetry operations in reciprocal space (reduced coordinates).
+        has_timrev: True if time-reversal can be used.
+        atol: Tolerance used to compare k-points. Use _ATOL_KDIFF is atol is None.
+
+    Return: namedtuple with the following attributes:
+
+        ik_ref: [nk] array with the index of the reference k-point. -1 if k does not have any image in ref.
+        isym: [nk] array with the index of the symmetry operation.
+        tsign: [nk] array with the time-reversal sign (+1 or -1).
+        g0: [nk, 3] array with the reciprocal lattice vector.
+        nmissing: Number of k-points that cannot be mapped onto ref_kpoints.
+
+    If multiple images are present, the (ik_ref, tsign, isym) with the smallest ik_ref is selected
+    (then tsign = +1 is preferred and then the smallest isym).
+    """
+    kpoints = np.reshape(kpoints, (-1, 3)).astype(np.double)
+    ref_kpoints = np.reshape(ref_kpoints, (-1, 3)).astype(np.double)
+    symrecs = np.reshape(symrecs, (-1, 3, 3))
+    tsigns = np.array((1, -1) if has_timrev else (1,), dtype=np.int)
+    nref, nts, nsym = len(ref_kpoints), len(tsigns), len(symrecs)
+
+    # Rotated points with shape [nref, nts, nsym, 3]. The order of the axes defines the priority.
+    rot_kpoints = np.einsum("sij,kj->ksi", symrecs, ref_kpoints)
+    rot_kpoints = tsigns[None, :, None, None] * rot_kpoints[:, None, :, :]
+    rot_kpoints = rot_kpoints.reshape(-1, 3)
+
+    iflat = _KpointHashTable(rot_kpoints).find_indices(kpoints, atol=atol)
+    found = iflat != -1
+
+    ik_ref = -np.ones(len(kpoints), dtype=np.int)
+    isym = -np.ones(len(kpoints), dtype=np.int)
+    tsign = np.zeros(len(kpoints), dtype=np.int)
+    g0 = np.zeros((len(kpoints), 3), dtype=np.int)
+
+    iref, its, iss = np.unravel_index(iflat[found], (nref, nts, nsym))
+    ik_ref[found], tsign[found], isym[found] = iref, tsigns[its], iss
+    g0[found] = np.rint(kpoints[found] - rot_kpoints[iflat[found]])
+
+    return dict2namedtuple(ik_ref=ik_ref, isym=isym, tsign=tsign, g0=g0, nmissing=int(np.count_nonzero(~found)))
+
+
 def map_kpoints(other_kpoints, other_lattice, ref_lattice, ref_kpoints, ref_symrecs, has_timrev):
     """
     Build mapping between a list of k-points in reduced coordinates (``other_kpoints``)
@@ -338,34 +520,26 @@ def map_kpoints(other_kpoints, other_lattice, ref_lattice, ref_kpoints, ref_symr
                 g0
 
             kpt_other = TS kpt_ref + G0
+
+    .. note::
+
+        Use :func:`map_kpoints_with_symrecs` to get the mapping as numpy arrays.
     """
-    ref_gprimd_inv = np.inv(np.asarray(ref_lattice).T)
+    ref_gprimd_inv = np.linalg.inv(np.asarray(ref_lattice).T)
     other_gprimd = np.asarray(other_lattice).T
     other_kpoints = np.asarray(other_kpoints).reshape((-1, 3))
-    ref_kpoints = np.asarray(ref_kpoints).reshape((-1, 3))
-    o2r_map = len(other_kpoints) * [None]
 
-    tsigns = (1, -1) if has_timrev else (1,)
-    kmap = collections.namedtuple("kmap", "ik_ref, tsign, isym, g0")
+    # Get other k-points in reduced coordinates in the reference lattice.
+    okpts_red = np.matmul(other_kpoints, np.matmul(ref_gprimd_inv, other_gprimd).T)
 
-    for ik_oth, okpt in enumerate(other_kpoints):
-        # Get other k-point in reduced coordinates in the referece lattice.
-        okpt_red = np.matmul(ref_gprimd_inv, np.matmul(other_gprimd, okpt))
+    # k_other = TS k_ref + G0
+    r = map_kpoints_with_symrecs(okpts_red, ref_kpoints, ref_symrecs, has_timrev)
 
-        # k_other = TS k_ref + G0
-        found = False
-        for ik_ref, kref in enumerate(ref_kpoints):
-            if found: break
-            for tsign in tsign:
-                for isym, symrec in enumerate(ref_symrecs):
-                    krot = tsign * np.matmul(symrec, kref)
-                    if issamek(okpt_red, krot):
-                        g0 = np.rint(okpt_red - krot)
-                        o2r_map[ik_oth] = kmap(ik_ref, tsign, isym, g0)
-                        found = True
-                        break
+    kmap = collections.namedtuple("kmap", "ik_ref, tsign, isym, g0")
+    o2r_map = [None if ik_ref == -1 else kmap(ik_ref, tsign, isym, g0)
+               for ik_ref, tsign, isym, g0 in zip(r.ik_ref.tolist(), r.tsign.tolist(), r.isym.tolist(), r.g0)]
 
-        return o2r_map, o2r_map.count(None)
+    return o2r_map, r.nmissing
 
 
 #def find_irred_kpoints_kmesh(structure, kfrac_coords):
@@ -429,41 +603,28 @@ def find_irred_kpoints_generic(structure, kfrac_coords, verbose=1):
     Return:
         irred_map: Index of the i-th irreducible k-point in the input kfrac_coords array.
 
-    .. warning::
+    .. note::
 
-        In the worst case, the algorithm scales as nkpt ** 2 * nsym.
-        hence this routine should be used only if ``kfrac_coords`` represents
-        e.g. a path in the Brillouin zone or an arbitrary set of points.
+        All the k-points are rotated at once and the images are looked up in a hash table
+        hence the algorithm scales as nkpt * nsym (memory for nkpt * nsym points is needed).
     """
     start = time.time()
-    print("Removing redundant k-points. This is gonna take a while... ")
+    kfrac_coords = np.reshape(kfrac_coords, (-1, 3))
+    nk = len(kfrac_coords)
 
-    # Wrap points in [0,1[ interval.
-    uc_kcoords = np.reshape(kfrac_coords, (-1, 3)) % 1
+    # Rotations in reciprocal space including the time-reversal sign of the operation.
+    rots = np.array([symmop.time_sign * symmop.rot_g for symmop in structure.abi_spacegroup])
 
-    irred_map = collections.deque()
-    irred_map.append(0)
-    kpts2irred = collections.deque()
-    kpts2irred.append((0, 0, +1))
+    # For each k-point, find the first point in the list that is equal to one of its images.
+    # k is irreducible if there's no previous point in the list connected to k by symmetry.
+    images = np.einsum("sij,kj->ski", rots, kfrac_coords)
+    first = _KpointHashTable(kfrac_coords).find_indices(images.reshape(-1, 3)).reshape(len(rots), nk)
+    first[first == -1] = nk
+    irred_map = np.nonzero(first.min(axis=0) >= np.arange(nk))[0]
 
-    for ik, kk in enumerate(uc_kcoords[1:]):
-        ik += 1
-        found = False
-        for ik_irr in irred_map:
-            kirr = kfrac_coords[ik_irr]
-            for isym, symmop in enumerate(structure.abi_spacegroup):
-                krot = symmop.rotate_k(kirr)
-                if issamek(krot, kk):
-                    found = True
-                    #kpts2irred[ik] = (ik_irr, isym, symmops.time_sign)
-                    break
-
-        if not found:
-            irred_map.append(ik)
-
-    print("Completed in", time.time() - start, "[s]")
     if verbose:
-        print("Entered with ", len(uc_kcoords), "k-points")
+        print("Completed in", time.time() - start, "[s]")
+        print("Entered with ", nk, "k-points")
         print("Found ", len(irred_map), "irred k-points")
 
     return dict2namedtuple(irred_map=np.array(irred_map, dtype=np.int))
@@ -845,7 +1006,7 @@ class KpointList(collections.Sequence):
         return self._points[slice]
 
     def __contains__(self, kpoint):
-        return kpoint in self._points
+        return self.find(kpoint) != -1
 
     def __reversed__(self):
         return self._points.__reversed__()
@@ -869,29 +1030,58 @@ class KpointList(collections.Sequence):
     def __ne__(self, other):
         return not (self == other)
 
+    @lazy_property
+    def _hash_table(self):
+        """:class:`_KpointHashTable` used to find k-points in O(1)."""
+        return _KpointHashTable(self.frac_coords)
+
+    @lazy_property
+    def _kdtree(self):
+        """:class:`scipy.spatial.cKDTree` built from the Cartesian coordinates. Used for nearest-neighbour queries."""
+        from scipy.spatial import cKDTree
+        return cKDTree(np.reshape(self.reciprocal_lattice.get_cartesian_coords(self.frac_coords), (-1, 3)))
+
     def index(self, kpoint):
         """
         Returns: the first index of kpoint in self.
 
         Raises: `ValueError` if not found.
         """
-        try:
-            return self._points.index(kpoint)
-        except ValueError:
+        ik = self.find(kpoint)
+        if ik == -1:
             raise ValueError("Cannot find point: %s in KpointList:\n%s" % (repr(kpoint), repr(self)))
+        return ik
 
     def find(self, kpoint):
         """
         Returns: first index of kpoint. -1 if not found
         """
+        frac_coords = kpoint.frac_coords if hasattr(kpoint, "frac_coords") else kpoint
         try:
-            return self.index(kpoint)
-        except ValueError:
+            found = self._hash_table.find_all(frac_coords, first=True)
+        except (TypeError, ValueError):
+            # Object cannot be converted to reduced coordinates.
             return -1
 
+        return found[0] if found else -1
+
     def count(self, kpoint):
         """Return number of occurrences of kpoint"""
-        return self._points.count(kpoint)
+        frac_coords = kpoint.frac_coords if hasattr(kpoint, "frac_coords") else kpoint
+        return len(self._hash_table.find_all(frac_coords))
+
+    def find_indices(self, frac_coords, atol=None):
+        """
+        Vectorized version of `find` for a set of points.
+
+        Args:
+            frac_coords: Array-like with the reduced coordinates of the points. Shape: [npts, 3].
+            atol: Tolerance used to compare k-points. Use _ATOL_KDIFF is atol is None.
+
+        Return: |numpy-array| of shape [npts] with the index of the first k-point equal
+            to the input point (modulo G). -1 if not found.
+        """
+        return self._hash_table.find_indices(frac_coords, atol=atol)
 
     def find_closest(self, obj):
         """
@@ -914,12 +1104,30 @@ class KpointList(collections.Sequence):
         else:
             frac_coords = np.asarray(obj)
 
-        dist = np.empty(len(self))
-        for i, kpt in enumerate(self):
-            dist[i] = kpt.lattice.norm(kpt.frac_coords - frac_coords)
+        cart_coords = self.reciprocal_lattice.get_cartesian_coords(np.reshape(frac_coords, (3,)))
+        dist, ind = self._kdtree.query(cart_coords)
+        # Return the first index in case of ties (same behaviour as argmin).
+        ties = self._kdtree.query_ball_point(cart_coords, dist * (1 + 1e-12) + 1e-14)
+        if len(ties) > 1:
+            ind = min(ties)
+            dist = np.linalg.norm(self.reciprocal_lattice.get_cartesian_coords(self.frac_coords[ind] - frac_coords))
+
+        return ind, self[ind], np.copy(dist)
+
+    def find_closest_indices(self, frac_coords):
+        """
+        Vectorized version of `find_closest` for a set of points.
+
+        Args:
+            frac_coords: Array-like with the reduced coordinates of the points. Shape: [npts, 3].
 
-        ind = dist.argmin()
-        return ind, self[ind], np.copy(dist[ind])
+        Return:
+            (inds, dists) |numpy-arrays| with the index of the closest k-point and the distance.
+            In case of ties, the index is not necessarily the first one.
+        """
+        cart_coords = self.reciprocal_lattice.get_cartesian_coords(np.reshape(frac_coords, (-1, 3)))
+        dists, inds = self._kdtree.query(np.reshape(cart_coords, (-1, 3)))
+        return inds, dists
 
     @property
     def is_path(self):
@@ -1060,16 +1268,14 @@ class KpointList(collections.Sequence):
             for ik, _ in enumerate(self):
                 k2kqg[ik] = (ik, g0)
         else:
-            # N**2 scaling but this algorithm can handle k-paths
+            # This algorithm can handle k-paths.
             # Note that in principle one could have multiple k+q in k-points
             # but only the first match is considered.
-            for ik, kpoint in enumerate(self):
-                kpq = kpoint.frac_coords + qfrac_coords
-                for ikq, ksearch in enumerate(self):
-                    if issamek(kpq, ksearch.frac_coords, atol=atol_kdiff):
-                        g0 = np.rint(kpq - ksearch.frac_coords)
-                        k2kqg[ik] = (ikq, g0)
-                        break
+            kpq = self.frac_coords + qfrac_coords
+            for ik, ikq in enumerate(self.find_indices(kpq, atol=atol_kdiff)):
+                if ikq == -1: continue
+                g0 = np.rint(kpq[ik] - self.frac_coords[ikq])
+                k2kqg[ik] = (ikq, g0)
 
         return k2kqg
 
@@ -1727,13 +1933,8 @@ class Ktables(object):
         self.bz = (self.grid + self.kshift) / self.mesh
         self.nbz = len(self.bz)
 
-        # All k-points and mapping to ir-grid points.
-        # FIXME This is slow.
-        self.bz2ibz = np.empty(len(self.bz), dtype=np.int)
-        for ik_bz, ir_gp_id in enumerate(mapping):
-            inds = np.where(uniq == ir_gp_id)
-            assert len(inds) == 1
-            self.bz2ibz[ik_bz] = inds[0]
+        # All k-points and mapping to ir-grid points (uniq is sorted).
+        self.bz2ibz = np.searchsorted(uniq, mapping)
 
     def __str__(self):
         return self.to_string()
@@ -7,16 +7,144 @@ import numpy as np
 from itertools import product as iproduct
 from collections import deque
 from monty.functools import lazy_property
+from monty.collections import dict2namedtuple
 from numpy.random import random
-from numpy.fft import fftn, ifftn, fftshift, ifftshift, fftfreq
+from numpy.fft import fftshift, ifftshift, fftfreq
 from abipy.tools import duck
 
 
 __all__ = [
     "Mesh3D",
+    "set_fft_backend",
+    "get_fft_backend",
 ]
 
 
+# Global configuration of the FFT backend.
+_FFT_CONFIG = dict(backend="numpy", nthreads=1, planner_effort="FFTW_MEASURE")
+
+# Cache of pyfftw plans: (shape, dtype, axes, inverse, nthreads, overwrite_input) --> FFTW object
+_FFTW_PLANS = {}
+
+
+def _has_scipy_fft():
+    try:
+        import scipy.fft
+        return True
+    except ImportError:
+        return False
+
+
+def _has_pyfftw():
+    try:
+        import pyfftw
+        return True
+    except ImportError:
+        return False
+
+
+def set_fft_backend(backend=None, nthreads=None, planner_effort=None, wisdom_file=None):
+    """
+    Select the FFT library used by |Mesh3D| objects.
+
+    Args:
+        backend: "numpy", "scipy" (scipy.fft with ``workers``), "pyfftw" (cached FFTW plans)
+            or "auto" to select the fastest library available. None to keep the current value.
+        nthreads: Number of threads used by scipy and pyfftw. -1 to use all the CPUs.
+        planner_effort: FFTW planner flag e.g. "FFTW_ESTIMATE", "FFTW_MEASURE". Used only by pyfftw.
+        wisdom_file: Path to a file with FFTW wisdom exported by :func:`save_fftw_wisdom`.
+            Loaded if the file exists. Used only by pyfftw.
+
+    Return: Dictionary with the previous configuration.
+    """
+    old = _FFT_CONFIG.copy()
+
+    if backend is not None:
+        backend = backend.lower()
+        if backend == "auto":
+            backend = "pyfftw" if _has_pyfftw() else ("scipy" if _has_scipy_fft() else "numpy")
+        if backend == "scipy" and not _has_scipy_fft():
+            raise ImportError("scipy.fft is not available (requires scipy >= 1.4)")
+        if backend == "pyfftw" and not _has_pyfftw():
+            raise ImportError("pyfftw is not installed")
+        if backend not in ("numpy", "scipy", "pyfftw"):
+            raise ValueError("Invalid FFT backend: %s" % str(backend))
+        _FFT_CONFIG["backend"] = backend
+
+    if nthreads is not None:
+        if nthreads == -1:
+            import multiprocessing
+            nthreads = multiprocessing.cpu_count()
+        _FFT_CONFIG["nthreads"] = int(nthreads)
+
+    if planner_effort is not None:
+        _FFT_CONFIG["planner_effort"] = planner_effort
+
+    if (old["nthreads"], old["planner_effort"]) != (_FFT_CONFIG["nthreads"], _FFT_CONFIG["planner_effort"]):
+        _FFTW_PLANS.clear()
+
+    if wisdom_file is not None and _FFT_CONFIG["backend"] == "pyfftw":
+        import os, pickle, pyfftw
+        if os.path.exists(wisdom_file):
+            with open(wisdom_file, "rb") as fh:
+                pyfftw.import_wisdom(pickle.load(fh))
+
+    return old
+
+
+def get_fft_backend():
+    """Return dictionary with the configuration of the FFT backend."""
+    return _FFT_CONFIG.copy()
+
+
+def save_fftw_wisdom(filepath):
+    """Save the FFTW wisdom accumulated by pyfftw in filepath."""
+    import pickle, pyfftw
+    with open(filepath, "wb") as fh:
+        pickle.dump(pyfftw.export_wisdom(), fh)
+
+
+def _fftn(arr, axes, inverse, out=None, overwrite_input=False):
+    """
+    Unnormalized forward (inverse=False) or normalized backward FFT of ``arr`` along ``axes``
+    with the global backend. Same conventions as numpy.fft.fftn and ifftn.
+
+    Args:
+        out: Optional complex array with the same shape as ``arr`` used to store the results.
+            Can be ``arr`` itself for in-place transforms.
+        overwrite_input: True if the input can be destroyed.
+    """
+    backend, nthreads = _FFT_CONFIG["backend"], _FFT_CONFIG["nthreads"]
+    axes = tuple(axes)
+
+    if backend == "pyfftw":
+        import pyfftw
+        key = (arr.shape, arr.dtype.str, axes, inverse, nthreads, overwrite_input)
+        plan = _FFTW_PLANS.get(key)
+        if plan is None:
+            builder = pyfftw.builders.ifftn if inverse else pyfftw.builders.fftn
+            plan = builder(pyfftw.empty_aligned(arr.shape, dtype=arr.dtype), axes=axes, threads=nthreads,
+                           planner_effort=_FFT_CONFIG["planner_effort"], overwrite_input=overwrite_input,
+                           avoid_copy=False)
+            _FFTW_PLANS[key] = plan
+        # The plan writes to an internal buffer that is reused by the next call.
+        res = plan(arr)
+        if out is None: return res.copy()
+        out[...] = res
+        return out
+
+    if backend == "scipy":
+        import scipy.fft
+        func = scipy.fft.ifftn if inverse else scipy.fft.fftn
+        res = func(arr, axes=axes, workers=nthreads, overwrite_x=overwrite_input)
+    else:
+        res = np.fft.ifftn(arr, axes=axes) if inverse else np.fft.fftn(arr, axes=axes)
+
+    if out is None: return res
+    out[...] = res
+    return out
+
+
 class Mesh3D(object):
     r"""
     Descriptor-class for uniform 3D meshes.
@@ -192,57 +320,69 @@ class Mesh3D(object):
         #shape = extra_dims + self.shape)
         return np.reshape(arr, (-1,) + self.shape)
 
-    def fft_r2g(self, fr, shift_fg=False):
+    def fft_r2g(self, fr, shift_fg=False, out=None, overwrite_input=False):
         """
         FFT of array ``fr`` given in real space.
+        The FFT library is selected with :func:`set_fft_backend`.
+
+        Args:
+            fr: Array with shape [..., nx, ny, nz] or [nx * ny * nz].
+            shift_fg: True if the output should be shifted with fftshift.
+            out: Optional complex array with the same shape as fr used to store the results.
+                Use ``out=fr`` for in-place transforms of complex arrays.
+            overwrite_input: True if the input array can be destroyed.
         """
         ndim, shape = fr.ndim, fr.shape
 
         if ndim == 1:
             fr = np.reshape(fr, self.shape)
-            return self.fft_r2g(fr, shift_fg=shift_fg).flatten()
-
-        elif ndim == 3:
-            assert self.size == np.prod(shape[-3:])
-            fg = fftn(fr)
-            if shift_fg: fg = fftshift(fg)
-
-        elif ndim > 3:
-            assert self.size == np.prod(shape[-3:])
-            axes = np.arange(ndim)[-3:]
-            fg = fftn(fr, axes=axes)
-            if shift_fg: fg = fftshift(fg, axes=axes)
+            if out is not None: out = np.reshape(out, self.shape)
+            return self.fft_r2g(fr, shift_fg=shift_fg, out=out, overwrite_input=overwrite_input).reshape(-1)
 
-        else:
+        if ndim < 3:
             raise NotImplementedError("ndim < 3 are not supported")
 
-        return fg / self.size
-
-    def fft_g2r(self, fg, fg_ishifted=False):
+        assert self.size == np.prod(shape[-3:])
+        axes = tuple(range(ndim))[-3:]
+        fg = _fftn(fr, axes, inverse=False, out=out, overwrite_input=overwrite_input)
+        if shift_fg:
+            fg = fftshift(fg, axes=axes)
+            if out is not None:
+                out[...] = fg
+                fg = out
+
+        fg /= self.size
+        return fg
+
+    def fft_g2r(self, fg, fg_ishifted=False, out=None, overwrite_input=False):
         """
         FFT of array ``fg`` given in G-space.
+        The FFT library is selected with :func:`set_fft_backend`.
+
+        Args:
+            fg: Array with shape [..., nx, ny, nz] or [nx * ny * nz].
+            fg_ishifted: True if the input has been shifted with fftshift.
+            out: Optional complex array with the same shape as fg used to store the results.
+                Use ``out=fg`` for in-place transforms of complex arrays.
+            overwrite_input: True if the input array can be destroyed.
         """
         ndim, shape = fg.ndim, fg.shape
 
         if ndim == 1:
             fg = np.reshape(fg, self.shape)
-            return self.fft_g2r(fg, fg_ishifted=fg_ishifted).flatten()
-
-        if ndim == 3:
-            assert self.size == np.prod(shape[-3:])
-            if fg_ishifted: fg = ifftshift(fg)
-            fr = ifftn(fg)
+            if out is not None: out = np.reshape(out, self.shape)
+            return self.fft_g2r(fg, fg_ishifted=fg_ishifted, out=out, overwrite_input=overwrite_input).reshape(-1)
 
-        elif ndim > 3:
-            assert self.size == np.prod(shape[-3:])
-            axes = np.arange(ndim)[-3:]
-            if fg_ishifted: fg = ifftshift(fg, axes=axes)
-            fr = ifftn(fg, axes=axes)
-
-        else:
+        if ndim < 3:
             raise NotImplementedError("ndim < 3 are not supported")
 
-        return fr * self.size
+        assert self.size == np.prod(shape[-3:])
+        axes = tuple(range(ndim))[-3:]
+        if fg_ishifted: fg = ifftshift(fg, axes=axes)
+        fr = _fftn(fg, axes, inverse=True, out=out, overwrite_input=overwrite_input)
+
+        fr *= self.size
+        return fr
 
     #def fourier_interp(self, data, new_mesh, inspace="r"):
     #    """
@@ -437,25 +577,14 @@ class Mesh3D(object):
         Given a list of points, this function return a |numpy-array| with the indices of the closest gridpoint.
         """
         points = np.reshape(points, (-1, 3))
-        inv_vectors = self.inv_vectors
-        fcoords = [np.dot(point, inv_vectors) for point in points]
-        inds = [[np.mod(int(np.rint(pc[ii]*self.shape[ii])), self.nx) for ii in range(3)] for pc in fcoords]
-        return np.array(inds)
-
-        # return [(int(np.rint(pc[ii]*self.nx)), int(np.rint(pc[0]*self.nx)),int(np.rint(pc[0]*self.nx))) for pc in coords]
-        # ix = int(np.rint(coords[0]*self.nx))
-        # iy = int(np.rint(coords[1]*self.ny))
-        # iz = int(np.rint(coords[2]*self.nz))
-        # return (ix, iy, iz)
-
-    # @DW TODO Add test.
-    def dist_gridpoints_in_spheres(self, points, radius):
-        # c_ab = np.cross(self.vectors[0], self.vectors[1])
-        # c_bc = np.cross(self.vectors[1], self.vectors[2])
-        # c_ca = np.cross(self.vectors[2], self.vectors[0])
-        # h_ab = np.abs(np.dot(c_ab, self.vectors[2]) / np.linalg.norm(c_ab))
-        # h_bc = np.abs(np.dot(c_bc, self.vectors[0]) / np.linalg.norm(c_bc))
-        # h_ca = np.abs(np.dot(c_ca, self.vectors[1]) / np.linalg.norm(c_ca))
+        fcoords = np.dot(points, self.inv_vectors)
+        return np.mod(np.rint(fcoords * self.shape).astype(np.int), self.shape)
+
+    def _sphere_search_box(self, radius):
+        """
+        Return the (mins, maxes) offsets in units of grid steps defining a box
+        that encloses a sphere of given radius centered on the closest grid point.
+        """
         maxdiag = max([np.linalg.norm(self.dvx+self.dvy+self.dvz),
                        np.linalg.norm(self.dvx+self.dvy-self.dvz),
                        np.linalg.norm(self.dvx-self.dvy+self.dvz),
@@ -469,31 +598,69 @@ class Mesh3D(object):
         a_factor = 1.01 * (radius+0.5*maxdiag) / h_bc
         b_factor = 1.01 * (radius+0.5*maxdiag) / h_ca
         c_factor = 1.01 * (radius+0.5*maxdiag) / h_ab
-        # print('HEIGHTS')
-        # print(h_ab, h_bc, h_ca)
-        # print(c_factor*h_ab, a_factor* h_bc, b_factor*h_ca)
         mins = np.array(np.floor([-a_factor, -b_factor, -c_factor]), dtype=int)
         maxes = np.array(np.ceil([a_factor, b_factor, c_factor]), dtype=int)
-        # print('AAAMINS AND MAXES', mins, maxes)
-        # maxes = np.ceil(nmax)
-        i_closest_gridpoint_points = self.i_closest_gridpoints(points=points)
-        dist_gridpoints_points = []
-        r2 = radius**2
-        for ipoint, point_i_closest_gridpoint in enumerate(i_closest_gridpoint_points):
-            pp = points[ipoint]
-            dist_gridpoints = []
-            for ix in range(int(mins[0]), int(maxes[0])):
-                ipx = point_i_closest_gridpoint[0] + ix
-                for iy in range(int(mins[1]), int(maxes[1])):
-                    ipy = point_i_closest_gridpoint[1] + iy
-                    for iz in range(int(mins[2]), int(maxes[2])):
-                        ipz = point_i_closest_gridpoint[2] + iz
-                        gp = ipx*self.dvx + ipy * self.dvy + ipz * self.dvz
-                        dist2_gp_pp = np.dot(pp-gp, pp-gp)
-                        if dist2_gp_pp <= r2:
-                            dist_gridpoints.append(((np.mod(ipx, self.nx), np.mod(ipy, self.ny), np.mod(ipz, self.nz)),
-                                                    np.sqrt(dist2_gp_pp), (ipx, ipy, ipz)))
-            dist_gridpoints_points.append(dist_gridpoints)
+        return mins, maxes
+
+    def get_gridpoints_in_spheres(self, points, radius):
+        """
+        Find the grid points (including periodic images) whose distance from
+        the given points is smaller than ``radius``. The search is vectorized over
+        the box of grid offsets enclosing the sphere so that only the loop over points is done in python.
+
+        Args:
+            points: Points in Cartesian coordinates. Array [npoints, 3].
+            radius: Radius of the sphere (same units as the mesh vectors).
+
+        Return: namedtuple with flat arrays (one entry per (grid point, point) pair):
+
+            - grid_inds: index of the grid point in the flattened mesh (C-order).
+            - point_inds: index of the point.
+            - dists: distance between the grid point and the point.
+            - images: [n, 3] integer indices of the grid point before the reduction to the unit cell.
+        """
+        points = np.reshape(points, (-1, 3))
+        mins, maxes = self._sphere_search_box(radius)
+        # Same order as the loops over ix, iy, iz.
+        offsets = np.reshape(np.mgrid[mins[0]:maxes[0], mins[1]:maxes[1], mins[2]:maxes[2]], (3, -1)).T
+        dvs = np.array([self.dvx, self.dvy, self.dvz])
+        r2 = radius ** 2
+
+        # Closest grid points without reduction to the unit cell so that the box is centered on the point.
+        iclosest_points = np.rint(np.dot(points, self.inv_vectors) * self.shape).astype(np.int)
+
+        images, point_inds, dists = [], [], []
+        for ipoint, (pp, iclosest) in enumerate(zip(points, iclosest_points)):
+            gp_images = iclosest + offsets
+            diffs = np.dot(gp_images, dvs) - pp
+            d2 = np.einsum("ij,ij->i", diffs, diffs)
+            mask = d2 <= r2
+            images.append(gp_images[mask])
+            dists.append(np.sqrt(d2[mask]))
+            point_inds.append(np.full(np.count_nonzero(mask), ipoint, dtype=np.int))
+
+        images = np.concatenate(images) if images else np.empty((0, 3), dtype=np.int)
+        dists = np.concatenate(dists) if dists else np.empty(0)
+        point_inds = np.concatenate(point_inds) if point_inds else np.empty(0, dtype=np.int)
+        grid_inds = np.ravel_multi_index(np.mod(images, self.shape).T, self.shape)
+
+        return dict2namedtuple(grid_inds=grid_inds, point_inds=point_inds, dists=dists, images=images)
+
+    def dist_gridpoints_in_spheres(self, points, radius):
+        """
+        Find the grid points whose distance from the given points is smaller than ``radius``.
+
+        Return: list with one entry per point. Each entry is a list of tuples
+            ((ix, iy, iz) reduced to the unit cell, distance, (ix, iy, iz) image)
+            See :meth:`get_gridpoints_in_spheres` for a version returning flat arrays.
+        """
+        res = self.get_gridpoints_in_spheres(points, radius)
+        images_uc = np.mod(res.images, self.shape)
+
+        dist_gridpoints_points = [[] for i in range(len(np.reshape(points, (-1, 3))))]
+        for ipoint, img_uc, dist, img in zip(res.point_inds, images_uc, res.dists, res.images):
+            dist_gridpoints_points[ipoint].append((tuple(img_uc), dist, tuple(img)))
+
         return dist_gridpoints_points
 
     # def dist2_gridpoints_in_spheres(self, points, radius):
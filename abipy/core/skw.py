@@ -5,21 +5,23 @@ For the theoretical background see :cite:`Euwema1969,Koelling1986,Pickett1988,Ma
 """
 from __future__ import print_function, division, unicode_literals, absolute_import
 
+import os
 import abc
-import itertools
 import pickle
 import six
 import numpy as np
 import scipy
 import time
 
-from collections import deque, OrderedDict
+from collections import OrderedDict
 from monty.termcolor import cprint
 from monty.collections import dict2namedtuple
 from pymatgen.util.plotting import add_fig_kwargs, get_ax_fig_plt
-from abipy.tools import gaussian
+from abipy.tools import gaussian, broadened_dos
+from abipy.core.tetrahedron import Tetrahedra
 from abipy.core.kpoints import Ktables, Kpath
 from abipy.core.symmetries import mati3inv
+import abipy.core.abinit_units as abu
 
 
 def n_fermi_dirac(enes, mu, temp):
@@ -138,6 +140,37 @@ class ElectronInterpolator(object):
     # Disable cache
     use_cache = True
 
+    # Disk cache with the results of the fit (|NpzDiskCache|). None if disabled, see `enable_disk_cache`.
+    disk_cache = None
+
+    # Max size (in bytes) of the workspace arrays allocated by `interp_kpts` when a block of k-points
+    # is interpolated in a single call to `eval_sk`. Used by subclasses to compute the size of the block.
+    kblock_max_nbytes = 32 * 1024 ** 2
+
+    @staticmethod
+    def enable_disk_cache(cache_dir=None, max_nbytes=1024 ** 3):
+        """
+        Activate the disk cache shared by all the interpolators. The results of the fit are stored
+        in compressed npz files identified by a hash of the input data so that the fit
+        is skipped if the interpolator is constructed again with the same arguments.
+
+        Args:
+            cache_dir: Directory used to store the files. Default: ~/.abinit/abipy/interp_cache
+            max_nbytes: Maximum size of the cache in bytes. Least recently used entries are removed first.
+
+        Return: |NpzDiskCache| object with hit/miss statistics.
+        """
+        from abipy.tools.diskcache import NpzDiskCache
+        if cache_dir is None:
+            cache_dir = os.path.join("~", ".abinit", "abipy", "interp_cache")
+        ElectronInterpolator.disk_cache = NpzDiskCache(cache_dir, max_nbytes=max_nbytes)
+        return ElectronInterpolator.disk_cache
+
+    @staticmethod
+    def disable_disk_cache():
+        """Deactivate the disk cache. Files are not removed."""
+        ElectronInterpolator.disk_cache = None
+
     @classmethod
     def pickle_load(cls, filepath):
         """Loads the object from a pickle file."""
@@ -182,15 +215,8 @@ class ElectronInterpolator(object):
         kshift = 0.0 if is_shift is None else 0.5 * np.asarray(is_shift)
         bz = (grid + kshift) / mesh
 
-        # All k-points and mapping to ir-grid points
-        bz2ibz = np.empty(len(bz), dtype=np.int)
-        for i, (ir_gp_id, gp) in enumerate(zip(mapping, grid)):
-            inds = np.where(uniq == ir_gp_id)
-            #print("inds", inds, "inds[0]", inds[0])
-            assert len(inds) == 1
-            bz2ibz[i] = inds[0]
-            #print("%3d ->%3d %s" % (i, ir_gp_id, (gp + [0.5, 0.5, 0.5]) / mesh))
-            #print("%3d ->%3d %s" % (i, ir_gp_id, (gp + kshift) / mesh))
+        # All k-points and mapping to ir-grid points (uniq is sorted).
+        bz2ibz = np.searchsorted(uniq, mapping)
 
         return dict2namedtuple(mesh=mesh, shift=kshift,
                                ibz=ibz, nibz=len(ibz), weights=weights,
@@ -282,6 +308,24 @@ class ElectronInterpolator(object):
                 "fermi-dirac": n_fermi_dirac,
             }[self.occtype](eigens, self.fermie, temp)
 
+    def get_tetrahedra(self, kmesh, is_shift=None):
+        """
+        Return |Tetrahedra| object for the linear tetrahedron method. Only unshifted meshes are supported.
+
+        Args:
+            kmesh: Three integers with the number of divisions along the reciprocal primitive axes.
+            is_shift: three integers (spglib API).
+        """
+        if is_shift is not None and np.any(np.asarray(is_shift) != 0):
+            raise ValueError("The tetrahedron method requires an unshifted mesh but is_shift: %s" % str(is_shift))
+
+        k = self.get_sampling(kmesh, is_shift)
+        bzgrid2ibz = np.empty(k.mesh, dtype=np.int)
+        bzgrid2ibz[tuple((k.grid % k.mesh).T)] = k.bz2ibz
+
+        # Reciprocal lattice vectors (rows). The 2 pi factor is not needed here.
+        return Tetrahedra(bzgrid2ibz, np.linalg.inv(self.cell[0]).T)
+
     def get_edos(self, kmesh, is_shift=None, method="gaussian", step=0.1, width=0.2, wmesh=None):
         """
         Compute the electron DOS on a linear mesh.
@@ -290,9 +334,10 @@ class ElectronInterpolator(object):
             kmesh: Three integers with the number of divisions along the reciprocal primitive axes.
             is_shift: three integers (spglib API). When is_shift is not None, the kmesh is shifted along
                 the axis in half of adjacent mesh points irrespective of the mesh numbers. None means unshited mesh.
-            method: String defining the method for the computation of the DOS.
+            method: String defining the method for the computation of the DOS: "gaussian", "lorentzian"
+                or "tetra" (linear tetrahedron method, requires an unshifted mesh).
             step: Energy step (eV) of the linear mesh.
-            width: Standard deviation (eV) of the gaussian.
+            width: Standard deviation (eV) of the gaussian or half-width at half-maximum of the lorentzian.
             mesh: Frequency mesh to use. If None, the mesh is computed automatically from the eigenvalues.
 
         Returns:
@@ -308,19 +353,23 @@ class ElectronInterpolator(object):
 
         # Compute the linear mesh.
         wmesh, step = self._get_wmesh_step(eigens, wmesh, step)
-        nw = len(wmesh)
-        values = np.zeros((self.nsppol, nw))
+        values = np.zeros((self.nsppol, len(wmesh)))
 
-        # TODO: Write cython version.
-        if method == "gaussian":
+        if method in ("gaussian", "lorentzian"):
+            weights = np.broadcast_to(k.weights[:, None], eigens.shape[1:])
             for spin in range(self.nsppol):
-                for ik, wtk in enumerate(k.weights):
-                    for band in range(self.nband):
-                        values[spin] += wtk * gaussian(wmesh, width, center=eigens[spin, ik, band])
+                values[spin] = broadened_dos(wmesh, eigens[spin], width, weights=weights, method=method)
 
             # Compute IDOS
             integral = scipy.integrate.cumtrapz(values, x=wmesh, initial=0.0)
 
+        elif method == "tetra":
+            tetra = self.get_tetrahedra(kmesh, is_shift=is_shift)
+            integral = np.zeros_like(values)
+            for spin in range(self.nsppol):
+                r = tetra.get_dos(eigens[spin], wmesh)
+                values[spin], integral[spin] = r.values, r.integral
+
         else:
             raise ValueError("Method %s is not supported" % method)
 
@@ -333,17 +382,22 @@ class ElectronInterpolator(object):
 
             :math:`\sum_{kbv} f_{vk} (1 - f_{ck}) \delta(\omega - E_{ck} + E_{vk})`
 
+        Only the "insulator" occupation scheme is supported.
+
         Args:
             kmesh: Three integers with the number of divisions along the reciprocal primitive axes.
             is_shift: three integers (spglib API). When is_shift is not None, the kmesh is shifted along
                 the axis in half of adjacent mesh points irrespective of the mesh numbers. None means unshited mesh.
-            method: String defining the method.
+            method: String defining the method: "gaussian" or "lorentzian".
             step: Energy step (eV) of the linear mesh.
-            width: Standard deviation (eV) of the gaussian.
+            width: Standard deviation (eV) of the gaussian or half-width at half-maximum of the lorentzian.
             wmesh: Frequency mesh to use. If None, the mesh is computed automatically from the eigenvalues.
 
         Returns:
         """
+        if self.occtype != "insulator":
+            raise ValueError("JDOS is only supported for occtype `insulator`, got `%s`" % self.occtype)
+
         k = self.get_sampling(kmesh, is_shift)
 
         # Interpolate eigenvalues in the IBZ.
@@ -353,36 +407,17 @@ class ElectronInterpolator(object):
             self._cache_eigens(kmesh, is_shift, eigens, "ibz")
 
         wmesh, step = self._get_w2mesh_step(eigens, wmesh, step)
-        nw = len(wmesh)
-        values = np.zeros((self.nsppol, nw))
-
-        if self.occtype == "insulator":
-            if method == "gaussian":
-                for spin in range(self.nsppol):
-                    for ik, wtk in enumerate(k.weights):
-                        for icb in range(self.val_ib + 1, self.nband):
-                            ec = eigens[spin, ik, icb]
-                            for icv in range(self.val_ib):
-                                ev = eigens[spin, ik, icv]
-                                values[spin] += wtk * gaussian(wmesh, width, center=ec-ev)
-            else:
-                raise ValueError("Method %s is not supported" % method)
+        values = np.zeros((self.nsppol, len(wmesh)))
 
+        if method in ("gaussian", "lorentzian"):
+            nval = self.val_ib + 1
+            # Transition energies with shape [nkibz, ncond, nval].
+            weights = np.broadcast_to(k.weights[:, None, None], (len(k.weights), self.nband - nval, nval))
+            for spin in range(self.nsppol):
+                ediffs = eigens[spin][:, nval:, None] - eigens[spin][:, None, :nval]
+                values[spin] = broadened_dos(wmesh, ediffs, width, weights=weights, method=method)
         else:
-            #occfacts = self.
-            if method == "gaussian":
-                for spin in range(self.nsppol):
-                    for ik, wtk in enumerate(k.weights):
-                        for icb in conduction:
-                            ec = eigens[spin, ik, icb]
-                            fc = 1.0 - occfacts[spin, ik, icb]
-                            for icv in valence:
-                                ev = eigens[spin, ik, icv]
-                                fv = occfacts[spin, ik, icv]
-                                fact = wtk * fv * fc
-                                values[spin] += fact * gaussian(wmesh, width, center=ec-ev)
-            else:
-                raise ValueError("Method %s is not supported" % method)
+            raise ValueError("Method %s is not supported" % method)
 
         if self.nsppol == 1: values *= 2.0
         integral = scipy.integrate.cumtrapz(values, x=wmesh, initial=0.0)
@@ -454,7 +489,7 @@ class ElectronInterpolator(object):
 
     def _get_wmesh_step(self, eigens, wmesh, step):
         if wmesh is not None:
-            return wesh, wmesh[1] - wmesh[0]
+            return wmesh, wmesh[1] - wmesh[0]
 
         # Compute the linear mesh.
         epad = 1.0
@@ -467,7 +502,7 @@ class ElectronInterpolator(object):
 
     def _get_w2mesh_step(self, eigens, wmesh, step):
         if wmesh is not None:
-            return wesh, wmesh[1] - wmesh[0]
+            return wmesh, wmesh[1] - wmesh[0]
 
         # Compute the linear mesh.
         cmin, cmax = +np.inf, -np.inf
@@ -693,17 +728,17 @@ class ElectronInterpolator(object):
         Returns: |matplotlib-Figure|
         """
         ax, fig, plt = get_ax_fig_plt(ax=ax)
-        kfrac_coords = self._get_kpts_kticks_klabels(ax, vertices_names, line_density)
+        kfrac_coords, _, _ = self._get_kpts_kticks_klabels(ax, vertices_names, line_density)
 
-        #v_skb = self.interp_kpts(kfrac_coords, dk1=v_skb)
+        v_skb = self.interp_vels_invmasses(kfrac_coords, with_invmass=False).vels
         for spin in range(self.nsppol):
             for band in range(self.nband):
                 # plot |v|
-                v_skb[spin, :, band]
+                vals = np.linalg.norm(v_skb[spin, :, band], axis=-1)
                 ax.plot(vals, color="k" if spin == 0 else "r")
 
         ax.grid(True)
-        ax.set_ylabel('Group Velocities')
+        ax.set_ylabel('Group Velocities (m/s)')
 
         return fig
 
@@ -733,17 +768,25 @@ class ElectronInterpolator(object):
         """
         Interpolate eigenvalues for all bands at a given (spin, k-point).
         Optionally compute gradients and Hessian matrices.
+        Subclasses must also accept a block of k-points given as a [nk, 3] array (see `interp_kpts`).
 
         Args:
             spin: Spin index.
-            kpt: K-point in reduced coordinates.
-            der1: If not None, ouput gradient is stored in der1[nband, 3].
-            der2: If not None, output Hessian is der2[nband, 3, 3].
+            kpt: K-point in reduced coordinates or [nk, 3] array with a block of k-points.
+            der1: If not None, ouput gradient is stored in der1[nband, 3] (der1[nk, nband, 3] for a block).
+            der2: If not None, output Hessian is der2[nband, 3, 3] (der2[nk, nband, 3, 3] for a block).
 
         Return:
-            oeigs[nband]
+            oeigs[nband] or oeigs[nk, nband] for a block of k-points.
         """
 
+    def get_kblock_size(self):
+        """
+        Return the number of k-points interpolated in a single call to `eval_sk` by `interp_kpts`.
+        Subclasses should use `kblock_max_nbytes` to bound the memory allocated for a block.
+        """
+        return 1
+
     def interp_kpts(self, kfrac_coords, dk1=False, dk2=False):
         """
         Interpolate energies on an arbitrary set of k-points. Optionally, compute
@@ -771,18 +814,51 @@ class ElectronInterpolator(object):
         dedk = None if not dk1 else np.empty((self.nsppol, new_nkpt, self.nband, 3))
         dedk2 = None if not dk2 else np.empty((self.nsppol, new_nkpt, self.nband, 3, 3))
 
+        # Interpolate blocks of k-points to bound the memory required by the star functions.
         der1, der2 = None, None
-        for spin in range(self.nsppol):
-            for ik, newk in enumerate(kfrac_coords):
-                if dk1: der1 = dedk[spin, ik]
-                if dk2: der2 = dedk2[spin, ik]
-                new_eigens[spin, ik] = self.eval_sk(spin, newk, der1=der1, der2=der2)
+        kblock = self.get_kblock_size()
+        for ks in range(0, new_nkpt, kblock):
+            ke = min(ks + kblock, new_nkpt)
+            for spin in range(self.nsppol):
+                if dk1: der1 = dedk[spin, ks:ke]
+                if dk2: der2 = dedk2[spin, ks:ke]
+                new_eigens[spin, ks:ke] = self.eval_sk(spin, kfrac_coords[ks:ke], der1=der1, der2=der2)
 
         if self.verbose:
             print("Interpolation completed in %.3f (s)" % (time.time() - start))
 
         return dict2namedtuple(eigens=new_eigens, dedk=dedk, dedk2=dedk2)
 
+    def interp_vels_invmasses(self, kfrac_coords, with_invmass=True):
+        """
+        Interpolate energies, band velocities and (optionally) inverse effective mass tensors
+        on an arbitrary set of k-points. Derivatives are computed analytically and converted
+        to Cartesian coordinates.
+
+        Args:
+            kfrac_coords: K-points in reduced coordinates.
+            with_invmass: True if the inverse effective mass tensors should be computed.
+
+        Return:
+            namedtuple with:
+            interpolated energies in eigens[nsppol, len(kfrac_coords), nband] (eV)
+            band velocities in vels[nsppol, len(kfrac_coords), nband, 3] (m/s)
+            inverse effective mass tensors in invmasses[nsppol, len(kfrac_coords), nband, 3, 3]
+            in units of 1/m_e. None if not `with_invmass`.
+        """
+        r = self.interp_kpts(kfrac_coords, dk1=True, dk2=with_invmass)
+
+        # k_cart = G^T k_red with G = 2pi (A^-1)^T hence d/dk_cart = A^T / 2pi d/dk_red.
+        # Lattice vectors in Angstrom along the rows. Derivatives are converted to atomic units.
+        lattice = np.asarray(self.cell[0]) / (2 * np.pi)
+        vels = np.matmul(r.dedk, lattice) * (abu.eV_Ha / abu.Bohr_Ang * abu.velocity_at_to_si)
+
+        invmasses = None
+        if with_invmass:
+            invmasses = np.matmul(np.matmul(lattice.T, r.dedk2), lattice) * (abu.eV_Ha / abu.Bohr_Ang ** 2)
+
+        return dict2namedtuple(eigens=r.eigens, vels=vels, invmasses=invmasses)
+
     def interp_kpts_and_enforce_degs(self, kfrac_coords, ref_eigens, atol=1e-4):
         """
         Interpolate energies on an arbitrary set of k-points. Use `ref_eigens`
@@ -822,7 +898,7 @@ class SkwInterpolator(ElectronInterpolator):
     """
 
     def __init__(self, lpratio, kpts, eigens, fermie, nelect, cell, symrel, has_timrev,
-                 filter_params=None, verbose=1):
+                 filter_params=None, single_precision=False, verbose=1):
         """
         Args:
             lpratio: Ratio between the number of star-functions and the number of ab-initio k-points.
@@ -840,9 +916,12 @@ class SkwInterpolator(ElectronInterpolator):
             has_timrev: True is time-reversal can be used.
             filter_params: List with parameters used to filter high-frequency components (Eq 9 of PhysRevB.61.1639)
                 First item gives rcut, second item sigma. Ignored if None.
+            single_precision: True if star functions and coefficients should be stored in single precision
+                (complex64) to reduce memory when nband is large. The linear system is always solved in double precision.
             verbose: Verbosity level.
         """
         self.verbose = verbose
+        self.cdtype = np.complex64 if single_precision else np.complex
         self.cell = cell
         lattice = self.cell[0]
         self.original_fermie = fermie
@@ -871,11 +950,22 @@ class SkwInterpolator(ElectronInterpolator):
         if self.verbose:
             print("Found", self.ptg_nsym, "symmetries in point group")
 
-        # Find nrwant star points.
         self.lpratio = lpratio = int(lpratio)
         if lpratio <= 1:
             raise ValueError("lpratio must be > 1 but got %s" % lpratio)
 
+        # Try to read the results of the fit from the disk cache.
+        cache = self.disk_cache
+        if cache is not None:
+            cache_key = cache.hash_data("SkwInterpolator", kpts, eigens, self.ptg_symrel, lattice, lpratio,
+                                        filter_params, np.dtype(self.cdtype).name)
+            data = cache.load(cache_key)
+            if data is not None:
+                self._init_from_cache_data(data, filter_params)
+                return
+
+        # Find nrwant star points.
+
         nrwant = lpratio * self.nkpt
         fact = 1/2 if has_inversion else 1
         rmax = int((1.0 + (lpratio * self.nkpt * self.ptg_nsym * fact) / 2.0) ** (1/3.)) * np.ones(3, dtype=np.int)
@@ -900,56 +990,48 @@ class SkwInterpolator(ElectronInterpolator):
 
         # Construct star functions for the ab-initio k-points.
         nsppol, nband, nkpt, nr = self.nsppol, self.nband, self.nkpt, self.nr
-        self.skr = np.empty((nkpt, nr), dtype=np.complex)
-        for ik, kpt in enumerate(kpts):
-            self.skr[ik] = self.get_stark(kpt)
-
-        # Build H(k,k') matrix (Hermitian)
-        hmat = np.empty((nkpt-1, nkpt-1), dtype=np.complex)
-        for jk in range(nkpt-1):
-            v_jkr = self.skr[jk, 1:] - self.skr[nkpt-1, 1:]
-            #for ik in range(jk + 1):
-            for ik in range(nkpt-1):
-                v_ikr = inv_rhor[1:] * (self.skr[ik, 1:] - self.skr[nkpt-1, 1:])
-                hmat[ik, jk] = np.vdot(v_jkr, v_ikr)
-                if ik == jk: hmat[ik, jk] = hmat[ik, jk].real
+        self.skr = self.get_stark_kpts(kpts)
 
-        # Solving system of linear equations to get lambda coeffients (eq. 10 of PRB 38 2721)..."
-        de_kbs = np.empty((nkpt-1, nband, nsppol), dtype=np.complex)
-        for spin in range(nsppol):
-            for ib in range(nband):
-                de_kbs[:, ib, spin] = eigens[spin, 0:nkpt-1, ib] - eigens[spin, nkpt-1, ib]
+        # Build H(k,k') matrix (Hermitian) with a single weighted Gram product:
+        # H = D diag(1/rho) D^H where D[k,R] = S_R(k) - S_R(k_nkpt) and R != 0.
+        start = time.time()
+        dskr = self.skr[:nkpt-1, 1:].astype(np.complex) - self.skr[nkpt-1, 1:]
+        hmat = np.matmul(dskr * inv_rhor[1:], dskr.conj().T)
+        hmat[np.diag_indices_from(hmat)] = hmat.diagonal().real
 
-        # Solve all bands and spins at once
-        # FIXME: Portability problem with scipy 0.19 in which linalg.solve wraps the expert drivers
-        # http://scipy.github.io/devdocs/release.0.19.0.html#foreign-function-interface-improvements
-        if scipy.__version__ == "0.19.0":
-            import warnings
-            warnings.warn("linalg.solve in scipy 0.19.0 gives weird results. Use at your own risk!!!")
+        # Solving system of linear equations to get lambda coeffients (eq. 10 of PRB 38 2721)..."
+        # Solve all bands and spins at once. H is Hermitian positive definite so we try Cholesky first.
+        # de_kbs has shape [nkpt-1, nsppol * nband]
+        de_kbs = eigens[:, 0:nkpt-1, :] - eigens[:, nkpt-1:nkpt, :]
+        de_kbs = np.reshape(np.transpose(de_kbs, (1, 0, 2)), (nkpt-1, nsppol * nband))
 
         try:
-            lmb_kbs = scipy.linalg.solve(hmat, np.reshape(de_kbs, (-1, nband * nsppol)))
-            #lmb_kbs = scipy.linalg.solve(hmat, np.reshape(de_kbs, (-1, nband * nsppol)),
-                    #sym_pos=True, lower=False, overwrite_a=True, overwrite_b=True, check_finite=False)
-                    #sym_pos=False, lower=False, overwrite_a=False, overwrite_b=False, check_finite=True)
-
-        except scipy.linalg.LinAlgError as exc:
-            print("Cannot solve system of linear equations to get lambda coeffients (eq. 10 of PRB 38 2721)")
-            print("This usually happens when there are symmetrical k-points passed to the interpolator.")
-            raise exc
-
-        lmb_kbs = np.reshape(lmb_kbs, (-1, nband, nsppol))
-
-        # Compute coefficients.
-        self.coefs = np.empty((nsppol, nband, nr), dtype=np.complex)
-        for spin in range(nsppol):
-            for ib in range(nband):
-                for ir in range(1, nr):
-                    self.coefs[spin, ib, ir] = inv_rhor[ir] \
-                        * np.vdot(self.skr[:nkpt-1, ir] - self.skr[nkpt-1, ir], lmb_kbs[:nkpt-1, ib, spin])
-
-                self.coefs[spin, ib, 0] = eigens[spin, nkpt-1, ib] \
-                    - np.dot(self.coefs[spin, ib, 1:nr], self.skr[nkpt-1, 1:nr])
+            lmb_kbs = scipy.linalg.cho_solve(scipy.linalg.cho_factor(hmat, lower=False, overwrite_a=False), de_kbs)
+
+        except scipy.linalg.LinAlgError:
+            if self.verbose: print("Cholesky factorization failed. Using generic solver.")
+            # FIXME: Portability problem with scipy 0.19 in which linalg.solve wraps the expert drivers
+            # http://scipy.github.io/devdocs/release.0.19.0.html#foreign-function-interface-improvements
+            if scipy.__version__ == "0.19.0":
+                import warnings
+                warnings.warn("linalg.solve in scipy 0.19.0 gives weird results. Use at your own risk!!!")
+
+            try:
+                lmb_kbs = scipy.linalg.solve(hmat, de_kbs)
+
+            except scipy.linalg.LinAlgError as exc:
+                print("Cannot solve system of linear equations to get lambda coeffients (eq. 10 of PRB 38 2721)")
+                print("This usually happens when there are symmetrical k-points passed to the interpolator.")
+                raise exc
+
+        # Compute coefficients:
+        # c[s,b,R] = 1/rho(R) sum_k conj(D[k,R]) lambda[k,s,b] for R != 0, c[s,b,0] fixed by the last k-point.
+        # [nsppol * nband, nkpt-1] x [nkpt-1, nr-1] --> [nsppol * nband, nr-1]
+        self.coefs = np.empty((nsppol, nband, nr), dtype=self.cdtype)
+        coefs_r = np.matmul(lmb_kbs.T, dskr.conj()) * inv_rhor[1:]
+        self.coefs[:, :, 1:] = np.reshape(coefs_r, (nsppol, nband, nr - 1))
+        self.coefs[:, :, 0] = eigens[:, nkpt-1, :] - np.matmul(coefs_r, self.skr[nkpt-1, 1:]).reshape(nsppol, nband)
+        if self.verbose: print("Linear algebra for the fit completed in %.3f (s)" % (time.time() - start))
 
         # Filter high-frequency.
         self.rcut, self.rsigma = None, None
@@ -962,22 +1044,22 @@ class SkwInterpolator(ElectronInterpolator):
             for ir in range(1, nr):
                 self.coefs[:, :, ir] *= 0.5 * erfc((np.sqrt(r2vals[ir]) - self.rcut) / self.rsigma)
 
-        # Prepare workspace arrays for star functions.
-        self.cached_kpt = np.ones(3) * np.inf
-        self.cached_kpt_dk1 = np.ones(3) * np.inf
-        self.cached_kpt_dk2 = np.ones(3) * np.inf
+        # Prepare workspace arrays for star functions (star functions for the ab-initio k-points are already available).
+        self.cached_skr, self.cached_kpt = self.skr, np.reshape(kpts, (-1, 3)).copy()
+        self.cached_kpt_dk1 = np.ones((1, 3)) * np.inf
+        self.cached_kpt_dk2 = np.ones((1, 3)) * np.inf
 
         # Compare ab-initio data with interpolated results.
         mae = 0.0
         for spin in range(nsppol):
-            for ik, kpt in enumerate(kpts):
-                skw_eb = self.eval_sk(spin, kpt)
-                mae += np.abs(eigens[spin, ik] - skw_eb).sum()
-                if self.verbose >= 10:
-                    # print interpolated eigenvales
+            skw_ekb = self.eval_sk(spin, kpts)
+            mae += np.abs(eigens[spin] - skw_ekb).sum()
+            if self.verbose >= 10:
+                # print interpolated eigenvales
+                for ik in range(nkpt):
                     for band in range(self.nband):
                         e0 = eigens[spin, ik, band]
-                        eskw = skw_eb[band]
+                        eskw = skw_ekb[ik, band]
                         print("spin", spin, "band", band, "ikpt", ik, "e0", e0, "eskw", eskw, "diff", e0 - eskw)
 
         mae *= 1e3 / (nsppol * nkpt * nband)
@@ -993,6 +1075,31 @@ class SkwInterpolator(ElectronInterpolator):
 
         self.mae = mae
 
+        if cache is not None:
+            cache.save(cache_key, rpts=self.rpts, r2vals=r2vals, coefs=self.coefs, mae=mae)
+
+    def _init_from_cache_data(self, data, filter_params):
+        """
+        Initialize the object from the arrays stored in the disk cache.
+        Star functions for the ab-initio k-points are not available in this case (self.skr is None).
+        """
+        self.rpts, self.coefs, self.mae = data["rpts"], data["coefs"], float(data["mae"])
+        self.nr = len(self.rpts)
+        self.skr = None
+
+        self.rcut, self.rsigma = None, None
+        if filter_params is not None:
+            self.rcut = filter_params[0] * np.sqrt(data["r2vals"][-1])
+            self.rsigma = filter_params[1]
+
+        self.cached_kpt = np.ones((1, 3)) * np.inf
+        self.cached_kpt_dk1 = np.ones((1, 3)) * np.inf
+        self.cached_kpt_dk2 = np.ones((1, 3)) * np.inf
+
+        if self.verbose:
+            print("Fit results read from disk cache. Using:", self.nr, "star-functions.",
+                  "Mean Absolute Error= %.3e (meV)" % self.mae)
+
     def __str__(self):
         return self.to_string()
 
@@ -1010,41 +1117,60 @@ class SkwInterpolator(ElectronInterpolator):
 
         return "\n".join(lines)
 
+    def get_kblock_size(self):
+        """
+        Return the number of k-points interpolated in a single call to `eval_sk` by `interp_kpts`.
+        The phases exp(i 2pi k.SR) computed in `get_stark_kpts` require ptg_nsym * nr complex numbers per k-point
+        while the 2nd-order derivatives of the star functions require 9 * nr complex numbers per k-point.
+        """
+        return max(1, int(self.kblock_max_nbytes // (max(self.ptg_nsym, 10) * self.nr * 16)))
+
     def eval_sk(self, spin, kpt, der1=None, der2=None):
         """
-        Interpolate eigenvalues for all bands at a given (spin, k-point).
+        Interpolate eigenvalues for all bands at a given (spin, k-point) or for a block of k-points.
         Optionally compute gradients and Hessian matrices.
 
         Args:
             spin: Spin index.
-            kpt: K-point in reduced coordinates.
-            der1: If not None, ouput gradient is stored in der1[nband, 3].
-            der2: If not None, output Hessian is der2[nband, 3, 3].
+            kpt: K-point in reduced coordinates or [nk, 3] array with a block of k-points.
+            der1: If not None, ouput gradient is stored in der1[nband, 3] (der1[nk, nband, 3] for a block).
+            der2: If not None, output Hessian is der2[nband, 3, 3] (der2[nk, nband, 3, 3] for a block).
 
         Return:
-            oeigs[nband]
+            oeigs[nband] or oeigs[nk, nband] for a block of k-points.
         """
-        # [NB, NR] x [NR]
-        oeigs = np.matmul(self.coefs[spin], self.get_stark(kpt))
+        is_block = np.ndim(kpt) == 2
+        kpts = np.reshape(kpt, (-1, 3))
+
+        # Compute star functions for this block of k-points (if not already in memory)
+        if self.cached_kpt.shape != kpts.shape or np.any(kpts != self.cached_kpt):
+            self.cached_skr, self.cached_kpt = self.get_stark_kpts(kpts), kpts.copy()
+
+        # [NB, NR] x [NR, NK] --> [NK, NB]
+        oeigs = np.matmul(self.coefs[spin], self.cached_skr.T).T
         if not self.iscomplexobj: oeigs = oeigs.real
 
         if der1 is not None:
-            skr_dk1 = self.get_stark_dk1(kpt)
-            for ii in range(3):
-                value = np.matmul(self.coefs[spin, :, :], skr_dk1[ii])
-                if not self.iscomplexobj: value = value.real
-                der1[:, ii] = value
+            if not is_block: der1 = der1[None]
+            if self.cached_kpt_dk1.shape != kpts.shape or np.any(kpts != self.cached_kpt_dk1):
+                self.cached_skr_dk1, self.cached_kpt_dk1 = self.get_stark_kpts_dk1(kpts), kpts.copy()
+
+            # [NK * 3, NR] x [NR, NB] --> [NK, 3, NB]
+            values = np.matmul(self.cached_skr_dk1.reshape(-1, self.nr), self.coefs[spin].T)
+            if not self.iscomplexobj: values = values.real
+            der1[...] = np.reshape(values, (-1, 3, self.nband)).transpose(0, 2, 1)
 
         if der2 is not None:
-            skr_dk2 = self.get_stark_dk2(kpt)
-            for jj in range(3):
-                for ii in range(jj + 1):
-                    value = np.matmul(self.coefs[spin, :, :], skr_dk2[ii,jj])
-                    if not self.iscomplexobj: value = value.real
-                    der2[:, ii, jj] = value
-                    if ii != jj: der2[jj, ii] = der2[ii, jj]
+            if not is_block: der2 = der2[None]
+            if self.cached_kpt_dk2.shape != kpts.shape or np.any(kpts != self.cached_kpt_dk2):
+                self.cached_skr_dk2, self.cached_kpt_dk2 = self.get_stark_kpts_dk2(kpts), kpts.copy()
 
-        return oeigs
+            # [NK * 9, NR] x [NR, NB] --> [NK, 3, 3, NB]
+            values = np.matmul(self.cached_skr_dk2.reshape(-1, self.nr), self.coefs[spin].T)
+            if not self.iscomplexobj: values = values.real
+            der2[...] = np.reshape(values, (-1, 3, 3, self.nband)).transpose(0, 3, 1, 2)
+
+        return oeigs if is_block else oeigs[0]
 
     #def eval_skb(self, spin, kpt, band, der1=None, der2=None):
     #    """
@@ -1101,16 +1227,130 @@ class SkwInterpolator(ElectronInterpolator):
         Return:
             complex array of shape [self.nr]
         """
-        two_pi = 2.0 * np.pi
-        skr = np.zeros(self.nr, dtype=np.complex)
-        _np_exp = np.exp
-        for omat in self.ptg_symrel:
-            sk = two_pi * np.matmul(omat.T, kpt)
-            skr += _np_exp(1.j * np.matmul(self.rpts, sk))
-        skr /= self.ptg_nsym
+        return self.get_stark_kpts(np.reshape(kpt, (1, 3)))[0]
 
+    def get_stark_kpts(self, kpts):
+        """
+        Return the star functions for a block of k-points.
+        The phases are computed with a single matrix product over all the (S, R) pairs,
+        k-points are processed in chunks to bound the memory.
+
+        Args:
+            kpts: [nk, 3] numpy array with k-points in reduced coordinates.
+
+        Return:
+            complex array of shape [nk, self.nr]
+        """
+        kpts = np.reshape(kpts, (-1, 3))
+        nops = self._get_srpts().shape[1] // self.nr
+        skr = np.empty((len(kpts), self.nr), dtype=getattr(self, "cdtype", np.complex))
+
+        for ks, ke, vals in self._iter_phases(kpts, nwork=0):
+            skr[ks:ke] = vals.sum(axis=1)
+
+        skr /= nops
         return skr
 
+    def get_stark_kpts_dk1(self, kpts):
+        """
+        Compute the 1st-order derivative of the star functions wrt k for a block of k-points.
+
+        Args:
+            kpts: [nk, 3] numpy array with k-points in reduced coordinates.
+
+        Return:
+            complex array [nk, 3, self.nr] with the derivative of the
+            star functions wrt k in reduced coordinates.
+        """
+        kpts = np.reshape(kpts, (-1, 3))
+        srpts = self._get_srpts()
+        nops = srpts.shape[1] // self.nr
+        srpts = np.reshape(srpts, (3, nops, self.nr))
+
+        skr_dk1 = np.empty((len(kpts), 3, self.nr), dtype=getattr(self, "cdtype", np.complex))
+        for ks, ke, vals in self._iter_phases(kpts, nwork=3, dk=1):
+            skr_dk1[ks:ke] = np.einsum("kor,ior->kir", vals, srpts)
+
+        # d/dk e^{i 2pi k.SR} = i 2pi SR e^{i 2pi k.SR} (-2pi SR sin(2pi k.SR) if inversion).
+        skr_dk1 *= (-2 * np.pi if self.ptg_has_inversion else 2j * np.pi) / nops
+        return skr_dk1
+
+    def get_stark_kpts_dk2(self, kpts):
+        """
+        Compute the 2nd-order derivatives of the star functions wrt k for a block of k-points.
+
+        Args:
+            kpts: [nk, 3] numpy array with k-points in reduced coordinates.
+
+        Return:
+            Complex numpy array of shape [nk, 3, 3, self.nr] with the 2nd-order derivatives
+            of the star functions wrt k in reduced coordinates.
+        """
+        kpts = np.reshape(kpts, (-1, 3))
+        srpts = self._get_srpts()
+        nops = srpts.shape[1] // self.nr
+        srpts = np.reshape(srpts, (3, nops, self.nr))
+
+        # Products SR_i SR_j for the 6 independent (i <= j) components.
+        iis, jjs = np.triu_indices(3)
+        sr2 = srpts[iis] * srpts[jjs]
+
+        skr_dk2 = np.empty((len(kpts), 3, 3, self.nr), dtype=getattr(self, "cdtype", np.complex))
+        for ks, ke, vals in self._iter_phases(kpts, nwork=6):
+            work = np.einsum("kor,por->kpr", vals, sr2)
+            skr_dk2[ks:ke, iis, jjs] = work
+            skr_dk2[ks:ke, jjs, iis] = work
+
+        skr_dk2 *= -(2 * np.pi) ** 2 / nops
+        return skr_dk2
+
+    def _iter_phases(self, kpts, nwork=0, dk=0):
+        """
+        Generator over chunks of k-points. Yield (ks, ke, vals) where `vals` is a [ke - ks, nops, nr] array
+        with cos(2pi k.SR) if the point group has the inversion (sin(2pi k.SR) if `dk` == 1)
+        else exp(i 2pi k.SR). `nwork` gives the number of additional [nops, nr] arrays per k-point
+        allocated by the caller and it is used to compute the size of the chunk.
+        """
+        nk, nr = len(kpts), self.nr
+        srpts = self._get_srpts()
+        nops = srpts.shape[1] // nr
+        has_inv = self.ptg_has_inversion
+
+        kblock = max(1, int(self.kblock_max_nbytes // (nops * nr * 16 * (1 + nwork))))
+        for ks in range(0, nk, kblock):
+            ke = min(ks + kblock, nk)
+            arg = 2.0 * np.pi * np.matmul(kpts[ks:ke], srpts)
+            if has_inv:
+                vals = np.sin(arg) if dk == 1 else np.cos(arg)
+            else:
+                vals = np.exp(1.j * arg)
+            yield ks, ke, vals.reshape(ke - ks, nops, nr)
+
+    def _get_srpts(self):
+        """
+        Return [3, nops * nr] array with the R-points rotated by the operations of the point group.
+        If the inversion belongs to the point group, only one operation for each (S, -S) pair
+        is used (nops = ptg_nsym / 2) since the two terms give complex conjugated phases.
+        """
+        if getattr(self, "_srpts", None) is None:
+            ops = self.ptg_symrel
+            if self.ptg_has_inversion:
+                ops = []
+                for rot in self.ptg_symrel:
+                    if not any(np.all(rot == -o) for o in ops): ops.append(rot)
+                ops = np.array(ops)
+
+            # [nops, 3, 3] x [3, nr] --> [nops, 3, nr] --> [3, nops, nr]
+            srpts = np.matmul(ops, self.rpts.T).transpose(1, 0, 2)
+            self._srpts = np.reshape(srpts, (3, -1)).copy()
+
+        return self._srpts
+
+    @property
+    def ptg_has_inversion(self):
+        """True if the inversion belongs to the point group."""
+        return any(np.all(s == -np.eye(3, dtype=np.int)) for s in self.ptg_symrel)
+
     def get_stark_dk1(self, kpt):
         """
         Compute the 1st-order derivative of the star function wrt k
@@ -1122,20 +1362,7 @@ class SkwInterpolator(ElectronInterpolator):
             complex array [3, self.nr]  with the derivative of the
             star function wrt k in reduced coordinates.
         """
-        srk_dk1 = np.zeros((3, self.nr), dtype=np.complex)
-        two_pi = 2.0 * np.pi
-        rpts_t = self.rpts.T
-
-        for omat in self.ptg_symrel:
-            sk = two_pi * np.matmul(omat.T, kpt)
-            exp_skr = np.exp(1.j * np.matmul(self.rpts, sk))
-            for ir, rr in enumerate(self.rpts):
-                srk_dk1[:, ir] += exp_skr[ir] * np.matmul(omat, rr)
-            #for ir, or in enumerate(np.matmul(omat, rpts_t).T):
-            #    srk_dk1[:, ir] += exp_skr[ir] * or
-
-        srk_dk1 *= 1.j / self.ptg_nsym
-        return srk_dk1
+        return self.get_stark_kpts_dk1(np.reshape(kpt, (1, 3)))[0]
 
     def get_stark_dk2(self, kpt):
         """
@@ -1148,26 +1375,7 @@ class SkwInterpolator(ElectronInterpolator):
             Complex numpy array of shape [3, 3, self.nr] with the 2nd-order derivatives
             of the star function wrt k in reduced coordinates.
         """
-        srk_dk2 = np.zeros((3, 3, self.nr), dtype=np.complex)
-        raise NotImplementedError()
-        #work = zero
-        #do isym=1,self.ptg_nsym
-        #   sk = two_pi * matmul(transpose(self%ptg_symrel(:,:,isym)), kpt)
-        #   do ir=1,self%nr
-        #     sr = matmul(self%ptg_symrel(:,:,isym), self%rpts(:,ir))
-        #     eiskr = exp(j_dpc * dot_product(sk, self%rpts(:,ir)))
-        #     do jj=1,3
-        #        do ii=1,jj
-        #            work(ii,jj,ir) = work(ii,jj,ir) + eiskr * sr(ii) * sr(jj)
-
-        #work = - work / self.ptg_nsym
-
-        #do jj=1,3
-        #   do ii=1,jj
-        #       srk_dk2(:, ii, jj) = work(ii, jj, :)
-        #       if (ii /= jj) srk_dk2(:,jj,ii) = work(:,ii,jj)
-
-        return srk_dk2
+        return self.get_stark_kpts_dk2(np.reshape(kpt, (1, 3)))[0]
 
     #def find_stationary_points(self, kmesh, bstart=None, bstop=None, is_shift=None)
     #    k = self.get_sampling(kmesh, is_shift)
@@ -1199,91 +1407,48 @@ class SkwInterpolator(ElectronInterpolator):
             tuple: (rpts, r2vals, ok)
         """
         msize = (2 * rmax + 1).prod()
-        rtmp = np.empty((msize, 3), dtype=np.int)
-        r2tmp = np.empty(msize)
         if self.verbose: print("rmax", rmax, "msize:", msize)
 
         start = time.time()
-        for cnt, l in enumerate(itertools.product(range(-rmax[0], rmax[0] + 1),
-            range(-rmax[1], rmax[1] + 1), range(-rmax[2], rmax[2] + 1))):
-              rtmp[cnt] = l
-              r2tmp[cnt] = np.dot(l, np.matmul(self.rmet, l))
+        # Same ordering as itertools.product(range(-rmax[0], rmax[0] + 1), ...)
+        rtmp = np.indices(2 * rmax + 1).reshape(3, -1).T - rmax
+        r2tmp = np.einsum("ri,ij,rj->r", rtmp, self.rmet, rtmp)
         if self.verbose: print("gen points", time.time() - start)
 
-        start = time.time()
         # Sort r2tmp and rtmp
         iperm = np.argsort(r2tmp)
         r2tmp = r2tmp[iperm]
         rtmp = rtmp[iperm]
-        #return rtmp, r2tmp, True
-
-        # Find shells
-        r2sh = np.empty(msize, dtype=np.int)    # Correspondence between R and shell index.
-        shlim = np.empty(msize, dtype=np.int)   # For each shell, the index of the initial G-vector.
-        nsh = 1
-        r2sh[0] = 0
-        shlim[0] = 0
-        r2_prev = 0.0
-        for ir in range(1, msize):
-            if (abs(r2tmp[ir] - r2_prev) > r2tmp[ir] * 1e-8):
-                r2_prev = r2tmp[ir]
-                shlim[nsh] = ir
-                nsh += 1
-            r2sh[ir] = nsh
-        shlim[nsh] = msize
-        if self.verbose:
-            print("nshells", nsh)
-            print("shells", time.time() - start)
 
         # Find R-points generating the stars.
-        # This is the most CPU critical part. I think it's difficult to do better than this without cython
-        start = time.time()
-        rgen = deque()
-
-        for ish in range(nsh):
-            ss, ee = shlim[ish], shlim[ish + 1]
-            if ss + 1 == ee:
-                rgen.append(rtmp[ss])
-                continue
-
-            if True:
-                # This is faster
-                rs = set([tuple(rtmp[ss])])
-                for ir in range(ss + 1, ee):
-                    rvec = rtmp[ir]
-                    if all(tuple(np.matmul(rot, rvec)) not in rs for rot in self.ptg_symrel):
-                        rs.add(tuple(rvec))
-            else:
-                rs = deque([rtmp[ss]])
-                for ir in range(ss + 1, ee):
-                    for rot in self.ptg_symrel:
-                        rot_r = np.matmul(rot, rtmp[ir])
-                        if any(np.all(rot_r == x) for x in rs): break
-                    else:
-                        # We have new R-point.
-                        #print("Adding new point")
-                        rs.append(rtmp[ir])
-
-            #print(len(rs), rs)
-            rgen.extend(rs)
-        #print(rgen)
-        if self.verbose: print("stars", time.time() - start)
-
+        # Each R is mapped to an integer key that identifies its star (min of the keys of the rotated points)
+        # so that the generators are given by the first occurrence of each key in the sorted list.
+        # Points are processed in chunks to bound the memory used for the [nsym, nchunk, 3] rotated points.
         start = time.time()
-        rgen = np.array(rgen, dtype=np.int)
+        lmax = np.abs(self.ptg_symrel).sum(axis=2).max() * rmax.max()
+        base = 2 * lmax + 1
+        star_keys = np.empty(msize, dtype=np.int64)
+        chunk = max(1, 4 * 1024 ** 2 // self.ptg_nsym)
+        for cs in range(0, msize, chunk):
+            ce = min(cs + chunk, msize)
+            # [nsym, 3, 3] x [3, nc] --> [nsym, 3, nc]
+            rot_r = np.matmul(self.ptg_symrel, rtmp[cs:ce].T).astype(np.int64) + lmax
+            keys = (rot_r[:, 0] * base + rot_r[:, 1]) * base + rot_r[:, 2]
+            star_keys[cs:ce] = keys.min(axis=0)
+
+        _, first_inds = np.unique(star_keys, return_index=True)
+        rgen = rtmp[np.sort(first_inds)]
         nstars = len(rgen)
+        if self.verbose: print("stars", time.time() - start)
 
         # Store rpts and compute ||R||**2.
         ok = nstars >= nrwant
         nr = min(nstars, nrwant)
-        rpts = rgen[:nr].copy()
-        r2vals = np.empty(nr)
-        for ir in range(nr):
-            r2vals[ir] = np.dot(rpts[ir], np.matmul(self.rmet, rpts[ir]))
+        rpts = np.array(rgen[:nr], dtype=np.int)
+        r2vals = np.einsum("ri,ij,rj->r", rpts, self.rmet, rpts)
 
         if self.verbose:
             print("r2max ", rpts[nr-1])
-            print("end ", time.time() - start)
             if self.verbose > 10:
                 print("nstars:", nstars)
                 for r, r2 in zip(rpts, r2vals):
@@ -134,6 +134,21 @@ class TestScalarField(AbipyTest):
         self.assert_almost_equal(df["rsph_ang"].values, 2 * [1.11])
         df = si_den.integrate_in_spheres(rcut_symbol=2, out=False)
 
+        # Several radii in one pass (small chunks to test the blocking over G-vectors).
+        df_radii = si_den.integrate_in_spheres(rcut_symbol={"Si": [1.11, 2]}, max_nbytes=1024)
+        assert len(df_radii) == 4
+        self.assert_almost_equal(df_radii["ntot"].values[::2], 2 * [2.010537])
+        self.assert_almost_equal(df_radii["ntot"].values[1::2], df["ntot"].values)
+
+        # Non-collinear density with (n, mx, my, mz) components.
+        datar = np.array([si_den.datar[0], 0.1 * si_den.datar[0], 0 * si_den.datar[0], 0.2 * si_den.datar[0]])
+        nc_den = Density(nspinor=2, nsppol=1, nspden=4, datar=datar, structure=si_den.structure, iorder="c")
+        df_nc = nc_den.integrate_in_spheres(rcut_symbol=2)
+        self.assert_almost_equal(df_nc["ntot"].values, df["ntot"].values)
+        self.assert_almost_equal(df_nc["mx"].values, 0.1 * df["ntot"].values)
+        self.assert_almost_equal(df_nc["my"].values, 0)
+        self.assert_almost_equal(df_nc["nup"].values - df_nc["ndown"].values, 0.2 * df["ntot"].values)
+
         if self.has_matplotlib():
             assert si_den.plot_line(0, 1, num=1000, show=False)
             assert si_den.plot_line([0, 0, 0], [1, 0, 0], num=1000, cartesian=True, show=False)
@@ -150,6 +165,44 @@ class TestScalarField(AbipyTest):
         same_den = Density.from_chgcar_poscar(chgcar_path, poscar_path)
         self.assert_almost_equal(same_den.datar, si_den.datar)
 
+        # Compressed CHGCAR, also readable by pymatgen.
+        chgcar_gz = self.get_tmpname(text=True, suffix=".gz")
+        chgcar = si_den.to_chgcar(filename=chgcar_gz)
+        self.assert_almost_equal(Density.from_chgcar_poscar(chgcar_gz, poscar_path).datar, si_den.datar)
+        from pymatgen.io.vasp.outputs import Chgcar
+        pmg_chgcar = Chgcar.from_file(chgcar_gz)
+        assert len(pmg_chgcar.structure) == len(si_den.structure)
+        self.assert_almost_equal(pmg_chgcar.data["total"], chgcar.data["total"])
+
+        # Non-collinear CHGCAR files have four data blocks.
+        from abipy.iotools.chgcar import chgcar_write, chgcar_read
+        total = chgcar.data["total"]
+        nc_path = self.get_tmpname(text=True)
+        chgcar_write(nc_path, si_den.structure, dict(total=total, diff_x=0.1 * total,
+                     diff_y=0.2 * total, diff_z=0.3 * total))
+        _, nc_data = chgcar_read(nc_path)
+        assert list(nc_data.keys()) == ["total", "diff_x", "diff_y", "diff_z"]
+        self.assert_almost_equal(nc_data["diff_z"], 0.3 * total)
+        self.assert_almost_equal(Chgcar.from_file(nc_path).data["diff_y"], nc_data["diff_y"])
+        with self.assertRaises(NotImplementedError):
+            Density.from_chgcar_poscar(nc_path, poscar_path)
+
+        # Binary formats are lossless.
+        npz_path = self.get_tmpname(suffix=".npz")
+        si_den.to_npz(npz_path)
+        same_den = Density.from_npz(npz_path)
+        assert same_den.structure == si_den.structure
+        self.assert_equal(same_den.datar, si_den.datar)
+        assert (same_den.nspinor, same_den.nsppol, same_den.nspden) == (si_den.nspinor, si_den.nsppol, si_den.nspden)
+
+        try:
+            import h5py
+            h5_path = self.get_tmpname(suffix=".h5")
+            si_den.to_hdf5(h5_path)
+            self.assert_equal(Density.from_hdf5(h5_path).datar, si_den.datar)
+        except ImportError:
+            pass
+
         # Export data in xsf format.
         visu = si_den.export(".xsf")
         assert callable(visu)
@@ -162,6 +215,10 @@ class TestScalarField(AbipyTest):
         assert total_den.structure == si_den.structure
         assert abs(total_den.get_nelect().sum() - ne) < 1e-3
 
+        tmp_cubegz = self.get_tmpname(text=True, suffix=".cube.gz")
+        si_den.export_to_cube(tmp_cubegz, spin="total")
+        self.assert_almost_equal(Density.from_cube(tmp_cubegz).datar, total_den.datar)
+
         # Test creation of AE core density. Use low parameters to reduce time
         rhoc = {"Si": core_density_from_file(os.path.join(abidata.pseudo_dir, "Si.fc"))}
         core_den_1 = Density.ae_core_density_on_mesh(si_den, si_den.structure, rhoc, maxr=1.5,
@@ -86,14 +86,64 @@ class TestFunction1D(AbipyTest):
         # Test Kramers-Kronig methods.
         # TODO: This is not a response function. Should use realistic values.
         for with_div in (True, False):
-            real_part = eix.real_from_kk(with_div=with_div)
-            imag_part = real_part.imag_from_kk(with_div=with_div)
+            real_part = eix.real_from_kk(with_div=with_div, method="quad")
+            imag_part = real_part.imag_from_kk(with_div=with_div, method="quad")
+        real_part = eix.real_from_kk()
+        imag_part = real_part.imag_from_kk()
 
         if self.has_matplotlib():
             cosf.plot(show=False)
             eix.plot(show=False)
             eix.plot(cplx_mode="re", exchange_xy=True, xfactor=2, yfactor=3, show=False)
 
+    def test_kramers_kronig(self):
+        """Testing Kramers-Kronig transforms against analytic results and the quadrature implementation."""
+        from abipy.core.func1d import kk_real_from_imag, kk_imag_from_real
+        # Lorentz oscillator (causal response function).
+        wmesh = np.linspace(0, 60, num=1201)
+        w0, gamma = 5.0, 1.0
+        chi = 1.0 / (w0**2 - wmesh**2 - 1j * gamma * wmesh)
+        func = Function1D(wmesh, chi)
+        inner = (wmesh > 0.5) & (wmesh < 20)
+
+        real_part = func.real_from_kk()
+        self.assert_almost_equal(real_part.values[inner], chi.real[inner], decimal=3)
+        imag_part = Function1D(wmesh, chi.real).imag_from_kk()
+        self.assert_almost_equal(imag_part.values[inner], chi.imag[inner], decimal=3)
+
+        # Compare with the quadrature implementation on a coarser mesh.
+        coarse = Function1D(wmesh[::10], chi[::10])
+        ref = coarse.real_from_kk(method="quad").values
+        inner = (coarse.mesh > 0.5) & (coarse.mesh < 20)
+        assert np.abs(coarse.real_from_kk().values - ref)[inner].max() < 2e-2
+        ref = coarse.imag_from_kk(method="quad").values
+        assert np.abs(coarse.imag_from_kk().values - ref)[inner].max() < 2e-2
+
+        # Several spectra at once.
+        spectra = np.array([chi.imag, 2 * chi.imag, -chi.imag])
+        values = kk_real_from_imag(wmesh, spectra)
+        assert values.shape == spectra.shape
+        self.assert_almost_equal(values[1], 2 * real_part.values)
+        self.assert_almost_equal(kk_imag_from_real(wmesh, np.reshape(chi.real, (1, 1, -1)))[0, 0], imag_part.values)
+
+        # Large meshes are processed with blocks of kernel rows without storing the kernels.
+        from abipy.core import func1d
+        old_npts, old_nelems = func1d._KK_MAX_CACHED_NPTS, func1d._KK_BLOCK_NELEMS
+        try:
+            func1d._KK_MAX_CACHED_NPTS, func1d._KK_BLOCK_NELEMS = 100, 5000
+            self.assert_almost_equal(kk_real_from_imag(wmesh, spectra), values)
+            self.assert_almost_equal(kk_imag_from_real(wmesh, chi.real), imag_part.values)
+        finally:
+            func1d._KK_MAX_CACHED_NPTS, func1d._KK_BLOCK_NELEMS = old_npts, old_nelems
+
+        # Cached kernels are associated to the mesh.
+        mesh, kernel_re, _ = func1d._KK_KERNELS[func1d.hashlib.sha1(wmesh.tobytes()).hexdigest()]
+        self.assert_equal(mesh, wmesh)
+        assert func1d._kk_kernels(wmesh)[0] is kernel_re
+
+        with self.assertRaises(ValueError):
+            func.real_from_kk(method="foo")
+
     def test_fft(self):
         """Test FFT transforms."""
         sinf, cosf, eix = self.sinf, self.cosf, self.eix
@@ -64,3 +64,66 @@ class TestGSphere(AbipyTest):
                 int_r = mesh.integrate(fr)
                 int_g = fg[...,0,0,0]
                 self.assert_almost_equal(int_r, int_g)
+
+    def test_fftmesh_transfer(self):
+        """Transfer of data between G-sphere and FFT box."""
+        lattice = np.eye(3)
+        mesh = Mesh3D((6, 5, 4), lattice)
+        gvecs = np.array([[0, 0, 0], [1, 0, 0], [-1, 0, 0], [0, 2, -1], [2, -2, 1]])
+
+        gsphere = GSphere(2, lattice, [0, 0, 0], gvecs, istwfk=1)
+        ug = np.random.rand(3, len(gvecs)) + 1j * np.random.rand(3, len(gvecs))
+        ug_mesh = gsphere.tofftmesh(mesh, ug)
+        assert ug_mesh.shape == (3,) + mesh.shape
+        self.assert_equal(ug_mesh[:, -1, 0, 0], ug[:, 2])
+        self.assert_equal(ug_mesh[:, 2, 3, 1], ug[:, 4])
+        self.assert_equal(gsphere.fromfftmesh(mesh, ug_mesh), ug)
+        assert gsphere.tofftmesh(mesh, ug[0]).shape == mesh.shape
+        self.assert_equal(gsphere.fromfftmesh(mesh, ug_mesh[0].ravel()), ug[0])
+        self.assert_almost_equal(gsphere.vdot(ug, ug), np.vdot(ug, ug))
+
+        # Gamma point with time-reversal: the missing half is u(-G) = u(G)^*
+        half = np.array([[0, 0, 0], [1, 0, 0], [0, 2, -1]])
+        gsphere = GSphere(2, lattice, [0, 0, 0], half, istwfk=2)
+        ug = np.random.rand(len(half)) + 1j * np.random.rand(len(half))
+        ug[0] = ug[0].real
+        ug_mesh = gsphere.tofftmesh(mesh, ug)
+        self.assert_equal(ug_mesh[-1, 0, 0], ug[1].conj())
+        self.assert_equal(ug_mesh[0, -2, 1], ug[2].conj())
+        self.assert_equal(gsphere.fromfftmesh(mesh, ug_mesh), ug)
+        self.assert_almost_equal(gsphere.vdot(ug, ug), np.vdot(ug_mesh, ug_mesh).real)
+
+        # k = (1/2, 0, 0): u(-G-G0) = u(G)^* with G0 = (1, 0, 0)
+        gsphere = GSphere(2, lattice, [0.5, 0, 0], half, istwfk=3)
+        self.assert_equal(gsphere.g0, [1, 0, 0])
+        ug_mesh = gsphere.tofftmesh(mesh, ug)
+        self.assert_equal(ug_mesh[-1, 0, 0], ug[0].conj())
+        self.assert_equal(ug_mesh[-2, 0, 0], ug[1].conj())
+        self.assert_almost_equal(gsphere.vdot(ug, ug), np.vdot(ug_mesh, ug_mesh).real)
+
+        with self.assertRaises(ValueError):
+            GSphere(2, lattice, [0.3, 0, 0], half, istwfk=3)
+        with self.assertRaises(ValueError):
+            gsphere.tofftmesh(Mesh3D((2, 2, 2), lattice), ug)
+
+    def test_gemm_vdot(self):
+        """Batched scalar products and common G-vectors."""
+        lattice = np.eye(3)
+        half = np.array([[0, 0, 0], [1, 0, 0], [0, 2, -1]])
+        for istwfk in (1, 2):
+            gsphere = GSphere(2, lattice, [0, 0, 0], half, istwfk=istwfk)
+            ug1 = np.random.rand(3, 1, len(half)) + 1j * np.random.rand(3, 1, len(half))
+            ug2 = np.random.rand(2, 1, len(half)) + 1j * np.random.rand(2, 1, len(half))
+            mat = gsphere.gemm_vdot(ug1, ug2)
+            assert mat.shape == (3, 2)
+            for i in range(3):
+                for j in range(2):
+                    self.assert_almost_equal(mat[i, j], gsphere.vdot(ug1[i], ug2[j]))
+
+        other = GSphere(2, lattice, [0, 0, 0], np.array([[0, 2, -1], [5, 0, 0], [0, 0, 0]]))
+        inds, other_inds = gsphere.get_common_indices(other)
+        self.assert_equal(inds, [0, 2])
+        self.assert_equal(other_inds, [2, 0])
+        inds, other_inds = gsphere.get_common_indices(other, gshift=[-1, 0, 0])
+        self.assert_equal(inds, [1])
+        self.assert_equal(other_inds, [2])
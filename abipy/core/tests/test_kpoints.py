@@ -11,7 +11,7 @@ from pymatgen.core.lattice import Lattice
 from abipy import abilab
 from abipy.core.kpoints import (wrap_to_ws, wrap_to_bz, issamek, Kpoint, KpointList, IrredZone, Kpath, KpointsReader,
     has_timrev_from_kptopt, KSamplingInfo, as_kpoints, rc_list, kmesh_from_mpdivs, map_grid2ibz,
-    set_atol_kdiff, set_spglib_tols)  #Ktables,
+    map_kpoints_with_symrecs, map_kpoints, find_irred_kpoints_generic, set_atol_kdiff, set_spglib_tols)  #Ktables,
 from abipy.core.testing import AbipyTest
 
 
@@ -207,6 +207,19 @@ class TestKpointList(AbipyTest):
         assert k2kqg[0][0] == 1 and np.all(k2kqg[0][1] == 0)
         assert k2kqg[1][0] == 0 and np.all(k2kqg[1][1] == 1)
 
+        # Test vectorized lookups (points are compared modulo G).
+        query = [[1, 0, -1], [-1/2, 1/2, 3/2], [1/3 + 1e-9, 1/3, 4/3], [0.1, 0.2, 0.3], [1e-3, 0, 0]]
+        self.assert_equal(klist.find_indices(query), [0, 1, 2, -1, -1])
+        assert all(klist.find(q) == i for q, i in zip(query, [0, 1, 2, -1, -1]))
+        with self.assertRaises(ValueError):
+            klist.index([0.1, 0.2, 0.3])
+        # Point close to the border of a hash bin.
+        near_klist = KpointList(lattice, [0.12345, 0, 0, 0.5, 0.5, 0.5])
+        self.assert_equal(near_klist.find_indices([[0.12345 + 5e-9, 0, 0], [0.5, 0.5, -0.5]]), [0, 1])
+        inds, dists = klist.find_closest_indices([[0, 0, 0], [0.49, 0.5, 0.5]])
+        self.assert_equal(inds, [0, 1])
+        assert dists[0] == 0
+
         frac_coords = [0, 0, 0, 1/2, 1/3, 1/3]
         other_klist = KpointList(lattice, frac_coords)
 
@@ -583,6 +596,28 @@ class TestKmappingTools(AbipyTest):
 
         assert not errors
 
+        # Compare with the vectorized symmetry mapper.
+        symrec_fm = [o.rot_g for o in self.mgb2.abi_spacegroup.fm_symmops]
+        r = map_kpoints_with_symrecs(bz, self.kibz, symrec_fm, self.has_timrev)
+        assert r.nmissing == 0
+        self.assert_equal(r.ik_ref, bz2ibz)
+        kibz = np.reshape(self.kibz, (-1, 3))
+        for ik_bz in range(0, len(bz), 97):
+            krot = r.tsign[ik_bz] * np.matmul(symrec_fm[r.isym[ik_bz]], kibz[r.ik_ref[ik_bz]])
+            self.assert_almost_equal(bz[ik_bz], krot + r.g0[ik_bz])
+
+        lattice = self.mgb2.reciprocal_lattice.matrix
+        o2r_map, nmissing = map_kpoints(bz[:10], lattice, lattice, self.kibz, symrec_fm, self.has_timrev)
+        assert nmissing == 0
+        assert [m.ik_ref for m in o2r_map] == r.ik_ref[:10].tolist()
+        o2r_map, nmissing = map_kpoints([[0.01, 0.02, 0.03]], lattice, lattice, self.kibz, symrec_fm, False)
+        assert nmissing == 1 and o2r_map[0] is None
+
+        # The IBZ is recovered from the full mesh.
+        nmt = find_irred_kpoints_generic(self.mgb2, bz, verbose=0)
+        assert len(nmt.irred_map) == len(self.kibz)
+        assert nmt.irred_map[0] == 0
+
     #def test_with_from_structure_with_symrec(self):
     #    """Generate Ktables from a structure with Abinit symmetries."""
     #    self.mgb2 = self.get_abistructure.mgb2("mgb2_kpath_FATBANDS.nc")
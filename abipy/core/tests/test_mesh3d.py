@@ -79,6 +79,31 @@ class TestMesh3D(AbipyTest):
                     r += shift
                     self.assert_equal(mesh_443.i_closest_gridpoints(r), [[ix, iy, iz]])
 
+    def test_gridpoints_in_spheres(self):
+        """Testing vectorized search of grid points in spheres."""
+        vectors = np.reshape([4.0, 0, 0, 1.0, 3.0, 0, 0.5, 0.5, 5.0], (3, 3))
+        mesh = Mesh3D((8, 6, 10), vectors)
+        points = np.array([[0.1, 0.2, 0.3], [2.0, 1.5, 4.9]])
+        radius = 1.3
+
+        res = mesh.get_gridpoints_in_spheres(points, radius)
+        assert len(res.grid_inds) == len(res.point_inds) == len(res.dists) == len(res.images)
+        assert np.all(res.dists <= radius)
+        self.assert_almost_equal(res.dists, np.linalg.norm(
+            np.dot(res.images, [mesh.dvx, mesh.dvy, mesh.dvz]) - points[res.point_inds], axis=1))
+
+        # Brute force on a large supercell of grid points.
+        ixyz = np.reshape(np.mgrid[-10:20, -10:20, -10:20], (3, -1)).T
+        rr = np.dot(ixyz, [mesh.dvx, mesh.dvy, mesh.dvz])
+        for ipoint, pp in enumerate(points):
+            found = set(map(tuple, res.images[res.point_inds == ipoint]))
+            ref = set(map(tuple, ixyz[np.linalg.norm(rr - pp, axis=1) <= radius]))
+            assert found == ref
+
+        self.assert_equal(res.grid_inds, np.ravel_multi_index(np.mod(res.images, mesh.shape).T, mesh.shape))
+        legacy = mesh.dist_gridpoints_in_spheres(points, radius)
+        assert len(legacy) == 2 and sum(len(l) for l in legacy) == len(res.dists)
+
     def test_fft(self):
         """Test FFT transforms with mesh3d"""
         rprimd = np.array([1.,0,0, 0,1,0, 0,0,1])
@@ -100,6 +125,46 @@ class TestMesh3D(AbipyTest):
                 int_g = fg[..., 0, 0, 0]
                 self.assert_almost_equal(int_r, int_g)
 
+    def test_fft_backends(self):
+        """Test FFT backends, preallocated outputs and in-place transforms."""
+        mesh = Mesh3D((12, 3, 5), np.eye(3))
+        fg = mesh.crandom(extra_dims=2)
+        ref_fr = np.fft.ifftn(fg, axes=(1, 2, 3)) * mesh.size
+
+        from abipy.core.mesh3d import _has_scipy_fft, _has_pyfftw
+        backends = ["numpy", "auto"]
+        if _has_scipy_fft(): backends.append("scipy")
+        if _has_pyfftw(): backends.append("pyfftw")
+
+        old = set_fft_backend()
+        try:
+            for backend in backends:
+                set_fft_backend(backend=backend, nthreads=2)
+                assert get_fft_backend()["nthreads"] == 2
+                self.assert_almost_equal(mesh.fft_g2r(fg), ref_fr)
+                # Call it twice to use cached plans.
+                self.assert_almost_equal(mesh.fft_r2g(mesh.fft_g2r(fg)), fg)
+
+                out = mesh.cempty(extra_dims=2)
+                fr = mesh.fft_g2r(fg, out=out)
+                assert fr is out
+                self.assert_almost_equal(out, ref_fr)
+
+                work = fg.copy()
+                mesh.fft_g2r(work, out=work)
+                self.assert_almost_equal(work, ref_fr)
+                mesh.fft_r2g(work, out=work, overwrite_input=True)
+                self.assert_almost_equal(work, fg)
+
+                flat = mesh.fft_g2r(fg[0].ravel())
+                self.assert_almost_equal(flat, ref_fr[0].ravel())
+        finally:
+            set_fft_backend(**old)
+
+        assert get_fft_backend() == old
+        with self.assertRaises(ValueError):
+            set_fft_backend(backend="foo")
+
     #def test_trilinear_interp(self):
     #    rprimd = np.array([1.,0,0, 0,1,0, 0,0,1])
     #    rprimd.shape = (3,3)
@@ -30,6 +30,10 @@ class TestSkwInterpolator(AbipyTest):
             skw = SkwInterpolator(lpratio, kcoords, ebands.eigens, ebands.fermie, ebands.nelect, cell,
                                   fm_symrel, has_timrev, filter_params=None, verbose=1)
 
+            # Star functions and coefficients in single precision.
+            skw_sp = SkwInterpolator(lpratio, kcoords, ebands.eigens, ebands.fermie, ebands.nelect, cell,
+                                     fm_symrel, has_timrev, filter_params=None, single_precision=True, verbose=0)
+
         repr(skw); print(skw)
         assert skw.occtype == "insulator"
         assert skw.use_cache
@@ -39,6 +43,8 @@ class TestSkwInterpolator(AbipyTest):
         assert skw.nr == 145 and skw.rcut is None and skw.rsigma is None
         self.assert_almost_equal(skw.mae, 7.0e-11)
         assert skw.val_ib == 3 and isinstance(skw.val_ib, int)
+        assert skw.coefs.dtype == np.complex128 and skw_sp.coefs.dtype == np.complex64
+        assert skw_sp.nr == skw.nr and skw_sp.mae < 0.1
 
         kmesh, is_shift = [8, 8, 8], None
 
@@ -53,18 +59,72 @@ class TestSkwInterpolator(AbipyTest):
         new_eigens = skw.interp_kpts(new_kcoords).eigens
         assert new_eigens.shape == (skw.nsppol, len(new_kcoords), skw.nband)
 
+        # Batched star functions and eval_sk with a block of k-points.
+        skr = skw.get_stark_kpts(new_kcoords)
+        assert skr.shape == (len(new_kcoords), skw.nr)
+        for ik, kpt in enumerate(new_kcoords):
+            ref_skr = np.zeros(skw.nr, dtype=np.complex)
+            for omat in skw.ptg_symrel:
+                ref_skr += np.exp(2j * np.pi * np.matmul(skw.rpts, np.matmul(omat.T, kpt)))
+            self.assert_almost_equal(skr[ik], ref_skr / skw.ptg_nsym)
+            self.assert_almost_equal(skw.eval_sk(0, kpt), new_eigens[0, ik])
+        self.assert_almost_equal(skw.eval_sk(0, new_kcoords), new_eigens[0])
+
+        # Interpolation with small blocks should give the same results.
+        skw.kblock_max_nbytes = 1
+        assert skw.get_kblock_size() == 1
+        self.assert_almost_equal(skw.interp_kpts(new_kcoords).eigens, new_eigens)
+        del skw.kblock_max_nbytes
+        self.assert_almost_equal(skw_sp.interp_kpts(new_kcoords).eigens, new_eigens, decimal=3)
+
         res1 = skw.interp_kpts(new_kcoords, dk1=True, dk2=False)
         print(res1.dedk)
         assert res1.dedk.shape == (skw.nsppol, len(new_kcoords), skw.nband, 3)
         # Group velocities at Gamma should be zero by symmetry.
         self.assert_almost_equal(res1.dedk[0, 0], 0.0)
-        #assert 0
-        #res12 = skw.interp_kpts(new_kcoords, dk1=True, dk2=True)
-        #print(res12.dedk2)
+
+        res12 = skw.interp_kpts(new_kcoords, dk1=True, dk2=True)
+        assert res12.dedk2.shape == (skw.nsppol, len(new_kcoords), skw.nband, 3, 3)
+        self.assert_almost_equal(res12.dedk, res1.dedk)
+        self.assert_almost_equal(res12.dedk2, res12.dedk2.transpose(0, 1, 2, 4, 3))
+
+        # Compare analytic derivatives with finite differences.
+        step = 1e-4
+        kpt = np.array(new_kcoords[2])
+        for idir in range(3):
+            dk = np.zeros(3)
+            dk[idir] = step
+            rp = skw.interp_kpts([kpt + dk], dk1=True)
+            rm = skw.interp_kpts([kpt - dk], dk1=True)
+            self.assert_almost_equal(res12.dedk[0, 2, :, idir], (rp.eigens - rm.eigens)[0, 0] / (2 * step), decimal=5)
+            self.assert_almost_equal(res12.dedk2[0, 2, :, :, idir], (rp.dedk - rm.dedk)[0, 0] / (2 * step), decimal=3)
+
+        # Band velocities and inverse effective masses in Cartesian coordinates.
+        r = skw.interp_vels_invmasses(new_kcoords)
+        assert r.vels.shape == (skw.nsppol, len(new_kcoords), skw.nband, 3)
+        assert r.invmasses.shape == (skw.nsppol, len(new_kcoords), skw.nband, 3, 3)
+        self.assert_almost_equal(r.vels[0, 0], 0.0)
+        assert skw.interp_vels_invmasses(new_kcoords, with_invmass=False).invmasses is None
 
         # Test interpolation routines (high-level API).
         edos = skw.get_edos(kmesh, is_shift=None, method="gaussian", step=0.1, width=0.2, wmesh=None)
         jdos = skw.get_jdos_q0(kmesh, is_shift=None, method="gaussian", step=0.1, width=0.2, wmesh=None)
+        self.assert_almost_equal(edos.integral[0, -1], skw.nband, decimal=4)
+        nval = skw.val_ib + 1
+        self.assert_almost_equal(jdos.integral[0, -1], 2 * nval * (skw.nband - nval), decimal=4)
+        with self.assertRaises(ValueError):
+            skw.get_jdos_q0(kmesh, method="foo")
+        skw.occtype = "fermi-dirac"
+        with self.assertRaises(ValueError):
+            skw.get_jdos_q0(kmesh)
+        skw.occtype = "insulator"
+        ledos = skw.get_edos(kmesh, is_shift=None, method="lorentzian", step=0.1, width=0.2, wmesh=None)
+        assert ledos.values.shape == edos.values.shape
+        tedos = skw.get_edos(kmesh, is_shift=None, method="tetra", step=0.1, width=0.2, wmesh=None)
+        assert tedos.values.shape == edos.values.shape
+        self.assert_almost_equal(tedos.integral[0, -1], skw.nband)
+        tetra = skw.get_tetrahedra(kmesh)
+        assert tetra.nibz == k.nibz and tetra.ntetra_bz == 6 * k.nbz
         #nest = skw.get_nesting_at_e0(qpoints, kmesh, e0, width=0.2, is_shift=None)
 
         # Test pickle
@@ -72,6 +132,25 @@ class TestSkwInterpolator(AbipyTest):
         skw.pickle_dump(tmpname)
         new = SkwInterpolator.pickle_load(tmpname)
 
+        # Test disk cache: the second call reads the results of the fit from file.
+        import tempfile
+        cache = SkwInterpolator.enable_disk_cache(cache_dir=tempfile.mkdtemp())
+        try:
+            args = (lpratio, kcoords, ebands.eigens, ebands.fermie, ebands.nelect, cell, fm_symrel, has_timrev)
+            skw1 = SkwInterpolator(*args)
+            assert cache.hits == 0 and cache.misses == 1
+            skw2 = SkwInterpolator(*args)
+            assert cache.hits == 1 and cache.misses == 1
+            assert skw2.skr is None and skw2.nr == skw1.nr and skw2.mae == skw1.mae
+            self.assert_equal(skw2.rpts, skw1.rpts)
+            self.assert_almost_equal(skw2.interp_kpts(new_kcoords).eigens, skw1.interp_kpts(new_kcoords).eigens)
+            SkwInterpolator(lpratio + 1, *args[1:])
+            assert cache.hits == 1 and cache.misses == 2
+            assert cache.get_stats()["nfiles"] == 2
+        finally:
+            SkwInterpolator.disable_disk_cache()
+        assert SkwInterpolator.disk_cache is None
+
         # Test plotting API.
         if self.has_matplotlib():
             kmeshes = [[2, 2, 2], [4, 4, 4]]
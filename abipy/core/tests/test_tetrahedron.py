@@ -0,0 +1,65 @@
+"""Tests for core.tetrahedron module"""
+from __future__ import print_function, division, unicode_literals, absolute_import
+
+import numpy as np
+
+from abipy.core.testing import AbipyTest
+from abipy.core.tetrahedron import Tetrahedra, _blochl_weights
+
+
+class TestTetrahedra(AbipyTest):
+    """Unit tests for Tetrahedra."""
+
+    def test_simple_cubic_tight_binding(self):
+        """Testing DOS of simple cubic tight-binding model with tetrahedra."""
+        # Mesh without symmetries: each point of the mesh is an irreducible point.
+        n = 12
+        tetra = Tetrahedra(np.arange(n ** 3).reshape(n, n, n), np.eye(3))
+        repr(tetra); str(tetra)
+        assert np.all(tetra.ngkpt == n) and tetra.nibz == n ** 3
+        assert tetra.ntetra_bz == 6 * n ** 3
+        assert tetra.tetra_mult.sum() == tetra.ntetra_bz
+
+        kpts = np.indices((n, n, n)).reshape(3, -1).T / n
+        eigens = -2 * np.cos(2 * np.pi * kpts).sum(axis=1)[:, None]
+        mesh = np.linspace(-7, 7, num=701)
+
+        r = tetra.get_dos(eigens, mesh)
+        assert r.values.shape == mesh.shape and r.integral.shape == mesh.shape
+        self.assert_almost_equal(r.integral[0], 0.0)
+        self.assert_almost_equal(r.integral[-1], 1.0)
+        self.assert_almost_equal(np.trapz(r.values, x=mesh), 1.0, decimal=3)
+        # Particle-hole symmetry.
+        self.assert_almost_equal(r.integral[350], 0.5, decimal=3)
+
+        # Projected DOS with unit weights must give the total DOS.
+        weights = np.ones((2,) + eigens.shape)
+        weights[1] *= 0.5
+        p = tetra.get_dos(eigens, mesh, weights=weights)
+        assert p.values.shape == (2, len(mesh))
+        self.assert_almost_equal(p.values[0], r.values)
+        self.assert_almost_equal(p.integral[0], r.integral)
+        self.assert_almost_equal(p.values[1], 0.5 * r.values)
+
+        # Small chunks should give the same results.
+        tetra.max_work_size = 16
+        self.assert_almost_equal(tetra.get_dos(eigens, mesh).values, r.values)
+
+        with self.assertRaises(ValueError):
+            tetra.get_dos(eigens[1:], mesh)
+        with self.assertRaises(ValueError):
+            tetra.get_dos(eigens, mesh, weights=np.ones((2, 3)))
+
+    def test_blochl_weights(self):
+        """Testing derivative of the tetrahedron integration weights."""
+        etetra = np.array([[-1.0, -0.2, 0.3, 1.5], [0.0, 0.15, 0.15, 2.0]])
+        # Points must be inside (e1, e4).
+        x = etetra[:, :1] + (etetra[:, 3:] - etetra[:, :1]) * np.linspace(0.013, 0.9999, num=41)
+        step = 1e-6
+        theta, delta = _blochl_weights(etetra, x)
+        assert theta.shape == (2, 4, 41)
+        thp, _ = _blochl_weights(etetra, x + step)
+        thm, _ = _blochl_weights(etetra, x - step)
+        self.assert_almost_equal(delta, (thp - thm) / (2 * step), decimal=4)
+        # Integration weights tend to 1/4 for x --> e4.
+        self.assert_almost_equal(theta[:, :, -1], 0.25, decimal=3)
@@ -0,0 +1,320 @@
+# coding: utf-8
+"""
+Linear tetrahedron method with Blöchl corrections for the computation of DOSes on homogeneous meshes.
+
+See P. E. Blöchl, O. Jepsen and O. K. Andersen, Phys. Rev. B 49, 16223 (1994).
+"""
+from __future__ import print_function, division, unicode_literals, absolute_import
+
+import itertools
+import numpy as np
+
+from monty.collections import dict2namedtuple
+
+
+__all__ = [
+    "Tetrahedra",
+]
+
+
+def _tetra_dos(etetra, x):
+    """
+    Integrated DOS, DOS and derivative of the DOS of a tetrahedron of unit volume (linear tetrahedron method).
+
+    Args:
+        etetra: [n, 4] array with the energies at the vertices of the tetrahedra sorted in ascending order.
+        x: [n, nx] array with the energies at which the DOS is computed.
+            Values must be in the interval (etetra[:, 0], etetra[:, 3]).
+
+    Return: (idos, dos, ddos) arrays of shape [n, nx]
+    """
+    idos, dos, ddos = np.zeros(x.shape), np.zeros(x.shape), np.zeros(x.shape)
+    ebig = [np.broadcast_to(etetra[:, i, None], x.shape) for i in range(4)]
+    in1, in2 = x <= ebig[1], x <= ebig[2]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # e1 < x <= e2
+        e1, e2, e3, e4 = [e[in1] for e in ebig]
+        a = x[in1] - e1
+        den = (e2 - e1) * (e3 - e1) * (e4 - e1)
+        idos[in1], dos[in1], ddos[in1] = a * a * a / den, 3 * a * a / den, 6 * a / den
+
+        # e2 < x <= e3
+        mask = in2 & ~in1
+        e1, e2, e3, e4 = [e[mask] for e in ebig]
+        e21, b = e2 - e1, x[mask] - e2
+        r = (e3 - e1 + e4 - e2) / ((e3 - e2) * (e4 - e2))
+        den = (e3 - e1) * (e4 - e1)
+        idos[mask] = (e21 * e21 + 3 * e21 * b + 3 * b * b - r * b * b * b) / den
+        dos[mask] = (3 * e21 + 6 * b - 3 * r * b * b) / den
+        ddos[mask] = (6 - 6 * r * b) / den
+
+        # e3 < x < e4
+        mask = ~in2
+        e1, e2, e3, e4 = [e[mask] for e in ebig]
+        d4 = e4 - x[mask]
+        den = (e4 - e1) * (e4 - e2) * (e4 - e3)
+        idos[mask], dos[mask], ddos[mask] = 1 - d4 * d4 * d4 / den, 3 * d4 * d4 / den, -6 * d4 / den
+
+    return idos, dos, ddos
+
+
+def _blochl_weights(etetra, x):
+    """
+    Integration weights of the linear tetrahedron method with Blöchl corrections.
+
+    Args:
+        etetra: [n, 4] array with the energies at the vertices of the tetrahedra sorted in ascending order.
+        x: [n, nx] array with the energies at which the weights are computed.
+            Values must be in the interval (etetra[:, 0], etetra[:, 3]).
+
+    Return: (theta, delta) arrays of shape [n, 4, nx] with the weights for the step function
+        (integrated DOS) and for the delta function (DOS) for a tetrahedron of unit volume.
+    """
+    e1, e2, e3, e4 = [etetra[:, i, None] for i in range(4)]
+    e21, e31, e41 = e2 - e1, e3 - e1, e4 - e1
+    e32, e42, e43 = e3 - e2, e4 - e2, e4 - e3
+    _, dos, ddos = _tetra_dos(etetra, x)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # Region 1: e1 < x <= e2
+        a = x - e1
+        den = e21 * e31 * e41
+        c, dc = 0.25 * a ** 3 / den, 0.75 * a ** 2 / den
+        s = 1 / e21 + 1 / e31 + 1 / e41
+        w1 = [c * (4 - a * s), c * a / e21, c * a / e31, c * a / e41]
+        dw1 = [dc * (4 - a * s) - c * s, (dc * a + c) / e21, (dc * a + c) / e31, (dc * a + c) / e41]
+
+        # Region 2: e2 < x <= e3
+        b, d3, d4 = x - e2, e3 - x, e4 - x
+        c1, dc1 = 0.25 * a ** 2 / (e41 * e31), 0.5 * a / (e41 * e31)
+        c2 = 0.25 * a * b * d3 / (e41 * e32 * e31)
+        dc2 = 0.25 * (b * d3 + a * d3 - a * b) / (e41 * e32 * e31)
+        c3 = 0.25 * b ** 2 * d4 / (e42 * e32 * e41)
+        dc3 = 0.25 * (2 * b * d4 - b ** 2) / (e42 * e32 * e41)
+        c12, c23, c123 = c1 + c2, c2 + c3, c1 + c2 + c3
+        dc12, dc23, dc123 = dc1 + dc2, dc2 + dc3, dc1 + dc2 + dc3
+        w2 = [c1 + c12 * d3 / e31 + c123 * d4 / e41,
+              c123 + c23 * d3 / e32 + c3 * d4 / e42,
+              c12 * a / e31 + c23 * b / e32,
+              c123 * a / e41 + c3 * b / e42]
+        dw2 = [dc1 + dc12 * d3 / e31 - c12 / e31 + dc123 * d4 / e41 - c123 / e41,
+               dc123 + dc23 * d3 / e32 - c23 / e32 + dc3 * d4 / e42 - c3 / e42,
+               dc12 * a / e31 + c12 / e31 + dc23 * b / e32 + c23 / e32,
+               dc123 * a / e41 + c123 / e41 + dc3 * b / e42 + c3 / e42]
+
+        # Region 3: e3 < x < e4
+        den = e41 * e42 * e43
+        c, dc = 0.25 * d4 ** 3 / den, -0.75 * d4 ** 2 / den
+        s = 1 / e41 + 1 / e42 + 1 / e43
+        w3 = [0.25 - c * d4 / e41, 0.25 - c * d4 / e42, 0.25 - c * d4 / e43, 0.25 - c * (4 - d4 * s)]
+        dw3 = [4 * c / e41, 4 * c / e42, 4 * c / e43, -(dc * (4 - d4 * s) + c * s)]
+
+        # Blöchl correction: w_i += D(x) / 40 * sum_j (e_j - e_i)
+        in1, in2 = x <= e2, x <= e3
+        theta = np.empty((x.shape[0], 4, x.shape[1]))
+        delta = np.empty((x.shape[0], 4, x.shape[1]))
+        esum = etetra.sum(axis=1)[:, None]
+        for i in range(4):
+            fact = (esum - 4 * etetra[:, i, None]) / 40.0
+            theta[:, i] = np.where(in1, w1[i], np.where(in2, w2[i], w3[i])) + dos * fact
+            delta[:, i] = np.where(in1, dw1[i], np.where(in2, dw2[i], dw3[i])) + ddos * fact
+
+    return theta, delta
+
+
+class Tetrahedra(object):
+    """
+    Tetrahedra of a Gamma-centered homogeneous mesh with vertices mapped to the irreducible points.
+    The Brillouin zone is divided into small parallelepipeds and each parallelepiped is
+    divided into 6 tetrahedra sharing the shortest main diagonal.
+    Tetrahedra that are equivalent by symmetry are merged and their multiplicity is stored.
+
+    Usage example:
+
+    .. code-block:: python
+
+        tetra = Tetrahedra.from_ibz(structure, ibz_frac_coords, ngkpt, has_timrev=True)
+        r = tetra.get_dos(eigens_kb, mesh)
+        r.values, r.integral
+    """
+    # Used to limit the size of the temporary arrays allocated in get_dos.
+    max_work_size = 2 ** 20
+
+    @classmethod
+    def from_ibz(cls, structure, ibz, ngkpt, has_timrev):
+        """
+        Build the object from the list of irreducible points and the divisions of the mesh.
+        Uses the symmetries of the structure to map the points of the mesh onto the IBZ.
+
+        Args:
+            structure: |Structure| object.
+            ibz: [*, 3] array with the reduced coordinates of the points in the IBZ.
+            ngkpt: Mesh divisions.
+            has_timrev: True if time-reversal can be used.
+        """
+        from abipy.core.kpoints import map_grid2ibz
+        if structure.abi_spacegroup is None:
+            structure.spgset_abi_spacegroup(has_timerev=has_timrev)
+
+        ngkpt = np.asarray(ngkpt, dtype=np.int)
+        bz2ibz = map_grid2ibz(structure, ibz, ngkpt, has_timrev, pbc=False)
+
+        return cls(bz2ibz.reshape(ngkpt), structure.reciprocal_lattice)
+
+    @classmethod
+    def from_kpoints(cls, structure, kpoints, has_timrev):
+        """
+        Build the object from an |IrredZone| with a Gamma-centered Monkhorst-Pack sampling.
+        Raises ValueError if the sampling is not supported.
+        """
+        errors = []; eapp = errors.append
+        if not kpoints.is_ibz:
+            eapp("Expecting an IBZ sampling but got %s" % type(kpoints))
+        if not kpoints.is_mpmesh:
+            eapp("Monkhorst-Pack meshes are required.\nksampling: %s" % str(kpoints.ksampling))
+        else:
+            mpdivs, shifts = kpoints.mpdivs_shifts
+            if len(shifts) > 1 or not np.all(shifts == 0.0):
+                eapp("The tetrahedron method requires Gamma-centered k-meshes.")
+        if errors:
+            raise ValueError("\n".join(errors))
+
+        return cls.from_ibz(structure, kpoints.frac_coords, mpdivs, has_timrev)
+
+    def __init__(self, bzgrid2ibz, reciprocal_lattice):
+        """
+        Args:
+            bzgrid2ibz: [n0, n1, n2] array with the index of the irreducible point associated to
+                the point of the mesh with integer coordinates (i, j, k) (Gamma-centered mesh).
+            reciprocal_lattice: |Lattice| object or [3, 3] matrix with the reciprocal lattice vectors (rows).
+        """
+        bzgrid2ibz = np.asarray(bzgrid2ibz, dtype=np.int)
+        self.ngkpt = np.array(bzgrid2ibz.shape)
+        self.nibz = bzgrid2ibz.max() + 1
+        rmat = np.asarray(getattr(reciprocal_lattice, "matrix", reciprocal_lattice))
+
+        # Select the shortest main diagonal of the parallelepiped. A diagonal is defined by the corner
+        # from which it starts. The other corners are obtained by flipping the integer coordinates.
+        flips = np.array([[0, 0, 0], [1, 0, 0], [0, 1, 0], [0, 0, 1]])
+        lengths = [np.linalg.norm(np.matmul((1 - 2 * f) / self.ngkpt, rmat)) for f in flips]
+        flip = flips[np.argmin(lengths)]
+
+        # The 6 tetrahedra sharing the diagonal are defined by the paths along the edges
+        # connecting the two ends of the diagonal.
+        paths = []
+        for perm in itertools.permutations(range(3)):
+            corner = np.zeros(3, dtype=np.int)
+            path = [corner.copy()]
+            for ax in perm:
+                corner[ax] = 1
+                path.append(corner.copy())
+            paths.append(path)
+        offsets = np.abs(np.array(paths) - flip)
+
+        # Map the vertices of all the tetrahedra in the BZ to the IBZ.
+        grid = np.indices(self.ngkpt).reshape(3, -1).T
+        verts = (grid[:, None, None, :] + offsets) % self.ngkpt
+        tetra_ibz = bzgrid2ibz[verts[..., 0], verts[..., 1], verts[..., 2]].reshape(-1, 4)
+        self.ntetra_bz = len(tetra_ibz)
+
+        # Merge tetrahedra with the same irreducible vertices.
+        tetra_ibz.sort(axis=1)
+        self.tetra_ibz, self.tetra_mult = np.unique(tetra_ibz, axis=0, return_counts=True)
+
+    def __str__(self):
+        return self.to_string()
+
+    def to_string(self, verbose=0):
+        """String representation."""
+        lines = []; app = lines.append
+        app("Mesh divisions: %s, number of irreducible points: %d" % (str(self.ngkpt), self.nibz))
+        app("Number of tetrahedra in the BZ: %d, irreducible tetrahedra: %d" % (
+            self.ntetra_bz, len(self.tetra_ibz)))
+
+        return "\n".join(lines)
+
+    def get_dos(self, eigens, mesh, weights=None):
+        """
+        Compute the DOS and the integrated DOS with the linear tetrahedron method.
+        The integration weights include Blöchl corrections.
+
+        Args:
+            eigens: [nibz, nband] array with the energies at the irreducible points.
+            mesh: Linear mesh (array) on which the DOS is computed.
+            weights: None for the total DOS. Array of shape [..., nibz, nband] to compute
+                several projected DOSes e.g. with the weights of the PJDOS.
+
+        Return: namedtuple with ``values`` (DOS) and ``integral`` (IDOS).
+            Arrays of shape [nw] if weights is None else [..., nw]
+        """
+        eigens = np.asarray(eigens)
+        if eigens.ndim != 2 or len(eigens) != self.nibz:
+            raise ValueError("Expecting eigens with shape [%d, nband] but got %s" % (self.nibz, str(eigens.shape)))
+        nband = eigens.shape[1]
+        mesh = np.asarray(mesh, dtype=np.float)
+        nw = len(mesh)
+
+        # Energies at the vertices sorted in ascending order. Arrays with shape [ntetra * nband, 4]
+        etetra = eigens[self.tetra_ibz].transpose(0, 2, 1).reshape(-1, 4)
+        rows = np.arange(len(etetra))[:, None]
+        order = np.argsort(etetra, axis=1)
+        etetra = etetra[rows, order]
+
+        # Weights at the vertices including the volume of the tetrahedra: [nsets, ntetra * nband, 4]
+        vol = np.repeat(self.tetra_mult / self.ntetra_bz, nband)
+        if weights is None:
+            out_shape = (nw,)
+            wvert = np.broadcast_to(vol[None, :, None], (1,) + etetra.shape)
+        else:
+            weights = np.asarray(weights, dtype=np.float)
+            if weights.shape[-2:] != eigens.shape:
+                raise ValueError("Incompatible shapes for eigens %s and weights %s" % (eigens.shape, weights.shape))
+            out_shape = weights.shape[:-2] + (nw,)
+            wsets = weights.reshape((-1,) + eigens.shape)
+            wvert = wsets[:, self.tetra_ibz].transpose(0, 1, 3, 2).reshape((len(wsets),) + etetra.shape)
+            wvert = wvert[:, rows, order] * vol[None, :, None]
+
+        nsets = len(wvert)
+        dos, idos = np.zeros((nsets, nw)), np.zeros((nsets, nw))
+
+        # Each tetrahedron contributes to the points of the mesh in (e1, e4).
+        # Points above e4 get the full weight in the integrated DOS.
+        istart = np.searchsorted(mesh, etetra[:, 0], side="right")
+        istop = np.searchsorted(mesh, etetra[:, 3], side="left")
+        for iset in range(nsets):
+            step = np.bincount(istop, weights=0.25 * wvert[iset].sum(axis=1), minlength=nw + 1)
+            idos[iset] = np.cumsum(step[:nw])
+
+        # Process tetrahedra in order of decreasing number of points so that
+        # tetrahedra with similar number of points are grouped together.
+        span = istop - istart
+        inds = np.argsort(-span)
+        inds = inds[span[inds] > 0]
+        ts = 0
+        while ts < len(inds):
+            npts = span[inds[ts]]
+            chunk = inds[ts:ts + max(1, self.max_work_size // (4 * npts))]
+            ipts = istart[chunk, None] + np.arange(npts)
+            valid = ipts < istop[chunk, None]
+            ipts = np.where(valid, ipts, 0)
+            if weights is None:
+                # The Blöchl corrections do not contribute to the total DOS.
+                t_idos, t_dos, _ = _tetra_dos(etetra[chunk], mesh[ipts])
+                vol_chunk = vol[chunk, None]
+                t_idos, t_dos = [np.where(valid, vol_chunk * v, 0.0) for v in (t_idos, t_dos)]
+                ipts = ipts.ravel()
+                dos[0] += np.bincount(ipts, weights=t_dos.ravel(), minlength=nw)
+                idos[0] += np.bincount(ipts, weights=t_idos.ravel(), minlength=nw)
+            else:
+                theta, delta = _blochl_weights(etetra[chunk], mesh[ipts])
+                ipts = ipts.ravel()
+                for iset in range(nsets):
+                    wv = wvert[iset, chunk]
+                    vals = np.where(valid, np.einsum("ti,til->tl", wv, delta), 0.0)
+                    dos[iset] += np.bincount(ipts, weights=vals.ravel(), minlength=nw)
+                    vals = np.where(valid, np.einsum("ti,til->tl", wv, theta), 0.0)
+                    idos[iset] += np.bincount(ipts, weights=vals.ravel(), minlength=nw)
+            ts += len(chunk)
+
+        return dict2namedtuple(values=dos.reshape(out_shape), integral=idos.reshape(out_shape))
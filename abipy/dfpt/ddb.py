@@ -4,6 +4,9 @@ from __future__ import print_function, division, unicode_literals, absolute_impo
 
 import sys
 import os
+import re
+import mmap
+import json
 import tempfile
 import itertools
 import numpy as np
@@ -22,7 +25,7 @@ from abipy.flowtk import NetcdfReader, AnaddbTask
 from abipy.core.mixins import TextFile, Has_Structure, NotebookWriter
 from abipy.core.symmetries import AbinitSpaceGroup
 from abipy.core.structure import Structure
-from abipy.core.kpoints import KpointList, Kpoint
+from abipy.core.kpoints import KpointList, Kpoint, issamek
 from abipy.iotools import ETSF_Reader
 from abipy.tools.numtools import data_from_cplx_mode
 from abipy.abio.inputs import AnaddbInput
@@ -41,6 +44,27 @@ except ImportError:  # py2k
     from abipy.tools.functools_lru_cache import lru_cache
 
 
+# Regular expressions used to index the database section of the DDB file.
+# Each block starts with e.g. ` 2nd derivatives (non-stat.)  - # elements :      36`
+_BLOCK_HEADER_RE = re.compile(
+    br"^[ \t]*(Total energy|1st derivatives|2nd derivatives|3rd derivatives)[^\n]*# elements[ \t]*:[ \t]*(\d+)",
+    re.M)
+_QPT_LINE_RE = re.compile(br"^[ \t]*qpt([^\n]*)", re.M)
+
+_DORD_FROM_STR = {
+    b"Total energy": 0,
+    b"1st derivatives": 1,
+    b"2nd derivatives": 2,
+    b"3rd derivatives": 3,
+}
+
+
+def _qpt_key(qpt):
+    """Hashable key associated to the reduced coordinates `qpt` (rounded to 6 decimals)."""
+    # Add 0.0 to avoid -0.0 in the key.
+    return tuple((np.round(np.asarray(qpt, dtype=np.double), 6) + 0.0).tolist())
+
+
 class DdbError(Exception):
     """Error class raised by DDB."""
 
@@ -127,10 +151,49 @@ class DdbFile(TextFile, Has_Structure, NotebookWriter):
         """
         return obj if isinstance(obj, cls) else cls.from_file(obj)
 
+    # Disk cache with the parsed DDB files (|NpzDiskCache|). None if disabled, see `enable_disk_cache`.
+    disk_cache = None
+
+    @staticmethod
+    def enable_disk_cache(cache_dir=None, max_nbytes=1024 ** 3):
+        """
+        Activate the disk cache shared by all the DdbFile instances. The header, the index of the blocks
+        and the 2nd order derivatives are stored in binary format the first time the file is opened
+        so that later opens (e.g. in |DdbRobot|) do not need to parse the text file.
+        Entries are associated to the absolute path, the modification time and the size of the file
+        hence they are automatically invalidated when the DDB file changes.
+
+        Args:
+            cache_dir: Directory used to store the files. Default: ~/.abinit/abipy/ddb_cache
+            max_nbytes: Maximum size of the cache in bytes. Least recently used entries are removed first.
+
+        Return: |NpzDiskCache| object with hit/miss statistics.
+        """
+        from abipy.tools.diskcache import NpzDiskCache
+        if cache_dir is None:
+            cache_dir = os.path.join("~", ".abinit", "abipy", "ddb_cache")
+        DdbFile.disk_cache = NpzDiskCache(cache_dir, max_nbytes=max_nbytes)
+        return DdbFile.disk_cache
+
+    @staticmethod
+    def disable_disk_cache():
+        """Deactivate the disk cache. Files are not removed."""
+        DdbFile.disk_cache = None
+
     def __init__(self, filepath):
         super(DdbFile, self).__init__(filepath)
 
-        self._header = self._parse_header()
+        cache, cache_key, cache_data = self.disk_cache, None, None
+        if cache is not None:
+            st = os.stat(self.filepath)
+            cache_key = cache.hash_data("DdbFile", os.path.abspath(self.filepath),
+                                        "%r %d" % (st.st_mtime, st.st_size))
+            cache_data = cache.load(cache_key)
+
+        if cache_data is not None:
+            self._init_from_cache_data(cache_data)
+        else:
+            self._header = self._parse_header()
 
         self._structure = Structure.from_abivars(**self.header)
         # Add AbinitSpacegroup (needed in guessed_ngkpt)
@@ -145,6 +208,44 @@ class DdbFile(TextFile, Has_Structure, NotebookWriter):
         frac_coords = self._read_qpoints()
         self._qpoints = KpointList(self.structure.lattice.reciprocal_lattice, frac_coords, weights=None, names=None)
 
+        if cache is not None and cache_data is None:
+            cache.save(cache_key, **self._get_cache_data())
+
+    def _get_cache_data(self):
+        """
+        Return dictionary with the arrays stored in the disk cache:
+        header, index of the blocks and decoded 2nd order derivatives.
+        """
+        infos = self._block_infos
+        data = OrderedDict()
+        data["header_json"] = np.array(json.dumps(self._raw_header))
+        data["block_meta"] = np.reshape([(b["dord"], b["nelem"], b["start"], b["stop"]) for b in infos],
+                                        (-1, 4)).astype(np.int64)
+        data["block_nqpts"] = np.array([len(b["all_qpts"]) for b in infos], dtype=np.int)
+        data["block_qpts"] = np.reshape([q for b in infos for q in b["all_qpts"]], (-1, 3)).astype(np.double)
+        for iblock, binfo in enumerate(infos):
+            if binfo["dord"] == 2:
+                data["dynmat_block%d" % iblock] = self._decode_2nd_block(iblock)
+
+        return data
+
+    def _init_from_cache_data(self, data):
+        """Initialize the header and the index of the blocks from the arrays stored in the disk cache."""
+        self._raw_header = json.loads(str(data["header_json"]))
+        self._header = self._build_header(*self._raw_header)
+
+        infos, qpts, count = [], data["block_qpts"].tolist(), 0
+        for iblock, (meta, nq) in enumerate(zip(data["block_meta"].tolist(), data["block_nqpts"].tolist())):
+            dord, nelem, start, stop = meta
+            all_qpts = qpts[count:count + nq]
+            count += nq
+            infos.append(dict(dord=dord, nelem=nelem, start=start, stop=stop,
+                              qpt=all_qpts[-1] if all_qpts else None, all_qpts=all_qpts))
+            key = "dynmat_block%d" % iblock
+            if key in data: self._decoded_blocks[iblock] = data[key]
+
+        self._block_infos = infos
+
     def __str__(self):
         """String representation."""
         return self.to_string()
@@ -278,6 +379,16 @@ class DdbFile(TextFile, Has_Structure, NotebookWriter):
                 break
             header_lines.append(line.rstrip())
 
+        # Save raw values so that the header can be stored in the disk cache.
+        self._raw_header = (version, header_lines, keyvals)
+        return self._build_header(version, header_lines, keyvals)
+
+    @staticmethod
+    def _build_header(version, header_lines, keyvals):
+        """
+        Build the header from the version, the list of header lines
+        and the list of (key, values) tuples. Returns |AttrDict| dictionary.
+        """
         h = AttrDict(version=version, lines=header_lines)
         for key, value in keyvals:
             if len(value) == 1: value = value[0]
@@ -325,22 +436,181 @@ class DdbFile(TextFile, Has_Structure, NotebookWriter):
 
         # Since there are multiple occurrences of qpt in the DDB file
         # we use seen to remove duplicates.
-        self.seek(0)
-        tokens, seen = [], set()
+        qpoints, seen = [], set()
+        for binfo in self._block_infos:
+            for qpt in binfo["all_qpts"]:
+                key = _qpt_key(qpt)
+                if key in seen: continue
+                seen.add(key)
+                qpoints.append(qpt)
 
-        for line in self:
-            line = line.strip()
-            if line.startswith("qpt") and line not in seen:
-                seen.add(line)
-                tokens.append(line.replace("qpt", ""))
+        return np.reshape(qpoints, (-1, 3))
+
+    @lazy_property
+    def _block_infos(self):
+        """
+        Index of the database section built with a single scan of the file.
+        List of dictionaries (one per block, same order as in the file) with the keys:
+        "dord" (derivative order), "nelem" (number of elements), "qpt" (reduced coordinates
+        of the last q-point found in the block, None if no q-point),
+        "all_qpts" (list with all the q-points of the block, 3 for 3rd order derivatives)
+        and "start", "stop" with the byte offsets of the block in the file.
+        """
+        with open(self.filepath, "rb") as fh:
+            mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                pos = mm.find(b"Number of data blocks")
+                if pos == -1:
+                    raise self.Error("Cannot find `Number of data blocks` in %s" % self.filepath)
+                pos = mm.find(b"\n", pos) + 1
+                # This line is present only if DDB has been produced by mrgddb
+                end = mm.find(b"List of bloks and their characteristics", pos)
+                if end == -1:
+                    end = len(mm)
+                else:
+                    end = mm.rfind(b"\n", pos, end) + 1
 
-        qpoints, weights = [], []
-        for tok in tokens:
-            nums = list(map(float, tok.split()))
-            qpoints.append(nums[:3])
-            weights.append(nums[3])
+                infos = []
+                for m in _BLOCK_HEADER_RE.finditer(mm, pos, end):
+                    if infos: infos[-1]["stop"] = m.start()
+                    infos.append(dict(dord=_DORD_FROM_STR[m.group(1)], nelem=int(m.group(2)),
+                                      start=m.start(), stop=end, qpt=None, all_qpts=[]))
 
-        return np.reshape(qpoints, (-1, 3))
+                for info in infos:
+                    for m in _QPT_LINE_RE.finditer(mm, info["start"], info["stop"]):
+                        qpt = list(map(float, m.group(1).split()[:3]))
+                        info["all_qpts"].append(qpt)
+                        info["qpt"] = qpt
+            finally:
+                mm.close()
+
+        return infos
+
+    @lazy_property
+    def block_index(self):
+        """
+        Dictionary mapping (dord, qpt_key) to the list of indices of the blocks with this derivative order
+        and q-point (same order as in the file). qpt_key is a tuple with the reduced coordinates rounded to 6 decimals.
+        Blocks without q-point (e.g. total energy, 1st order derivatives) have qpt_key set to None.
+        """
+        index = OrderedDict()
+        for iblock, binfo in enumerate(self._block_infos):
+            key = (binfo["dord"], None if binfo["qpt"] is None else _qpt_key(binfo["qpt"]))
+            index.setdefault(key, []).append(iblock)
+        return index
+
+    def _find_iblock(self, qpt, dord=2):
+        """
+        Return the index of the last block with derivative order `dord` and q-point `qpt`.
+        None if not found.
+        """
+        if hasattr(qpt, "frac_coords"): qpt = qpt.frac_coords
+        ilist = self.block_index.get((dord, _qpt_key(qpt)))
+        return ilist[-1] if ilist else None
+
+    def _find_first_iblock(self, qpt):
+        """
+        Return the index of the first block (2nd or 3rd order derivatives) with q-point `qpt`.
+        None if not found.
+        """
+        if hasattr(qpt, "frac_coords"): qpt = qpt.frac_coords
+        key = _qpt_key(qpt)
+        ilist = [self.block_index[dord, key][0] for dord in (2, 3) if (dord, key) in self.block_index]
+        return min(ilist) if ilist else None
+
+    def _get_block_lines(self, iblock):
+        """
+        List of strings with the lines of the `iblock` block.
+        Use the data stored in `self.blocks` if already loaded else read the block from file.
+        """
+        if "blocks" in self.__dict__:
+            return self.blocks[iblock]["data"]
+
+        binfo = self._block_infos[iblock]
+        with open(self.filepath, "rb") as fh:
+            fh.seek(binfo["start"])
+            text = fh.read(binfo["stop"] - binfo["start"]).decode("utf-8")
+
+        # Don't use lstrip because we may reuse block_lines to write new DDB.
+        return [line.rstrip() for line in text.splitlines() if line and not line.isspace()]
+
+    @lazy_property
+    def _decoded_blocks(self):
+        """Cache used by _decode_2nd_block: block index --> decoded entries."""
+        return {}
+
+    def _decode_2nd_block(self, iblock):
+        """
+        Decode the entries of the 2nd order derivatives stored in block `iblock`.
+        Returns |numpy-array| of shape [nelem, 6] with idir1, ipert1, idir2, ipert2, re, im
+        (indices in Fortran notation).
+        """
+        cache = self._decoded_blocks
+        if iblock in cache: return cache[iblock]
+
+        binfo = self._block_infos[iblock]
+        if binfo["dord"] != 2:
+            raise ValueError("Block %d contains derivatives of order %d" % (iblock, binfo["dord"]))
+
+        if "blocks" in self.__dict__:
+            text = "\n".join(self.blocks[iblock]["data"]).encode("utf-8")
+        else:
+            with open(self.filepath, "rb") as fh:
+                fh.seek(binfo["start"])
+                text = fh.read(binfo["stop"] - binfo["start"])
+
+        # Skip the header and the qpt line. Python does not support exp format with D.
+        m = None
+        for m in _QPT_LINE_RE.finditer(text): pass
+        start = m.end() if m is not None else text.find(b"\n") + 1
+        tokens = text[start:].replace(b"D", b"E").split()
+        try:
+            data = np.array(tokens).astype(np.double).reshape(-1, 6)
+        except Exception as exc:
+            raise self.Error("Exception while parsing block %d of %s:\n%s" % (iblock, self.filepath, str(exc)))
+
+        cache[iblock] = data
+        return data
+
+    def get_dynmat_block(self, qpoint):
+        """
+        Decode the 2nd order derivatives (dynamical matrix + mixed and electric-field terms)
+        computed for `qpoint`. Only the block associated to `qpoint` is read from file.
+
+        Args:
+            qpoint: |Kpoint| object or reduced coordinates.
+
+        Return:
+            namedtuple with:
+            ``values``: complex |numpy-array| of shape [3, mpert, 3, mpert] with mpert = natom + 6.
+            The indices (idir1, ipert1, idir2, ipert2) start from zero (C notation).
+            ``mask``: boolean array with the same shape set to True for the elements available in the DDB file.
+
+        Raises: `ValueError` if the DDB does not contain 2nd order derivatives for `qpoint`.
+        """
+        iblock = self._find_iblock(qpoint, dord=2)
+        if iblock is None:
+            raise ValueError("Cannot find 2nd order derivatives for q-point %s in %s" % (str(qpoint), self.filepath))
+
+        data = self._decode_2nd_block(iblock)
+        inds = data[:, :4].astype(np.int) - 1
+        mpert = max(self.natom + 6, inds[:, [1, 3]].max() + 1) if len(inds) else self.natom + 6
+        values = np.zeros((3, mpert, 3, mpert), dtype=np.complex)
+        mask = np.zeros((3, mpert, 3, mpert), dtype=np.bool)
+        idx = (inds[:, 0], inds[:, 1], inds[:, 2], inds[:, 3])
+        values[idx] = data[:, 4] + 1j * data[:, 5]
+        mask[idx] = True
+
+        return dict2namedtuple(values=values, mask=mask)
+
+    def _get_computed_index_set(self, qpoint):
+        """
+        Set with the (idir1, ipert1, idir2, ipert2) tuples (Fortran notation) of the
+        2nd order derivatives available for `qpoint`. None if `qpoint` is not in the DDB.
+        """
+        iblock = self._find_iblock(qpoint, dord=2)
+        if iblock is None: return None
+        return set(map(tuple, self._decode_2nd_block(iblock)[:, :4].astype(np.int).tolist()))
 
     @lazy_property
     def computed_dynmat(self):
@@ -353,42 +623,26 @@ class DdbFile(TextFile, Has_Structure, NotebookWriter):
 
             The indices follow the Abinit (Fortran) notation so they start at 1.
         """
-        # TODO: Create mapping [(idir1, ipert1), (idir2, ipert2)] --> element
         df_columns = "idir1 ipert1 idir2 ipert2 cvalue".split()
 
         dynmat = OrderedDict()
-        for block in self.blocks:
+        for iblock, binfo in enumerate(self._block_infos):
             # skip the blocks that are not related to second order derivatives
-            first_line = block["data"][0].strip()
-            if not first_line.startswith("2nd derivatives"):
-                continue
+            if binfo["dord"] != 2: continue
 
             # Build q-point object.
-            qpt = Kpoint(frac_coords=block["qpt"], lattice=self.structure.reciprocal_lattice, weight=None, name=None)
+            qpt = Kpoint(frac_coords=binfo["qpt"], lattice=self.structure.reciprocal_lattice, weight=None, name=None)
 
             # Build pandas dataframe with df_columns and (idir1, ipert1, idir2, ipert2) as index.
-            # Each line in data represents an element of the dynamical matric
+            # Each row in data represents an element of the dynamical matric
             # idir1 ipert1 idir2 ipert2 re_D im_D
-            df_rows, df_index = [], []
-            for line in block["data"]:
-                line = line.strip()
-                if line.startswith("2nd derivatives") or line.startswith("qpt"):
-                    continue
-                try:
-                    toks = line.split()
-                    idir1, ipert1 = p1 = (int(toks[0]), int(toks[1]))
-                    idir2, ipert2 = p2 = (int(toks[2]), int(toks[3]))
-                    toks[4] = toks[4].replace("D", "E")
-                    toks[5] = toks[5].replace("D", "E")
-                    cvalue = float(toks[4]) + 1j*float(toks[5])
-                except Exception as exc:
-                    cprint("exception while parsing line: %s" % line, "red")
-                    raise exc
-
-                df_index.append(p1 + p2)
-                df_rows.append(dict(idir1=idir1, ipert1=ipert1, idir2=idir2, ipert2=ipert2, cvalue=cvalue))
+            data = self._decode_2nd_block(iblock)
+            inds = data[:, :4].astype(np.int)
+            df_index = list(map(tuple, inds.tolist()))
+            columns = OrderedDict((k, inds[:, i]) for i, k in enumerate(df_columns[:4]))
+            columns["cvalue"] = data[:, 4] + 1j * data[:, 5]
 
-            dynmat[qpt] = pd.DataFrame(df_rows, index=df_index, columns=df_columns)
+            dynmat[qpt] = pd.DataFrame(columns, index=df_index, columns=df_columns)
 
         return dynmat
 
@@ -402,59 +656,9 @@ class DdbFile(TextFile, Has_Structure, NotebookWriter):
         return self._read_blocks()
 
     def _read_blocks(self):
-        # skip until the beginning of the db
-        self.seek(0)
-        while "Number of data blocks" not in self._file.readline():
-            pass
-
-        blocks = []
-        block_lines = []
-        qpt = None
-        dord = None
-
-        for line in self:
-            # skip empty lines
-            if line.isspace():
-                continue
-
-            if "List of bloks and their characteristics" in line:
-                # add last block when we reach the last part of the file.
-                # This line is present only if DDB has been produced by mrgddb
-                if block_lines:
-                    blocks.append({"data": block_lines, "qpt": qpt, "dord": dord})
-                    block_lines = []
-                    qpt = None
-                break
-
-            # Don't use lstring because we may reuse block_lines to write new DDB.
-            line = line.rstrip()
-
-            # new block --> detect order
-            if "# elements" in line:
-                if block_lines:
-                    blocks.append({"data": block_lines, "qpt": qpt, "dord": dord})
-
-                tokens = line.split()
-                num_elements = int(tokens[-1])
-                s = " ".join(tokens[:2])
-                dord = {"Total energy": 0,
-                        "1st derivatives": 1,
-                        "2nd derivatives": 2,
-                        "3rd derivatives": 3}.get(s, None)
-                if dord is None:
-                    raise RuntimeError("Cannot detect derivative order from string: `%s`" % s)
-
-                block_lines = []
-                qpt = None
-
-            block_lines.append(line)
-            if "qpt" in line:
-                qpt = list(map(float, line.split()[1:4]))
-
-        if block_lines:
-            blocks.append({"data": block_lines, "qpt": qpt, "dord": dord})
-
-        return blocks
+        """Read all the blocks from file using the offsets stored in the block index."""
+        return [{"data": self._get_block_lines(iblock), "qpt": binfo["qpt"], "dord": binfo["dord"]}
+                for iblock, binfo in enumerate(self._block_infos)]
 
     @property
     def qpoints(self):
@@ -540,10 +744,10 @@ class DdbFile(TextFile, Has_Structure, NotebookWriter):
         """
         Total energy in eV. None if not available.
         """
-        for block in self.blocks:
-            if block["dord"] == 0:
-                ene_ha = float(block["data"][1].split()[0].replace("D", "E"))
-                return Energy(ene_ha, "Ha").to("eV")
+        ilist = self.block_index.get((0, None))
+        if ilist:
+            ene_ha = float(self._get_block_lines(ilist[0])[1].split()[0].replace("D", "E"))
+            return Energy(ene_ha, "Ha").to("eV")
         return None
 
     @lazy_property
@@ -552,11 +756,10 @@ class DdbFile(TextFile, Has_Structure, NotebookWriter):
         Cartesian forces in eV / Ang
         None if not available i.e. if the GS DDB has not been merged.
         """
-        for block in self.blocks:
-            if block["dord"] != 1: continue
+        for iblock in self.block_index.get((1, None), []):
             natom = len(self.structure)
             fred = np.empty((natom, 3))
-            for line in block["data"][1:]:
+            for line in self._get_block_lines(iblock)[1:]:
                 idir, ipert, fval = line.split()[:3]
                 # F --> C
                 idir, ipert = int(idir) - 1, int(ipert) - 1
@@ -587,8 +790,7 @@ class DdbFile(TextFile, Has_Structure, NotebookWriter):
         |Stress| tensor in cartesian coordinates (GPa units).
         None if not available.
         """
-        for block in self.blocks:
-            if block["dord"] != 1: continue
+        for iblock in self.block_index.get((1, None), []):
             svoigt = np.empty(6)
             # Abinit stress is in cart coords and Ha/Bohr**3
             # Map (idir, ipert) --> voigt
@@ -601,7 +803,7 @@ class DdbFile(TextFile, Has_Structure, NotebookWriter):
                 (2, shear): 4,
                 (3, shear): 5}
 
-            for line in block["data"][1:]:
+            for line in self._get_block_lines(iblock)[1:]:
                 idir, ipert, fval = line.split()[:3]
                 idp = int(idir), int(ipert)
                 if idp in dirper2voigt:
@@ -625,16 +827,15 @@ class DdbFile(TextFile, Has_Structure, NotebookWriter):
         If the coordinates of a q point are provided only the specified qpt will be considered.
         """
         natom = len(self.structure)
-        ap_list = list(itertools.product(range(1, 4), range(1, natom + 1)))
+        if hasattr(qpt, "frac_coords"): qpt = qpt.frac_coords
 
-        for qpt_dm, df in self.computed_dynmat.items():
-            if qpt is not None and qpt_dm != qpt: continue
+        for iblock, binfo in enumerate(self._block_infos):
+            if binfo["dord"] != 2: continue
+            if qpt is not None and not issamek(binfo["qpt"], qpt): continue
 
-            index_set = set(df.index)
-            for p1 in ap_list:
-                for p2 in ap_list:
-                    p12 = p1 + p2
-                    if p12 in index_set: return True
+            # Atomic perturbations have 1 <= ipert <= natom.
+            ipert12 = self._decode_2nd_block(iblock)[:, [1, 3]]
+            if np.any(np.all(ipert12 <= natom, axis=1)): return True
 
         return False
 
@@ -650,12 +851,10 @@ class DdbFile(TextFile, Has_Structure, NotebookWriter):
 		"at_least_one_diagoterm" is similar but it only checks for the presence of one diagonal term.
                 If select == "all", all tensor components must be present in the DDB file.
         """
-        gamma = Kpoint.gamma(self.structure.reciprocal_lattice)
-        if gamma not in self.computed_dynmat:
+        index_set = self._get_computed_index_set((0, 0, 0))
+        if index_set is None:
             return False
 
-        index_set = set(self.computed_dynmat[gamma].index)
-
         natom = len(self.structure)
         ep_list = list(itertools.product(range(1, 4), [natom + 2]))
         for p1 in ep_list:
@@ -690,10 +889,9 @@ class DdbFile(TextFile, Has_Structure, NotebookWriter):
                 and electric field and we assume that anaddb will be able to reconstruct the full tensor by symmetry.
                 If select == "all", all bec components must be present in the DDB file.
         """
-        gamma = Kpoint.gamma(self.structure.reciprocal_lattice)
-        if gamma not in self.computed_dynmat:
+        index_set = self._get_computed_index_set((0, 0, 0))
+        if index_set is None:
             return False
-        index_set = set(self.computed_dynmat[gamma].index)
         natom = len(self.structure)
         ep_list = list(itertools.product(range(1, 4), [natom + 2]))
         ap_list = list(itertools.product(range(1, 4), range(1, natom + 1)))
@@ -729,12 +927,10 @@ class DdbFile(TextFile, Has_Structure, NotebookWriter):
             As anaddb is not yet able to reconstruct the strain terms by symmetry,
             the default value for select is "all"
         """
-        gamma = Kpoint.gamma(self.structure.reciprocal_lattice)
-        if gamma not in self.computed_dynmat:
+        index_set = self._get_computed_index_set((0, 0, 0))
+        if index_set is None:
             return False
 
-        index_set = set(self.computed_dynmat[gamma].index)
-
         natom = len(self.structure)
         sp_list = list(itertools.product(range(1, 4), [natom + 3, natom + 4]))
         for p1 in sp_list:
@@ -769,12 +965,10 @@ class DdbFile(TextFile, Has_Structure, NotebookWriter):
             As anaddb is not yet able to reconstruct the strain terms by symmetry,
             the default value for select is "all"
         """
-        gamma = Kpoint.gamma(self.structure.reciprocal_lattice)
-        if gamma not in self.computed_dynmat:
+        index_set = self._get_computed_index_set((0, 0, 0))
+        if index_set is None:
             return False
 
-        index_set = set(self.computed_dynmat[gamma].index)
-
         natom = len(self.structure)
         sp_list = list(itertools.product(range(1, 4), [natom + 3, natom + 4]))
         ap_list = list(itertools.product(range(1, 4), range(1, natom + 1)))
@@ -810,12 +1004,10 @@ class DdbFile(TextFile, Has_Structure, NotebookWriter):
             As anaddb is not yet able to reconstruct the (strain, electric) terms by symmetry,
             the default value for select is "all"
         """
-        gamma = Kpoint.gamma(self.structure.reciprocal_lattice)
-        if gamma not in self.computed_dynmat:
+        index_set = self._get_computed_index_set((0, 0, 0))
+        if index_set is None:
             return False
 
-        index_set = set(self.computed_dynmat[gamma].index)
-
         natom = len(self.structure)
         sp_list = list(itertools.product(range(1, 4), [natom + 3, natom + 4]))
         ep_list = list(itertools.product(range(1, 4), [natom + 2]))
@@ -1447,24 +1639,24 @@ class DdbFile(TextFile, Has_Structure, NotebookWriter):
         """
         lines = list(self.header.lines)
 
+        # Read only the selected blocks (self.blocks is used if already loaded).
         if filter_blocks is None:
-            blocks = self.blocks
-        else:
-            blocks = [self.blocks[i] for i in filter_blocks]
+            filter_blocks = range(len(self._block_infos))
+        blocks_lines = [self._get_block_lines(i) for i in filter_blocks]
 
         lines.append(" **** Database of total energy derivatives ****")
-        lines.append(" Number of data blocks={0:5}".format(len(blocks)))
+        lines.append(" Number of data blocks={0:5}".format(len(blocks_lines)))
         lines.append(" ")
 
-        for b in blocks:
-            lines.extend(b["data"])
+        for block_lines in blocks_lines:
+            lines.extend(block_lines)
             lines.append(" ")
 
         lines.append(" List of bloks and their characteristics")
         lines.append(" ")
 
-        for b in blocks:
-            lines.extend(b["data"][:2])
+        for block_lines in blocks_lines:
+            lines.extend(block_lines[:2])
             lines.append(" ")
 
         with open(filepath, "wt") as f:
@@ -1475,11 +1667,9 @@ class DdbFile(TextFile, Has_Structure, NotebookWriter):
         Extracts the block data for the selected qpoint.
         Returns a list of lines containing the block information
         """
-        if hasattr(qpt, "frac_coords"): qpt = qpt.frac_coords
-
-        for b in self.blocks:
-            if b['qpt'] is not None and np.allclose(b['qpt'], qpt):
-                return b["data"]
+        iblock = self._find_first_iblock(qpt)
+        if iblock is not None:
+            return self.blocks[iblock]["data"]
 
     def replace_block_for_qpoint(self, qpt, data):
         """
@@ -1490,14 +1680,13 @@ class DdbFile(TextFile, Has_Structure, NotebookWriter):
         Return:
             True if qpt has been found and data has been replaced.
         """
-        if hasattr(qpt, "frac_coords"): qpt = qpt.frac_coords
-
-        for b in self.blocks:
-            if b['qpt'] is not None and np.allclose(b['qpt'], qpt):
-                b["data"] = data
-                return True
+        iblock = self._find_first_iblock(qpt)
+        if iblock is None: return False
 
-        return False
+        self.blocks[iblock]["data"] = data
+        # Decoded entries are now invalid.
+        self._decoded_blocks.clear()
+        return True
 
     def write_notebook(self, nbpath=None):
         """
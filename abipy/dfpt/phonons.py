@@ -25,9 +25,10 @@ from pymatgen.phonon.dos import CompletePhononDos as PmgCompletePhononDos, Phono
 from abipy.core.func1d import Function1D
 from abipy.core.mixins import AbinitNcFile, Has_Structure, Has_PhononBands, NotebookWriter
 from abipy.core.kpoints import Kpoint, Kpath
+from abipy.core.tetrahedron import Tetrahedra
 from abipy.abio.robots import Robot
 from abipy.iotools import ETSF_Reader
-from abipy.tools import gaussian, duck
+from abipy.tools import broadened_dos, duck
 from abipy.tools.plotting import add_fig_kwargs, get_ax_fig_plt, set_axlims, get_axarray_fig_plt, set_visible, set_ax_xylabels
 from .phtk import match_eigenvectors, get_dyn_mat_eigenvec, open_file_phononwebsite, NonAnalyticalPh
 
@@ -615,14 +616,17 @@ class PhononBands(object):
 
         return odict
 
-    def get_phdos(self, method="gaussian", step=1.e-4, width=4.e-4):
+    def get_phdos(self, method="gaussian", step=1.e-4, width=4.e-4, ngqpt=None):
         """
         Compute the phonon DOS on a linear mesh.
 
         Args:
-            method: String defining the method
+            method: String defining the method: "gaussian", "lorentzian" or "tetra" (linear tetrahedron method).
             step: Energy step (eV) of the linear mesh.
-            width: Standard deviation (eV) of the gaussian.
+            width: Standard deviation (eV) of the gaussian or half-width at half-maximum of the lorentzian.
+                Ignored if method == "tetra".
+            ngqpt: Divisions of the Gamma-centered q-mesh used to generate the q-points in the IBZ.
+                Used only if method == "tetra". If None, the divisions are taken from the q-point sampling.
 
         Returns:
             |PhononDos| object.
@@ -639,17 +643,20 @@ class PhononBands(object):
         w_min -= 0.1 * abs(w_min)
         w_max = self.maxfreq
         w_max += 0.1 * abs(w_max)
-        nw = 1 + (w_max - w_min) / step
+        nw = int(1 + (w_max - w_min) / step)
 
         mesh, step = np.linspace(w_min, w_max, num=nw, endpoint=True, retstep=True)
 
-        values = np.zeros(nw)
-        if method == "gaussian":
-            for q, qpoint in enumerate(self.qpoints):
-                weight = qpoint.weight
-                for nu in self.branches:
-                    w = self.phfreqs[q, nu]
-                    values += weight * gaussian(mesh, width, center=w)
+        if method in ("gaussian", "lorentzian"):
+            weights = np.broadcast_to(self.qpoints.weights[:, None], self.phfreqs.shape)
+            values = broadened_dos(mesh, self.phfreqs, width, weights=weights, method=method)
+
+        elif method == "tetra":
+            if ngqpt is None:
+                tetra = Tetrahedra.from_kpoints(self.structure, self.qpoints, has_timrev=True)
+            else:
+                tetra = Tetrahedra.from_ibz(self.structure, self.qpoints.frac_coords, ngqpt, has_timrev=True)
+            values = tetra.get_dos(self.phfreqs, mesh).values
 
         else:
             raise ValueError("Method %s is not supported" % str(method))
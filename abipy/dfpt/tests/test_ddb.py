@@ -88,6 +88,16 @@ class DdbTest(AbipyTest):
             assert lines[2].rstrip() ==  "   1   1   1   1  0.80977066582497D+01 -0.46347282336361D-16"
             assert lines[-1].rstrip() == "   3   2   3   2  0.49482344898401D+01 -0.44885664256253D-17"
 
+            # Test block index and dense dynamical matrix.
+            assert list(ddb.block_index.keys()) == [(2, (0.25, 0.0, 0.0))]
+            dm = ddb.get_dynmat_block(ddb.qpoints[0])
+            assert dm.values.shape == (3, ddb.natom + 6, 3, ddb.natom + 6)
+            assert dm.mask.sum() == 36 and dm.mask[:, :2, :, :2].all()
+            self.assert_almost_equal(dm.values[0, 0, 0, 0], 0.80977066582497E+01 - 0.46347282336361E-16j)
+            self.assert_almost_equal(dm.values[2, 1, 2, 1], 0.49482344898401E+01 - 0.44885664256253E-17j)
+            with self.assertRaises(ValueError):
+                ddb.get_dynmat_block([0, 0, 0])
+
             for qpt in ddb.qpoints:
                 assert ddb.get_block_for_qpoint(qpt)
                 assert ddb.get_block_for_qpoint(qpt.frac_coords)
@@ -375,6 +385,46 @@ class DdbTest(AbipyTest):
             for qpoint in ddb.qpoints:
                 assert qpoint in ddb.computed_dynmat
 
+    def test_ddb_disk_cache(self):
+        """Testing DdbFile with disk cache."""
+        import tempfile
+        import shutil
+        filepath = os.path.join(test_dir, "AlAs_444_nobecs_DDB")
+        cache = DdbFile.enable_disk_cache(cache_dir=tempfile.mkdtemp())
+        try:
+            ddb1 = DdbFile(filepath)
+            assert cache.hits == 0 and cache.misses == 1
+            ddb2 = DdbFile(filepath)
+            assert cache.hits == 1 and cache.misses == 1
+            assert ddb2.header.nkpt == ddb1.header.nkpt and ddb2.header.lines == ddb1.header.lines
+            self.assert_equal(ddb2.header.symrel, ddb1.header.symrel)
+            assert ddb2.structure == ddb1.structure
+            assert ddb2.qpoints == ddb1.qpoints
+            assert ddb2.block_index == ddb1.block_index
+            for qpoint in ddb1.qpoints:
+                self.assert_equal(ddb2.get_dynmat_block(qpoint).values, ddb1.get_dynmat_block(qpoint).values)
+            assert ddb2.has_bec_terms(select="at_least_one")
+
+            # Write DDB with a subset of blocks and check that the new file is not in the cache.
+            tmp_file = self.get_tmpname(text=True)
+            ddb2.write(tmp_file, filter_blocks=[0, 1])
+            with DdbFile(tmp_file) as new_ddb:
+                assert len(new_ddb.qpoints) == 2
+                assert cache.hits == 1 and cache.misses == 2
+
+            # Modifying the file invalidates the entry.
+            tmp_copy = self.get_tmpname(text=True)
+            shutil.copy(filepath, tmp_copy)
+            DdbFile(tmp_copy)
+            with open(tmp_copy, "at") as fh:
+                fh.write("\n")
+            DdbFile(tmp_copy)
+            assert cache.hits == 1 and cache.misses == 4
+            ddb1.close(); ddb2.close()
+        finally:
+            DdbFile.disable_disk_cache()
+        assert DdbFile.disk_cache is None
+
 
 class DielectricTensorGeneratorTest(AbipyTest):
 
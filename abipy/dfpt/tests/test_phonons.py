@@ -127,6 +127,8 @@ class PhononBandsTest(AbipyTest):
         # Cannot compute PHDOS with q-path
         with self.assertRaises(ValueError):
             phdos = phbands.get_phdos()
+        with self.assertRaises(ValueError):
+            phdos = phbands.get_phdos(method="tetra")
 
         # convert to pymatgen object
         phbands.to_pymatgen()
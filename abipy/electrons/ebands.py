@@ -31,8 +31,9 @@ from abipy.core.mixins import Has_Structure, NotebookWriter
 from abipy.core.kpoints import (Kpoint, KpointList, Kpath, IrredZone, KSamplingInfo, KpointsReaderMixin,
     Ktables, has_timrev_from_kptopt, map_grid2ibz, kmesh_from_mpdivs)
 from abipy.core.structure import Structure
+from abipy.core.tetrahedron import Tetrahedra
 from abipy.iotools import ETSF_Reader
-from abipy.tools import gaussian, duck
+from abipy.tools import broadened_dos, duck
 from abipy.tools.plotting import (set_axlims, add_fig_kwargs, get_ax_fig_plt, get_axarray_fig_plt,
     get_ax3d_fig_plt, rotate_ticklabels, set_visible, plot_unit_cell, set_ax_xylabels)
 
@@ -1501,14 +1502,24 @@ class ElectronBands(Has_Structure):
                 width=ipw.FloatSlider(value=0.2, min=1e-6, max=1, step=0.05, description="Gaussian broadening (eV)"),
             )
 
+    @lazy_property
+    def tetrahedra(self):
+        """
+        |Tetrahedra| object used to compute DOSes with the linear tetrahedron method.
+        Requires a Gamma-centered Monkhorst-Pack sampling of the IBZ.
+        """
+        return Tetrahedra.from_kpoints(self.structure, self.kpoints, self.has_timrev)
+
     def get_edos(self, method="gaussian", step=0.1, width=0.2):
         """
         Compute the electronic DOS on a linear mesh.
 
         Args:
-            method: String defining the method for the computation of the DOS.
+            method: String defining the method for the computation of the DOS: "gaussian", "lorentzian"
+                or "tetra" (linear tetrahedron method, requires a Gamma-centered k-mesh).
             step: Energy step (eV) of the linear mesh.
-            width: Standard deviation (eV) of the gaussian.
+            width: Standard deviation (eV) of the gaussian or half-width at half-maximum of the lorentzian.
+                Ignored if method == "tetra".
 
         Returns: |ElectronDos| object.
         """
@@ -1521,15 +1532,20 @@ class ElectronBands(Has_Structure):
         nw = int(1 + (e_max - e_min) / step)
         mesh, step = np.linspace(e_min, e_max, num=nw, endpoint=True, retstep=True)
 
-        # TODO: Write cython version.
         dos = np.zeros((self.nsppol, nw))
-        if method == "gaussian":
+        if method in ("gaussian", "lorentzian"):
+            # Exclude the bands beyond nband_sk (eigens may be padded).
+            wtk = self.kpoints.weights
             for spin in self.spins:
-                for k, kpoint in enumerate(self.kpoints):
-                    weight = kpoint.weight
-                    for band in range(self.nband_sk[spin,k]):
-                        e = self.eigens[spin,k,band]
-                        dos[spin] += weight * gaussian(mesh, width, center=e)
+                mask = np.arange(self.mband) < self.nband_sk[spin][:, None]
+                weights = np.broadcast_to(wtk[:, None], mask.shape)[mask]
+                dos[spin] = broadened_dos(mesh, self.eigens[spin][mask], width, weights=weights, method=method)
+
+        elif method == "tetra":
+            # Use the bands that are available at all k-points.
+            for spin in self.spins:
+                nb = self.nband_sk[spin].min()
+                dos[spin] = self.tetrahedra.get_dos(self.eigens[spin, :, :nb], mesh).values
 
         else:
             raise NotImplementedError("Method %s is not supported" % method)
@@ -1639,9 +1655,9 @@ class ElectronBands(Has_Structure):
             spin: Spin index.
             valence: Int or iterable with the valence indices.
             conduction: Int or iterable with the conduction indices.
-            method (str): String defining the integraion method.
+            method (str): String defining the integraion method: "gaussian" or "lorentzian".
             step: Energy step (eV) of the linear mesh.
-            width: Standard deviation (eV) of the gaussian.
+            width: Standard deviation (eV) of the gaussian or half-width at half-maximum of the lorentzian.
             mesh: Frequency mesh to use. If None, the mesh is computed automatically from the eigenvalues.
 
         Returns: |Function1D| object.
@@ -1673,22 +1689,17 @@ class ElectronBands(Has_Structure):
         else:
             nw = len(mesh)
 
-        jdos = np.zeros(nw)
-
         # Normalize the occupation factors.
         full = 2.0 if self.nsppol == 1 else 1.0
 
-        if method == "gaussian":
-            for k, kpoint in enumerate(self.kpoints):
-                weight = kpoint.weight
-                for c in conduction:
-                    ec = self.eigens[spin, k, c]
-                    fc = 1.0 - self.occfacts[spin,k,c] / full
-                    for v in valence:
-                        ev = self.eigens[spin, k, v]
-                        fv = self.occfacts[spin, k, v] / full
-                        fact = weight * fv * fc
-                        jdos += fact * gaussian(mesh, width, center=ec-ev)
+        if method in ("gaussian", "lorentzian"):
+            conduction, valence = list(conduction), list(valence)
+            # Arrays of shape [nkpt, nc, nv]
+            ediffs = self.eigens[spin][:, conduction, None] - self.eigens[spin][:, None, valence]
+            fc = 1.0 - self.occfacts[spin][:, conduction] / full
+            fv = self.occfacts[spin][:, valence] / full
+            weights = self.kpoints.weights[:, None, None] * fc[:, :, None] * fv[:, None, :]
+            jdos = broadened_dos(mesh, ediffs, width, weights=weights, method=method)
 
         else:
             raise NotImplementedError("Method %s is not supported" % str(method))
@@ -2418,6 +2429,8 @@ class ElectronBands(Has_Structure):
         Interpolate energies in k-space along a k-path and, optionally, in the IBZ for DOS calculations.
         Note that the interpolation will likely fail if there are symmetrical k-points in the input set of k-points
         so it's recommended to call this method with energies obtained in the IBZ.
+        The results of the fit are read from disk if the cache has been activated with
+        ``ElectronInterpolator.enable_disk_cache()`` (see :mod:`abipy.core.skw`).
 
         Args:
             lpratio: Ratio between the number of star functions and the number of ab-initio k-points.
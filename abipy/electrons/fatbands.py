@@ -13,14 +13,17 @@ from monty.string import marquee, list_strings
 from pymatgen.core.periodic_table import Element
 from abipy.core.mixins import AbinitNcFile, Has_Header, Has_Structure, Has_ElectronBands, NotebookWriter
 from abipy.electrons.ebands import ElectronsReader
-from abipy.tools import gaussian
+from abipy.tools import broadened_dos
 from abipy.tools.plotting import set_axlims, get_axarray_fig_plt, add_fig_kwargs, get_ax_fig_plt
 
 
 def gaussians_dos(dos, mesh, width, values, energies, weights):
-    assert len(dos) == len(mesh) and len(values) == len(energies) == len(weights)
-    for vw, e, w in zip(values * weights, energies, weights):
-        dos += vw * gaussian(mesh, width, center=e)
+    """
+    Add to ``dos`` the gaussians centered on ``energies`` multiplied by ``values * weights``.
+    ``values`` can have extra leading dimensions (e.g. for projected DOSes) in which case
+    ``dos`` must have shape [..., len(mesh)]. Return ``dos``
+    """
+    dos += broadened_dos(mesh, energies, width, weights=np.asarray(values) * weights)
     return dos
 
 
@@ -944,7 +947,7 @@ class FatBandsFile(AbinitNcFile, Has_Header, Has_Structure, Has_ElectronBands, N
                 -  Number e.g ``e0 = 0.5``: shift all eigenvalues to have zero energy at 0.5 eV
                 -  None: Don't shift energies, equivalent to ``e0 = 0``
             lmax: Maximum L included in plot. None means full set available on file.
-            method: String defining the method for the computation of the DOS.
+            method: String defining the method for the computation of the DOS: "gaussian" or "tetra".
             step: Energy step (eV) of the linear mesh.
             width: Standard deviation (eV) of the gaussian.
             stacked: True if DOS partial contributions should be stacked on top of each other.
@@ -1100,7 +1103,7 @@ class FatBandsFile(AbinitNcFile, Has_Header, Has_Structure, Has_ElectronBands, N
                 -  Number e.g ``e0 = 0.5``: shift all eigenvalues to have zero energy at 0.5 eV
                 -  None: Don't shift energies, equivalent to ``e0 = 0``
             lmax: Maximum L included in plot. None means full set available on file.
-            method: String defining the method for the computation of the DOS.
+            method: String defining the method for the computation of the DOS: "gaussian" or "tetra".
             step: Energy step (eV) of the linear mesh.
             width: Standard deviation (eV) of the gaussian.
             stacked: True if DOS partial contributions should be stacked on top of each other.
@@ -1343,7 +1346,7 @@ class FatBandsFile(AbinitNcFile, Has_Header, Has_Structure, Has_ElectronBands, N
 
         Args:
             lmax: Maximum L included in plot. None means full set available on file.
-            method: String defining the method for the computation of the DOS.
+            method: String defining the method for the computation of the DOS: "gaussian", "lorentzian" or "tetra".
             step: Energy step (eV) of the linear mesh.
             width: Standard deviation (eV) of the gaussian.
             xlims: Set the data limits for the x-axis. Accept tuple e.g. ``(left, right)``
@@ -1385,18 +1388,30 @@ class FatBandsFile(AbinitNcFile, Has_Header, Has_Structure, Has_ElectronBands, N
         paw1dos_al = np.zeros((self.natom, self.lsize, self.nsppol, nw))
         pawt1dos_al = np.zeros((self.natom, self.lsize, self.nsppol, nw))
 
-        if method == "gaussian":
+        # Select the (atom, l) terms and stack the weights to compute the three DOSes in one call.
+        active_al = np.zeros((self.natom, self.lsize))
+        for iatom in range(self.natom):
+            if not self.has_atom[iatom]: continue
+            active_al[iatom, :min(self.lmax_atom[iatom] + 1, mylsize)] = 1.0
+
+        if method in ("gaussian", "lorentzian"):
+            wtk = kpoints.weights
             for spin in range(self.nsppol):
-                for k, kpoint in enumerate(kpoints):
-                    weight = kpoint.weight
-                    for band in range(nband_sk[spin, k]):
-                        gs = gaussian(mesh, width, center=eigens[spin,k,band])
-                        for iatom in range(self.natom):
-                            if not self.has_atom[iatom]: continue
-                            for l in range(min(self.lmax_atom[iatom] + 1, mylsize)):
-                                totdos_al[iatom, l, spin] += weight * gs * wal_sbk[iatom, l, spin, band, k]
-                                paw1dos_al[iatom, l, spin] += weight * gs * paw1_wal_sbk[iatom, l, spin, band, k]
-                                pawt1dos_al[iatom, l, spin] += weight * gs * pawt1_wal_sbk[iatom, l, spin, band, k]
+                # Exclude the bands beyond nband_sk. mask has shape [mband, nkpt].
+                mask = np.arange(self.mband)[:, None] < nband_sk[spin]
+                weights = np.array([w[:, :self.lsize, spin] for w in (wal_sbk, paw1_wal_sbk, pawt1_wal_sbk)])
+                weights = (weights * wtk * active_al[:, :, None, None])[..., mask]
+                dos3 = broadened_dos(mesh, eigens[spin].T[mask], width, weights=weights, method=method)
+                totdos_al[:, :, spin], paw1dos_al[:, :, spin], pawt1dos_al[:, :, spin] = dos3
+
+        elif method == "tetra":
+            for spin in range(self.nsppol):
+                # Weights with shape [3, natom, lsize, nkpt, nb]
+                nb = nband_sk[spin].min()
+                weights = np.array([w[:, :self.lsize, spin, :nb] for w in (wal_sbk, paw1_wal_sbk, pawt1_wal_sbk)])
+                weights = weights.transpose(0, 1, 2, 4, 3) * active_al[:, :, None, None]
+                dos3 = ebands.tetrahedra.get_dos(eigens[spin, :, :nb], mesh, weights=weights).values
+                totdos_al[:, :, spin], paw1dos_al[:, :, spin], pawt1dos_al[:, :, spin] = dos3
 
         else:
             raise ValueError("Method %s is not supported" % method)
@@ -1627,25 +1642,28 @@ class _DosIntegrator(object):
 
         # Compute l-decomposed PJDOS for each type of atom.
         symbols_lso = OrderedDict()
-        if self.method == "gaussian":
-
-            for symbol in fbfile.symbols:
-                lmax = fbfile.lmax_symbol[symbol]
-                wlsbk = fbfile.get_wl_symbol(symbol)
-                lso = np.zeros((fbfile.lsize, fbfile.nsppol, len(self.mesh)))
-                for spin in range(fbfile.nsppol):
-                    for k, kpoint in enumerate(ebands.kpoints):
-                        weight = kpoint.weight
-                        for band in range(ebands.nband_sk[spin, k]):
-                            e = ebands.eigens[spin, k, band]
-                            for l in range(lmax + 1):
-                                lso[l, spin] += wlsbk[l, spin, band, k] *\
-                                                weight * gaussian(self.mesh, self.width, center=e)
-                symbols_lso[symbol] = lso
-
-        else:
+        if self.method not in ("gaussian", "tetra"):
             raise ValueError("Method %s is not supported" % self.method)
 
+        for symbol in fbfile.symbols:
+            lmax = fbfile.lmax_symbol[symbol]
+            wlsbk = fbfile.get_wl_symbol(symbol)
+            lso = np.zeros((fbfile.lsize, fbfile.nsppol, len(self.mesh)))
+            for spin in range(fbfile.nsppol):
+                if self.method == "gaussian":
+                    # Exclude the bands beyond nband_sk. mask has shape [mband, nkpt].
+                    mask = np.arange(ebands.mband)[:, None] < ebands.nband_sk[spin]
+                    weights = (wlsbk[:lmax + 1, spin] * ebands.kpoints.weights)[..., mask]
+                    lso[:lmax + 1, spin] = gaussians_dos(lso[:lmax + 1, spin], self.mesh, self.width,
+                                                         weights, ebands.eigens[spin].T[mask], 1.0)
+                else:
+                    # Tetrahedron method with weights of shape [lmax + 1, nkpt, nb]
+                    nb = ebands.nband_sk[spin].min()
+                    weights = wlsbk[:lmax + 1, spin, :nb].transpose(0, 2, 1)
+                    lso[:lmax + 1, spin] = ebands.tetrahedra.get_dos(ebands.eigens[spin, :, :nb], self.mesh,
+                                                                     weights=weights).values
+            symbols_lso[symbol] = lso
+
         return symbols_lso
 
     @lazy_property
@@ -16,7 +16,7 @@ from abipy.core.mixins import AbinitNcFile, Has_Header, Has_Structure, Has_Elect
 from abipy.core.kpoints import KpointList, is_diagonal, find_points_along_path
 from abipy.tools.plotting import set_axlims, add_fig_kwargs, get_ax_fig_plt
 from abipy.electrons.ebands import ElectronsReader
-from abipy.tools.numtools import gaussian
+from abipy.tools.numtools import broadened_dos
 
 
 class Fold2BlochNcfile(AbinitNcFile, Has_Header, Has_Structure, Has_ElectronBands, NotebookWriter):
@@ -171,9 +171,8 @@ class Fold2BlochNcfile(AbinitNcFile, Has_Header, Has_Structure, Has_ElectronBand
         sfw = np.zeros((self.nss, self.uf_nkpt, nw))
         for spin in range(self.nss):
             for ik in range(self.uf_nkpt):
-                for band in range(self.nband):
-                    e = self.uf_eigens[spin, ik, band]
-                    sfw[spin, ik] += self.uf_weights[spin, ik, band] * gaussian(mesh, width, center=e)
+                sfw[spin, ik] = broadened_dos(mesh, self.uf_eigens[spin, ik], width,
+                                              weights=self.uf_weights[spin, ik])
 
         from scipy.integrate import cumtrapz
         int_sfw = cumtrapz(sfw, x=mesh, initial=0.0)
@@ -1128,6 +1128,8 @@ class SigresFile(AbinitNcFile, Has_Structure, Has_ElectronBands, NotebookWriter)
                     vertices_names=None, line_density=20, filter_params=None, only_corrections=False, verbose=0):
         """
         Interpolate the GW corrections in k-space on a k-path and, optionally, on a k-mesh.
+        The results of the fit are read from disk if the cache has been activated with
+        ``ElectronInterpolator.enable_disk_cache()`` (see :mod:`abipy.core.skw`).
 
         Args:
             lpratio: Ratio between the number of star functions and the number of ab-initio k-points.
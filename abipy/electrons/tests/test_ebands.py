@@ -277,6 +277,15 @@ class ElectronBandsTest(AbipyTest):
         imu = si_edos.tot_idos.find_mesh_index(mu)
         self.assert_almost_equal(si_edos.tot_idos[imu][1], 8, decimal=2)
 
+        # DOS with the linear tetrahedron method (Gamma-centered 8x8x8 mesh).
+        tetra = si_ebands_kmesh.tetrahedra
+        repr(tetra); str(tetra)
+        assert np.all(tetra.ngkpt == 8) and tetra.nibz == si_ebands_kmesh.nkpt
+        assert tetra.ntetra_bz == 6 * 8 ** 3 and tetra.tetra_mult.sum() == tetra.ntetra_bz
+        tetra_edos = si_ebands_kmesh.get_edos(method="tetra")
+        self.assert_almost_equal(tetra_edos.tot_idos.values[-1], si_edos.tot_idos.values[-1], decimal=2)
+        self.assert_almost_equal(tetra_edos.tot_idos[tetra_edos.tot_idos.find_mesh_index(mu)][1], 8, decimal=1)
+
         d, i = si_edos.dos_idos(spin=0)
         tot_d, tot_i = si_edos.dos_idos()
         self.assert_almost_equal(2 * d.values, tot_d.values)
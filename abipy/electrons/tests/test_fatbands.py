@@ -2,6 +2,7 @@
 from __future__ import print_function, division, absolute_import, unicode_literals
 
 import itertools
+import numpy as np
 import abipy.data as abidata
 
 from abipy import abilab
@@ -46,6 +47,16 @@ class TestElectronFatbands(AbipyTest):
         assert fbnc_kmesh.ebands.kpoints.is_ibz
         assert fbnc_kmesh.ebands.has_metallic_scheme
 
+        # PJDOS with the tetrahedron method.
+        # The integral of the PJDOS summed over atoms and l cannot exceed the integral of the total DOS.
+        intg = fbnc_kmesh.get_dos_integrator("tetra", step=0.1, width=0.2)
+        pjdos_sum = 0
+        for symbol, lso in intg.symbols_lso.items():
+            assert lso.shape == (fbnc_kmesh.lsize, fbnc_kmesh.nsppol, len(intg.mesh))
+            pjdos_sum += lso.sum(axis=0)
+        for spin in range(fbnc_kmesh.nsppol):
+            assert np.trapz(pjdos_sum[spin], x=intg.mesh) <= np.trapz(intg.edos.spin_dos[spin].values, x=intg.mesh)
+
         if self.has_matplotlib():
             assert fbnc_kmesh.plot_pjdos_typeview(tight_layout=True, show=False)
             assert fbnc_kmesh.plot_pjdos_lview(tight_layout=True, stacked=True, show=False)
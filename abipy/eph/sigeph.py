@@ -955,9 +955,10 @@ class SigEPhFile(AbinitNcFile, Has_Structure, Has_ElectronBands, NotebookWriter)
 
         # Generic case
         # Map sigma_kpoints to ebands.kpoints
-        kcalc2ibz = np.empty(self.nkcalc, dtype=np.int)
-        for ikc, sigkpt in enumerate(self.sigma_kpoints):
-            kcalc2ibz[ikc] = self.ebands.kpoints.index(sigkpt)
+        kcalc2ibz = self.ebands.kpoints.find_indices(self.sigma_kpoints.frac_coords)
+        if np.any(kcalc2ibz == -1):
+            ikc = np.nonzero(kcalc2ibz == -1)[0][0]
+            raise ValueError("Cannot find point: %s in ebands.kpoints" % repr(self.sigma_kpoints[ikc]))
 
         return kcalc2ibz
 
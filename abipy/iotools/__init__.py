@@ -1,6 +1,7 @@
 # coding: utf-8
 from __future__ import print_function, division, unicode_literals, absolute_import
 
+import threading
 import numpy as np
 import pymatgen.io.abinit.netcdf as ionc
 
@@ -12,6 +13,11 @@ from .visualizer import *
 
 as_etsfreader = ionc.as_etsfreader
 
+# netCDF-C and HDF5 are not thread-safe unless built with thread support and netCDF4-python
+# releases the GIL during I/O. Code reading netCDF files from background threads
+# must acquire this lock (the main thread as well if it accesses the file at the same time).
+netcdf_lock = threading.RLock()
+
 
 class ETSF_Reader(ionc.ETSF_Reader):
     """
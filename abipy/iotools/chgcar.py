@@ -0,0 +1,93 @@
+# coding: utf-8
+"""
+Tools for reading and writing VASP CHGCAR files.
+See http://cms.mpi.univie.ac.at/vasp/vasp/CHGCAR_file.html
+"""
+from __future__ import print_function, division, unicode_literals, absolute_import
+
+import numpy as np
+
+from collections import OrderedDict
+from monty.io import zopen
+from pymatgen.io.vasp.inputs import Poscar
+from abipy.iotools.cube import write_formatted_array, read_values
+
+
+# Keys of the data blocks for given number of blocks (same convention as pymatgen).
+_KEYS_FOR_NBLOCKS = {
+    1: ("total",),
+    2: ("total", "diff"),
+    4: ("total", "diff_x", "diff_y", "diff_z"),
+}
+
+
+__all__ = [
+    "chgcar_write",
+    "chgcar_read",
+]
+
+
+def chgcar_write(filepath, structure, data_dict):
+    """
+    Write a CHGCAR file. Compressed files are produced if filepath ends with .gz or .bz2
+
+    Args:
+        filepath: Path of the output file.
+        structure: |Structure| object.
+        data_dict: Dictionary with the "total" array [nx, ny, nz] and the optional "diff" array
+            (or "diff_x", "diff_y", "diff_z" for non-collinear magnetism).
+            Data must be multiplied by the volume of the unit cell (VASP convention).
+    """
+    with zopen(filepath, "wt") as fh:
+        fh.write(Poscar(structure).get_string())
+        for key in ("total", "diff", "diff_x", "diff_y", "diff_z"):
+            if key not in data_dict: continue
+            data = data_dict[key]
+            fh.write("\n%d %d %d\n" % data.shape)
+            # VASP uses Fortran order i.e. x is the fastest index.
+            write_formatted_array(fh, np.ravel(data, order="F"), " %.11E", ncols=5)
+
+
+def chgcar_read(filepath):
+    """
+    Read a CHGCAR file. Accepts compressed files (.gz, .bz2).
+    Augmentation occupancies are ignored.
+
+    Return: (structure, data_dict) where data_dict contains the "total" array [nx, ny, nz],
+        the "diff" array if spin-polarized or the "diff_x", "diff_y", "diff_z" arrays
+        for non-collinear magnetism (same keys as pymatgen).
+        Data is multiplied by the volume (VASP convention).
+    """
+    with zopen(filepath, "rt") as fh:
+        # Read the POSCAR section (ends with an empty line).
+        lines = []
+        # Use readline to avoid mixing the file iterator with read_values.
+        for line in iter(fh.readline, ""):
+            if not line.strip(): break
+            lines.append(line)
+        structure = Poscar.from_string("".join(lines), read_velocities=False).structure
+
+        blocks = []
+        dims = None
+        while True:
+            # Look for the line with the FFT divisions (skip augmentation occupancies).
+            for line in iter(fh.readline, ""):
+                tokens = line.split()
+                if len(tokens) != 3: continue
+                try:
+                    new_dims = tuple(int(t) for t in tokens)
+                except ValueError:
+                    continue
+                if dims is None or new_dims == dims:
+                    dims = new_dims
+                    break
+            else:
+                break
+
+            values = read_values(fh, np.prod(dims))
+            blocks.append(np.reshape(values, dims, order="F"))
+
+    if len(blocks) not in _KEYS_FOR_NBLOCKS:
+        raise ValueError("Found %d data blocks in CHGCAR file: %s" % (len(blocks), filepath))
+
+    return structure, OrderedDict(zip(_KEYS_FOR_NBLOCKS[len(blocks)], blocks))
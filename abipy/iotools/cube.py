@@ -7,6 +7,7 @@ from __future__ import print_function, division, unicode_literals, absolute_impo
 
 import numpy as np
 
+from monty.io import zopen
 from pymatgen.core.lattice import Lattice
 from pymatgen.core.sites import PeriodicSite
 from pymatgen.core.units import bohr_to_angstrom
@@ -15,9 +16,48 @@ from pymatgen.core.units import bohr_to_angstrom
 __all__ = [
     "cube_write_structure_mesh",
     "cube_write_data",
+    "cube_read_structure_mesh_data",
 ]
 
 
+def write_formatted_array(file, values, fmt, ncols, chunksize=100000):
+    """
+    Write the 1D array ``values`` to file using the format ``fmt`` with ``ncols`` values per line.
+    The data is formatted in blocks of ``chunksize`` values with a single string operation per block.
+    """
+    values = np.asarray(values).ravel()
+    # Use a multiple of ncols so that all the lines in a chunk are complete.
+    chunksize = max(ncols, chunksize - chunksize % ncols)
+    line_fmt = fmt * ncols + "\n"
+    fwrite = file.write
+    for start in range(0, len(values), chunksize):
+        chunk = values[start:start+chunksize]
+        nfull = len(chunk) // ncols
+        if nfull:
+            fwrite((line_fmt * nfull) % tuple(chunk[:nfull * ncols]))
+        if len(chunk) % ncols:
+            fwrite((fmt * (len(chunk) % ncols) + "\n") % tuple(chunk[nfull * ncols:]))
+
+
+def read_values(file, num):
+    """
+    Read ``num`` floating point values from the file-like object
+    with a single call to numpy. Consume the lines containing the values.
+    """
+    tokens, count = [], 0
+    while count < num:
+        line = file.readline()
+        if not line: break
+        tokens.append(line)
+        count += len(line.split())
+
+    values = np.fromstring(" ".join(tokens), sep=" ")
+    if len(values) != num:
+        raise ValueError("Expecting %d values, found %d" % (num, len(values)))
+
+    return values
+
+
 def cube_write_structure_mesh(file, structure, mesh):
     fwrite = file.write
     fwrite("Density generated from abipy\n")
@@ -35,16 +75,20 @@ def cube_write_structure_mesh(file, structure, mesh):
 
 
 def cube_write_data(file, data, mesh):
-    fwrite = file.write
-    data_bohrs = data * (bohr_to_angstrom ** 3)
-    for ix in range(mesh.nx):
-        for iy in range(mesh.ny):
-            for iz in range(mesh.nz):
-                fwrite('{:.5e}\n'.format(data_bohrs[ix, iy, iz]))
+    """
+    Write data[nx, ny, nz] in C order with one value per line.
+    """
+    data_bohrs = np.reshape(data, mesh.shape) * (bohr_to_angstrom ** 3)
+    write_formatted_array(file, data_bohrs, "%.5e", ncols=1)
 
 
 def cube_read_structure_mesh_data(file):
-    with open(file, 'r') as fh:
+    """
+    Read structure, mesh and data from the CUBE file ``file``. Accepts compressed files (.gz, .bz2).
+
+    Return: (structure, mesh, data)
+    """
+    with zopen(file, 'rt') as fh:
         # The two first lines are comments
         for ii in range(2):
             fh.readline()
@@ -68,15 +112,10 @@ def cube_read_structure_mesh_data(file):
             cc = np.array([float(sp[ii]) for ii in range(2, 5)]) * bohr_to_angstrom
             sites.append(PeriodicSite(int(sp[0]), coords=cc, lattice=lattice, to_unit_cell=False,
                                       coords_are_cartesian=True))
-        data = np.zeros((nx, ny, nz))
-        ii = 0
-        for line in fh:
-            for val in line.split():
-                data[ii//(ny*nz), (ii//nz)%ny, ii%nz] = float(val)
-                ii += 1
-        data = data / (bohr_to_angstrom ** 3)
-        if ii != nx*ny*nz:
+        data = np.fromstring(fh.read(), sep=" ")
+        if len(data) != nx*ny*nz:
             raise ValueError('Wrong number of data points ...')
+        data = np.reshape(data, (nx, ny, nz)) / (bohr_to_angstrom ** 3)
         from abipy.core.structure import Structure
         structure = Structure.from_sites(sites=sites)
         from abipy.core.mesh3d import Mesh3D
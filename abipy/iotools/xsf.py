@@ -130,12 +130,11 @@ def xsf_write_data(file, structure, data, add_replicas=True, cplx_mode=None):
         for i in range(3):
             fwrite('%f %f %f\n' % tuple(cell[i]))
 
-        for z in range(fgrid[0]):
-            for y in range(fgrid[1]):
-                slice_x = fdata[dg,z,y]
-                fwrite(' '.join(['%f' % d for d in slice_x]) )
-                fwrite('\n')
-            fwrite('\n')
+        # Each z-plane is formatted with a single string operation (one line per y, followed by an empty line).
+        nz, ny, nx = fgrid
+        plane_fmt = (" ".join(nx * ["%f"]) + "\n") * ny + "\n"
+        for z in range(nz):
+            fwrite(plane_fmt % tuple(fdata[dg, z].ravel()))
 
         fwrite(' END_DATAGRID_3D\n')
     fwrite('END_BLOCK_DATAGRID_3D\n')
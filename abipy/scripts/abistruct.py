@@ -15,14 +15,8 @@ from warnings import warn
 from monty.string import marquee
 from monty.functools import prof_main
 from monty.termcolor import cprint
-from pymatgen.io.vasp.outputs import Xdatcar
 from abipy import abilab
-from abipy.core.symmetries import AbinitSpaceGroup
-from abipy.core.kpoints import Ktables, Kpoint, IrredZone
-from abipy.core.structure import diff_structures
 from abipy.iotools.visualizer import Visualizer
-from abipy.iotools.xsf import xsf_write_structure
-from abipy.abio import factories
 
 
 #def remove_equivalent_atoms(structure):
@@ -518,12 +512,14 @@ def main():
                 cprint("Crystal structure will be re-symmetrized by Abinit with tolsym: %s" % options.tolsym, "yellow")
 
             from abipy.data.hgh_pseudos import HGH_TABLE
+            from abipy.abio import factories
             gsinp = factories.gs_input(structure, HGH_TABLE, spin_mode="unpolarized")
             gsinp["chkprim"] = 0
             abistructure = gsinp.abiget_spacegroup(tolsym=options.tolsym)
             print(abistructure.spget_summary(verbose=options.verbose))
             print("")
 
+            from abipy.core.structure import diff_structures
             diff_structures([structure, abistructure], mode=options.diff_mode,
                             headers=["Input structure", "After Abinit symmetrization"], fmt="abivars")
 
@@ -744,6 +740,7 @@ def main():
 
     elif options.command == "ktables":
         structure = abilab.Structure.from_file(options.filepath)
+        from abipy.core.kpoints import Ktables
         k = Ktables(structure, options.mesh, options.is_shift, not options.no_time_reversal)
         print(k)
         print("")
@@ -761,6 +758,7 @@ def main():
         if options.kppa is None and options.ngkpt is None:
             raise ValueError("Either ngkpt or kppa must be provided")
 
+        from abipy.core.kpoints import IrredZone
         if options.kppa is not None:
             print("Calling Abinit to compute the IBZ with kppa:", options.kppa, "and shiftk:", options.shiftk)
             ibz = IrredZone.from_kppa(structure, options.kppa, options.shiftk,
@@ -787,6 +785,7 @@ def main():
             cprint("Your file does not contain Abinit symmetry operations.", "yellow")
             cprint("Will call spglib to obtain the space group (assuming time-reversal: %s)" %
                    (not options.no_time_reversal), "yellow")
+            from abipy.core.symmetries import AbinitSpaceGroup
             spgrp = AbinitSpaceGroup.from_structure(structure, has_timerev=not options.no_time_reversal,
                         symprec=options.symprec, angle_tolerance=options.angle_tolerance)
         print()
@@ -805,6 +804,7 @@ def main():
         if structure.abi_spacegroup is None:
             structure.spgset_abi_spacegroup(has_timerev=not options.no_time_reversal)
 
+        from abipy.core.kpoints import Kpoint
         kpoint = Kpoint(options.kpoint, structure.reciprocal_lattice)
         kstar = kpoint.compute_star(structure.abi_spacegroup, wrap_tows=True)
         print("Found %s points in the star of %s\n" % (len(kstar), repr(kpoint)))
@@ -902,6 +902,7 @@ def main():
                 structures = hist.structures
 
         elif "XDATCAR" in filepath:
+            from pymatgen.io.vasp.outputs import Xdatcar
             structures = Xdatcar(filepath).structures
             if not structures:
                 raise RuntimeError("Your Xdatcar contains only one structure. Due to a bug "
@@ -910,6 +911,7 @@ def main():
         else:
             raise ValueError("Don't know how to handle file %s" % filepath)
 
+        from abipy.iotools.xsf import xsf_write_structure
         xsf_write_structure(sys.stdout, structures)
 
     else:
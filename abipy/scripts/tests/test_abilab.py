@@ -41,4 +41,47 @@ class AbilabTest(AbipyTest):
         abilab.enable_notebook(with_seaborn=True)
         assert abilab.in_notebook()
         abilab.disable_notebook()
-        assert not abilab.in_notebook()
\ No newline at end of file
+        assert not abilab.in_notebook()
+
+    def test_lazy_imports(self):
+        """Testing lazy imports of abilab."""
+        import sys
+        import subprocess
+        assert abilab.abifile_subclass_from_filename("foo_GSR.nc") is abilab.GsrFile
+        assert "GsrRobot" in dir(abilab)
+        assert abilab.units.eV_to_Ha > 0
+        assert callable(abilab.gs_input)
+        with self.assertRaises(AttributeError):
+            abilab.foobar
+        ns = {}
+        exec("from abipy.abilab import *", ns)
+        assert all(name in ns for name in ("abiopen", "GsrFile", "Structure", "gs_input", "units"))
+
+        if sys.version_info < (3, 7):
+            raise self.SkipTest("Lazy imports require python >= 3.7")
+
+        # Run in a new interpreter to check the modules imported by abiopen.
+        # Note that abipy.flowtk is still needed by the netcdf readers.
+        heavy = ["abipy.dfpt", "abipy.eph", "abipy.wannier90", "abipy.electrons.lobster",
+                 "abipy.abio.abivars_db", "abipy.abio.factories", "abipy.abio.inputs"]
+        script = """\
+import sys, time
+start = time.time()
+from abipy import abilab
+import_time = time.time() - start
+with abilab.abiopen(%r) as gsr:
+    gsr.energy
+total_time = time.time() - start
+heavy = [m for m in sys.modules if any(m == h or m.startswith(h + ".") for h in %r)]
+print(import_time, total_time, ",".join(heavy))
+""" % (abidata.ref_file("si_scf_GSR.nc"), heavy)
+        out = subprocess.check_output([sys.executable, "-c", script]).decode("utf-8").split()
+        import_time, total_time = float(out[0]), float(out[1])
+        loaded = out[2].split(",") if len(out) > 2 else []
+        assert not loaded, "abiopen imported heavy modules: %s" % str(loaded)
+
+        # Wall-clock bounds are checked only on request since they depend on the load of the machine.
+        # See dev_scripts/import_bench.py for the benchmark.
+        if os.environ.get("ABIPY_CHECK_IMPORT_TIME"):
+            assert import_time < 1.0
+            assert total_time < 10.0
@@ -4,7 +4,7 @@ from __future__ import print_function, division, unicode_literals, absolute_impo
 
 import numpy as np
 
-from collections import deque
+from collections import deque, OrderedDict
 from scipy.special import spherical_jn
 from scipy.interpolate import UnivariateSpline
 from scipy.integrate import simps # cumtrapz, quad
@@ -12,8 +12,12 @@ from scipy.integrate import simps # cumtrapz, quad
 
 _DEFAULTS = {"numq": 3001, "numr": 3001}
 
+# Cache of splines indexed by (l, qmax, rcut, numq, numr).
+_SPLINE_CACHE = OrderedDict()
+_SPLINE_MAXSIZE = 64
 
-def spline_int_jlqr(l, qmax, rcut, numq=None, numr=None):
+
+def spline_int_jlqr(l, qmax, rcut, numq=None, numr=None, cache=True):
     r"""
     Compute :math:`j_n(z) = \int_0^{rcut} r^2 j_l(qr) dr`
     where :math:`j_l` is the Spherical Bessel function.
@@ -24,6 +28,7 @@ def spline_int_jlqr(l, qmax, rcut, numq=None, numr=None):
         rcut: Sphere radius in Angstrom.
         numq: Number of q-points in qmesh.
         numr: Number of r-points for integration.
+        cache: True if the spline should be taken from (and stored in) the internal cache.
 
     Return:
         Spline object.
@@ -31,15 +36,31 @@ def spline_int_jlqr(l, qmax, rcut, numq=None, numr=None):
     numq = numq if numq is not None else _DEFAULTS["numq"]
     numr = numr if numr is not None else _DEFAULTS["numr"]
 
+    key = (int(l), float(qmax), float(rcut), int(numq), int(numr))
+    if cache and key in _SPLINE_CACHE:
+        return _SPLINE_CACHE[key]
+
     rs = np.linspace(0, rcut, num=numr)
     r2 = rs ** 2
     qmesh = np.linspace(0, qmax, num=numq)
-    values = []
-    for q in qmesh:
-        qrs = q * rs
-        #qrs = 2 * np.pi * q * rs
-        ys = spherical_jn(l, qrs) * r2
-        intg = simps(ys, x=rs)
-        values.append(intg)
-
-    return UnivariateSpline(qmesh, values, s=0)
+
+    # Integrate blocks of q-points to limit the size of the [nq, nr] temporary arrays.
+    values = np.empty(numq)
+    step = max(1, 2**22 // numr)
+    for start in range(0, numq, step):
+        stop = min(start + step, numq)
+        ys = spherical_jn(l, np.outer(qmesh[start:stop], rs)) * r2
+        values[start:stop] = simps(ys, x=rs, axis=-1)
+
+    spline = UnivariateSpline(qmesh, values, s=0)
+    if cache:
+        _SPLINE_CACHE[key] = spline
+        if len(_SPLINE_CACHE) > _SPLINE_MAXSIZE:
+            _SPLINE_CACHE.popitem(last=False)
+
+    return spline
+
+
+def clear_spline_cache():
+    """Remove all the splines stored in the internal cache."""
+    _SPLINE_CACHE.clear()
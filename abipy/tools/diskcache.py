@@ -0,0 +1,352 @@
+# coding: utf-8
+"""
+Content-addressed caches on disk: numpy arrays stored in compressed npz files
+and decompressed copies of gzipped/bzipped files.
+"""
+from __future__ import print_function, division, unicode_literals, absolute_import
+
+import os
+import re
+import shutil
+import hashlib
+import tempfile
+import threading
+import numpy as np
+
+from collections import OrderedDict
+from monty.string import is_string
+
+
+__all__ = [
+    "NpzDiskCache",
+    "DecompressionCache",
+]
+
+
+class _LruDiskCache(object):
+    """
+    Base class for caches storing one file per entry in ``cache_dir``.
+    The size of the cache directory is kept below ``max_nbytes`` by removing
+    the least recently used entries (the modification time is updated when an entry is accessed).
+    Subclasses must implement ``_is_entry``.
+    """
+
+    def __init__(self, cache_dir, max_nbytes=1024 ** 3):
+        """
+        Args:
+            cache_dir: Directory used to store the files. Created if it does not exist.
+            max_nbytes: Maximum size of the cache in bytes.
+        """
+        self.cache_dir = os.path.abspath(os.path.expanduser(cache_dir))
+        self.max_nbytes = int(max_nbytes)
+        self.hits, self.misses = 0, 0
+
+    def __str__(self):
+        return self.to_string()
+
+    def to_string(self, verbose=0):
+        """String representation."""
+        stats = self.get_stats()
+        lines = ["Cache directory: %s" % self.cache_dir]
+        app = lines.append
+        app("Number of entries: %d, size: %.1f / %.1f (Mb)" % (
+            stats["nfiles"], stats["nbytes"] / 1024 ** 2, self.max_nbytes / 1024 ** 2))
+        app("Hits: %d, misses: %d" % (stats["hits"], stats["misses"]))
+
+        return "\n".join(lines)
+
+    def _is_entry(self, fname):
+        """True if ``fname`` is the basename of an entry of the cache."""
+        raise NotImplementedError()
+
+    def _is_pinned(self, path):
+        """True if the entry with the given path must not be removed."""
+        return False
+
+    def _makedirs(self):
+        """Create the cache directory if it does not exist."""
+        if not os.path.exists(self.cache_dir):
+            try:
+                os.makedirs(self.cache_dir)
+            except OSError:
+                # Directory may have been created by another process.
+                if not os.path.isdir(self.cache_dir): raise
+
+    @staticmethod
+    def _touch(path):
+        """Update the modification time used to find the least recently used entries."""
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+
+    def _get_entries(self):
+        """Return list of (mtime, nbytes, path) tuples sorted by modification time."""
+        if not os.path.isdir(self.cache_dir): return []
+        entries = []
+        for fname in os.listdir(self.cache_dir):
+            if not self._is_entry(fname): continue
+            path = os.path.join(self.cache_dir, fname)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+
+        return sorted(entries)
+
+    def evict(self, keep=None):
+        """
+        Remove the least recently used entries until the size of the cache is smaller than `max_nbytes`.
+        The entry with path ``keep`` and the pinned entries are never removed. Return number of entries removed.
+        """
+        entries = self._get_entries()
+        nbytes = sum(e[1] for e in entries)
+        count = 0
+        for _, size, path in entries:
+            if nbytes <= self.max_nbytes: break
+            if path == keep or self._is_pinned(path): continue
+            try:
+                os.remove(path)
+                nbytes -= size
+                count += 1
+            except OSError:
+                pass
+
+        return count
+
+    def clear(self):
+        """Remove all the entries (except the pinned ones) and reset statistics."""
+        for _, _, path in self._get_entries():
+            if self._is_pinned(path): continue
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self.hits, self.misses = 0, 0
+
+    def get_stats(self):
+        """Return dictionary with hits, misses, number of entries and total size in bytes."""
+        entries = self._get_entries()
+        return dict(hits=self.hits, misses=self.misses,
+                    nfiles=len(entries), nbytes=sum(e[1] for e in entries))
+
+
+class NpzDiskCache(_LruDiskCache):
+    """
+    Content-addressed cache of numpy arrays. Each entry is stored in a compressed npz file
+    whose name is given by a hash of the input data (see :meth:`hash_data`).
+    The size of the cache directory is kept below ``max_nbytes`` by removing
+    the least recently used entries.
+
+    Usage example:
+
+    .. code-block:: python
+
+        cache = NpzDiskCache("~/.abinit/abipy/mycache")
+        key = cache.hash_data("myfunc", input_array, param)
+        data = cache.load(key)
+        if data is None:
+            data = dict(result=myfunc(input_array, param))
+            cache.save(key, **data)
+    """
+
+    def _is_entry(self, fname):
+        return fname.endswith(".npz")
+
+    @staticmethod
+    def hash_data(*args):
+        """
+        Compute the key from a list of objects. Accepts numpy arrays (or objects that can be
+        converted to arrays), strings and None. Returns string with the hexadecimal digest.
+        """
+        sha = hashlib.sha1()
+        for obj in args:
+            if obj is None:
+                sha.update(b"None")
+            elif is_string(obj):
+                sha.update(obj.encode("utf-8"))
+            else:
+                arr = np.ascontiguousarray(obj)
+                if arr.dtype == object:
+                    raise TypeError("Cannot hash object arrays: %s" % str(obj))
+                sha.update(("%s%s" % (arr.dtype.str, arr.shape)).encode("utf-8"))
+                sha.update(arr.tobytes())
+
+        return sha.hexdigest()
+
+    def path_from_key(self, key):
+        """Absolute path of the npz file associated to `key`."""
+        return os.path.join(self.cache_dir, key + ".npz")
+
+    def load(self, key):
+        """
+        Return OrderedDict with the arrays associated to `key`. None if the key is not in the cache.
+        """
+        path = self.path_from_key(key)
+        if not os.path.exists(path):
+            self.misses += 1
+            return None
+
+        try:
+            with np.load(path) as npz:
+                data = OrderedDict((k, npz[k]) for k in npz.files)
+        except Exception:
+            # Corrupted or partially written file.
+            self.remove(key)
+            self.misses += 1
+            return None
+
+        self._touch(path)
+        self.hits += 1
+        return data
+
+    def save(self, key, **arrays):
+        """
+        Save `arrays` in the cache and remove the least recently used entries if the cache is too large.
+        Return path of the npz file.
+        """
+        self._makedirs()
+
+        # Write to temporary file and rename so that readers never see partially written files.
+        fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=self.cache_dir)
+        with os.fdopen(fd, "wb") as fh:
+            np.savez_compressed(fh, **arrays)
+
+        path = self.path_from_key(key)
+        os.rename(tmp_path, path)
+        self.evict()
+
+        return path
+
+    def remove(self, key):
+        """Remove entry from the cache. Return True if success."""
+        try:
+            os.remove(self.path_from_key(key))
+            return True
+        except OSError:
+            return False
+
+
+class DecompressionCache(_LruDiskCache):
+    """
+    Content-addressed cache with the decompressed copies of gzipped/bzipped files.
+    Entries are named ``<sha1 of compressed data>_<basename without compression extension>``
+    so that the file type can still be detected from the extension.
+    Files are decompressed in chunks so that the full content is never loaded in memory.
+
+    Entries used by live objects should be pinned (see :meth:`pin`) so that they are not removed
+    by eviction while the object still reads the file. Pins are tracked per process
+    hence a cache directory shared by several processes may remove entries used by other processes.
+
+    Usage example:
+
+    .. code-block:: python
+
+        cache = DecompressionCache("~/.abinit/abipy/decompressed")
+        path = cache.decompress("out_DDB.gz", pin=True)
+        # ... read path ...
+        cache.unpin(path)
+    """
+
+    # Compression extension --> function returning a file object in binary mode.
+    _OPENERS = {
+        ".gz": lambda path: __import__("gzip").open(path, "rb"),
+        ".z": lambda path: __import__("gzip").open(path, "rb"),
+        ".bz2": lambda path: __import__("bz2").BZ2File(path, "rb"),
+    }
+
+    _ENTRY_RE = re.compile(r"^[0-9a-f]{40}_.+")
+
+    def __init__(self, cache_dir, max_nbytes=1024 ** 3):
+        super(DecompressionCache, self).__init__(cache_dir, max_nbytes=max_nbytes)
+        # Path of the pinned entry --> number of pins.
+        self._pins = {}
+        self._lock = threading.RLock()
+
+    def _is_entry(self, fname):
+        return self._ENTRY_RE.match(fname) is not None and not fname.endswith(".tmp")
+
+    def _is_pinned(self, path):
+        return self._pins.get(path, 0) > 0
+
+    def pin(self, path):
+        """Protect the entry with the given path from eviction until :meth:`unpin` is called."""
+        with self._lock:
+            self._pins[path] = self._pins.get(path, 0) + 1
+
+    def unpin(self, path):
+        """Release one pin of the entry with the given path."""
+        with self._lock:
+            count = self._pins.get(path, 0) - 1
+            if count > 0:
+                self._pins[path] = count
+            else:
+                self._pins.pop(path, None)
+
+    def evict(self, keep=None):
+        with self._lock:
+            return super(DecompressionCache, self).evict(keep=keep)
+
+    def clear(self):
+        with self._lock:
+            super(DecompressionCache, self).clear()
+
+    @classmethod
+    def is_compressed(cls, filepath):
+        """True if ``filepath`` has an extension associated to a supported compression format."""
+        return os.path.splitext(filepath)[1].lower() in cls._OPENERS
+
+    @staticmethod
+    def hash_file(filepath, chunksize=2 ** 20):
+        """Return string with the sha1 hexadecimal digest of the content of ``filepath``."""
+        sha = hashlib.sha1()
+        with open(filepath, "rb") as fh:
+            for chunk in iter(lambda: fh.read(chunksize), b""):
+                sha.update(chunk)
+        return sha.hexdigest()
+
+    def path_from_filepath(self, filepath, key=None):
+        """Absolute path of the decompressed file associated to ``filepath`` in the cache."""
+        if key is None: key = self.hash_file(filepath)
+        root = os.path.splitext(os.path.basename(filepath))[0]
+        return os.path.join(self.cache_dir, "%s_%s" % (key, root))
+
+    def decompress(self, filepath, chunksize=2 ** 20, pin=False):
+        """
+        Return the path of the decompressed copy of ``filepath``.
+        The file is decompressed only if the cache does not contain an entry with the same content.
+        If ``pin``, the entry is pinned before being returned and the caller must call :meth:`unpin`.
+        """
+        ext = os.path.splitext(filepath)[1].lower()
+        if ext not in self._OPENERS:
+            raise ValueError("Don't know how to decompress file with extension `%s`: %s" % (ext, filepath))
+
+        path = self.path_from_filepath(filepath)
+        with self._lock:
+            if os.path.exists(path):
+                if pin: self.pin(path)
+                self._touch(path)
+                self.hits += 1
+                return path
+            self.misses += 1
+
+        self._makedirs()
+
+        # Write to temporary file and rename so that readers never see partially written files.
+        fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=self.cache_dir)
+        try:
+            with os.fdopen(fd, "wb") as out, self._OPENERS[ext](filepath) as fin:
+                shutil.copyfileobj(fin, out, chunksize)
+            with self._lock:
+                os.rename(tmp_path, path)
+                if pin: self.pin(path)
+        except Exception:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+        self.evict(keep=path)
+        return path
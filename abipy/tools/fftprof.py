@@ -16,6 +16,7 @@ from abipy.tools.plotting import add_fig_kwargs, get_ax_fig_plt
 
 __all__ = [
     "FFTBenchmark",
+    "benchmark_mesh3d_fft",
 ]
 
 _color_fftalg = {
@@ -233,6 +234,64 @@ class FFTBenchmark(object):
         return fig
 
 
+def benchmark_mesh3d_fft(ngfft_list, backends=None, nthreads_list=(1,), nbatch=1, nrepeat=5, verbose=0):
+    """
+    Microbenchmark for the FFT backends used by |Mesh3D| (see :func:`abipy.core.mesh3d.set_fft_backend`).
+    Each test executes a forward and a backward transform of a complex array [nbatch, nx, ny, nz]
+    and reports the best wall-time among nrepeat runs.
+
+    Args:
+        ngfft_list: List of FFT divisions e.g. [(64, 64, 64), (96, 96, 96)]
+        backends: List of backends to test. None for all the backends available.
+        nthreads_list: List with the number of threads.
+        nbatch: Number of 3D arrays transformed with a single call.
+        nrepeat: Number of repetitions.
+        verbose: Verbosity level.
+
+    Return: |pandas-DataFrame| with the wall-time in seconds and the speedup wrt numpy.
+    """
+    import time
+    import pandas as pd
+    from abipy.core.mesh3d import Mesh3D, set_fft_backend, _has_scipy_fft, _has_pyfftw
+
+    if backends is None:
+        backends = ["numpy"]
+        if _has_scipy_fft(): backends.append("scipy")
+        if _has_pyfftw(): backends.append("pyfftw")
+
+    rows = []
+    old = set_fft_backend()
+    try:
+        for ngfft in ngfft_list:
+            mesh = Mesh3D(ngfft, np.eye(3))
+            fg = mesh.crandom(extra_dims=nbatch)
+            out = mesh.cempty(extra_dims=nbatch)
+            ref_time = None
+            for backend in backends:
+                for nthreads in ([1] if backend == "numpy" else nthreads_list):
+                    set_fft_backend(backend=backend, nthreads=nthreads)
+                    # Warm up (plans are cached by pyfftw).
+                    mesh.fft_r2g(mesh.fft_g2r(fg, out=out), out=out)
+                    times = []
+                    for i in range(nrepeat):
+                        start = time.time()
+                        mesh.fft_r2g(mesh.fft_g2r(fg, out=out), out=out)
+                        times.append(time.time() - start)
+                    wall_time = min(times)
+                    if backend == "numpy": ref_time = wall_time
+                    rows.append(dict(backend=backend, nthreads=nthreads, ngfft=tuple(mesh.shape),
+                                     nbatch=nbatch, wall_time=wall_time))
+                    if verbose: print(rows[-1])
+
+            for row in rows:
+                if row["ngfft"] == tuple(mesh.shape) and ref_time is not None:
+                    row["speedup"] = ref_time / row["wall_time"]
+    finally:
+        set_fft_backend(**old)
+
+    return pd.DataFrame(rows, columns=["backend", "nthreads", "ngfft", "nbatch", "wall_time", "speedup"])
+
+
 def parse_prof_file(fileobj):
     """
     Parse the PROF file generated by fftprof.F90.
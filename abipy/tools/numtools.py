@@ -227,6 +227,109 @@ def lorentzian(x, width, center=0.0, height=None):
 
     return height * width**2 / ((x - center) ** 2 + width ** 2)
 
+
+def broadened_dos(mesh, centers, width, weights=None, method="gaussian", ntw=6.0):
+    r"""
+    Compute :math:`\sum_i w_i \delta(x - c_i)` on `mesh` with the delta function replaced by a normalized
+    gaussian or lorentzian. This is the vectorized version of the loops over (spin, k, band) calling
+    gaussian(mesh, width, center=e).
+
+    For linear meshes, the gaussians are computed only within ``ntw * width`` from the center and accumulated
+    with np.bincount while the lorentzians are obtained by convolving a linear histogram of the centers
+    with the lorentzian kernel (FFT). For non-linear meshes, the broadened delta functions are evaluated
+    on the full mesh for blocks of centers.
+
+    Args:
+        mesh: Array with the points of the mesh [nw].
+        centers: Array-like with the position of the peaks e.g. eigenvalues. Any shape.
+        width: Standard deviation of the gaussian or half-width at half-maximum of the lorentzian.
+        weights: Weights of the peaks. None if all weights are equal to one. Array with the same shape as centers
+            or array of shape [..., centers.shape] to compute several DOSes (e.g. projected DOSes)
+            sharing the same centers.
+        method: "gaussian" or "lorentzian".
+        ntw: Gaussians are truncated at ``ntw * width``.
+
+    Return: Array of shape [nw] if weights is None or weights.shape == centers.shape else [..., nw]
+    """
+    if method not in ("gaussian", "lorentzian"):
+        raise ValueError("Method %s is not supported" % str(method))
+
+    mesh = np.asarray(mesh, dtype=np.float)
+    centers = np.asarray(centers, dtype=np.float)
+    nw, ncs = len(mesh), centers.size
+
+    if weights is None:
+        wsets, out_shape = np.ones((1, ncs)), (nw,)
+    else:
+        weights = np.asarray(weights, dtype=np.float)
+        if weights.shape == centers.shape:
+            out_shape = (nw,)
+        elif weights.shape[weights.ndim - centers.ndim:] == centers.shape:
+            out_shape = weights.shape[:weights.ndim - centers.ndim] + (nw,)
+        else:
+            raise ValueError("Incompatible shapes for centers %s and weights %s" % (centers.shape, weights.shape))
+        wsets = weights.reshape(-1, ncs)
+
+    centers = centers.ravel()
+    nsets = len(wsets)
+    dos = np.zeros((nsets, nw))
+    if nw == 0 or ncs == 0: return dos.reshape(out_shape)
+
+    step = mesh[1] - mesh[0] if nw > 1 else 0.0
+    is_linear = nw > 1 and step > 0 and np.allclose(np.diff(mesh), step, rtol=1e-6, atol=0)
+
+    if not is_linear:
+        # Evaluate the broadened delta functions on the full mesh for blocks of centers.
+        func = gaussian if method == "gaussian" else lorentzian
+        chunk = max(1, 2 ** 22 // nw)
+        for cs in range(0, ncs, chunk):
+            ce = cs + chunk
+            vals = func(mesh[None, :], width, center=centers[cs:ce, None])
+            dos += np.matmul(wsets[:, cs:ce], vals)
+
+    elif method == "gaussian":
+        # Each gaussian contributes only to the 2 * nhalf + 1 points around the closest mesh point.
+        # Values are accumulated in a buffer padded with 2 * nhalf points on each side so that no mask is needed.
+        # Centers whose window does not intersect the mesh are discarded.
+        nhalf = int(np.ceil(ntw * width / step))
+        offsets = np.arange(-nhalf, nhalf + 1)
+        i0 = np.rint((centers - mesh[0]) / step).astype(np.int)
+        inside = np.nonzero((i0 >= -nhalf) & (i0 < nw + nhalf))[0]
+        centers, i0, wsets = centers[inside], i0[inside], wsets[:, inside]
+        buf = np.zeros((nsets, nw + 4 * nhalf))
+        norm = 1.0 / (width * np.sqrt(2 * np.pi))
+        chunk = max(1, 2 ** 20 // len(offsets))
+        for cs in range(0, len(centers), chunk):
+            ce = cs + chunk
+            inds = i0[cs:ce, None] + offsets
+            vals = norm * np.exp(-0.5 * ((mesh[0] + inds * step - centers[cs:ce, None]) / width) ** 2)
+            inds = (inds + 2 * nhalf).ravel()
+            for iset, wset in enumerate(wsets):
+                buf[iset] += np.bincount(inds, weights=(vals * wset[cs:ce, None]).ravel(), minlength=buf.shape[1])
+        dos = buf[:, 2 * nhalf:2 * nhalf + nw]
+
+    else:
+        # Linear histogram of the centers on the (extended) mesh followed by FFT convolution with the kernel.
+        # Lorentzians have long tails, hence peaks outside the mesh contribute as well.
+        # The binning error is of order (step / width)**2.
+        tpos = (centers - mesh[0]) / step
+        ilo = min(0, int(np.floor(tpos.min())))
+        nx = max(nw, int(np.floor(tpos.max())) + 2) - ilo
+        ifl = np.floor(tpos).astype(np.int)
+        frac = tpos - ifl
+        ifl -= ilo
+        hist = np.zeros((nsets, nx))
+        for iset, wset in enumerate(wsets):
+            hist[iset] = np.bincount(ifl, weights=wset * (1 - frac), minlength=nx)[:nx]
+            hist[iset] += np.bincount(ifl + 1, weights=wset * frac, minlength=nx + 1)[:nx]
+
+        kernel = lorentzian(np.arange(-(nx - 1), nx) * step, width)
+        nfft = 3 * nx - 2
+        conv = np.fft.irfft(np.fft.rfft(hist, nfft, axis=-1) * np.fft.rfft(kernel, nfft), nfft, axis=-1)
+        dos = conv[:, nx - 1 - ilo:nx - 1 - ilo + nw]
+
+    return dos.reshape(out_shape)
+
 #=====================================
 # === Data Interpolation/Smoothing ===
 #=====================================
@@ -337,38 +440,64 @@ def find_convindex(values, tol, min_numpts=1, mode="abs", vinf=None):
 class BlochRegularGridInterpolator(object):
     """
     This object interpolates the periodic part of a Bloch state in real space.
+    All the components of the [ndt, nx, ny, nz] array are interpolated in one pass
+    with trilinear or tricubic (Catmull-Rom) periodic interpolation.
     """
 
-    def __init__(self, structure, datar, add_replicas=True):
+    # Max number of points evaluated in a single chunk (bounds the memory of the temporary arrays).
+    chunksize = 2 ** 17
+
+    def __init__(self, structure, datar, add_replicas=True, method="linear"):
         """
         Args:
             structure: :class:`Structure` object.
             datar: [ndt, nx, ny, nz] array.
-            add_replicas: If True, data is padded with redundant data points.
-                in order to have a periodic 3D array of shape=[ndt, nx+1, ny+1, nz+1].
+            add_replicas: If True, datar is periodic i.e. the grid point nx is equivalent to 0
+                (the padded array of shape [ndt, nx+1, ny+1, nz+1] is not allocated).
+                If False, datar already contains the replicas and the last point is equivalent to 0.
+            method: "linear" for trilinear or "cubic" for tricubic interpolation.
         """
-        from scipy.interpolate import RegularGridInterpolator
         self.structure = structure
-
-        if add_replicas:
-            datar = add_periodic_replicas(datar)
+        if method not in ("linear", "cubic"):
+            raise ValueError("Invalid method: %s" % str(method))
+        self.method = method
 
         self.dtype = datar.dtype
         # We want a 4d array (ndt arrays of shape (nx, ny, nz)
         nx, ny, nz = datar.shape[-3:]
         datar = np.reshape(datar, (-1,) + (nx, ny, nz))
+        if not add_replicas:
+            # Remove the replicas so that the data is periodic.
+            datar = datar[:, :-1, :-1, :-1]
+        self.datar = datar
         self.ndt = len(datar)
-        x = np.linspace(0, 1, num=nx)
-        y = np.linspace(0, 1, num=ny)
-        z = np.linspace(0, 1, num=nz)
-
-        # Build `ndt` interpolators. Note that RegularGridInterpolator supports
-        # [nx, ny, nz, ...] arrays but then each call operates on the full set of
-        # ndt components and this complicates the declation of callbacks
-        # operating on a single component.
-        self._interpolators = [None] * self.ndt
-        for i in range(self.ndt):
-            self._interpolators[i] = RegularGridInterpolator((x, y, z), datar[i])
+        self.ngfft = np.array(datar.shape[-3:])
+
+    def _stencil(self, uc_coords):
+        """
+        Return (indices, weights) for the three directions.
+        indices and weights have shape [npoints, nstencil]
+        """
+        inds, weights = [], []
+        for i, n in enumerate(self.ngfft):
+            u = uc_coords[:, i] * n
+            i0 = np.floor(u).astype(np.int)
+            t = u - i0
+            if self.method == "linear":
+                offsets = np.arange(2)
+                w = np.stack([1 - t, t], axis=1)
+            else:
+                # Catmull-Rom cubic convolution kernel.
+                offsets = np.arange(-1, 3)
+                t2, t3 = t * t, t * t * t
+                w = np.stack([-0.5 * t3 + t2 - 0.5 * t,
+                              1.5 * t3 - 2.5 * t2 + 1,
+                              -1.5 * t3 + 2 * t2 + 0.5 * t,
+                              0.5 * t3 - 0.5 * t2], axis=1)
+            inds.append((i0[:, None] + offsets) % n)
+            weights.append(w)
+
+        return inds, weights
 
     def eval_line(self, point1, point2, num=200, cartesian=False, kpoint=None):
         """
@@ -413,13 +542,45 @@ class BlochRegularGridInterpolator(object):
             point2 = np.dot(red_from_cart, point2)
 
         p21 = point2 - point1
-        line_points = np.reshape([alpha * p21 for alpha in np.linspace(0, 1, num=num)], (-1, 3))
+        line_points = np.outer(np.linspace(0, 1, num=num), p21)
         dist = self.structure.lattice.norm(line_points)
         line_points += point1
 
         return dict2namedtuple(site1=site1, site2=site2, points=line_points, dist=dist,
                                values=self.eval_points(line_points, kpoint=kpoint))
 
+    def eval_plane(self, origin, vec1, vec2, num=(100, 100), cartesian=False, kpoint=None):
+        """
+        Interpolate values on the plane ``origin + s * vec1 + t * vec2`` with s, t in [0, 1].
+
+        Args:
+            origin: Origin of the plane. Accepts 3d vector or integer (index of the site).
+            vec1, vec2: Vectors spanning the plane (reduced coordinates unless `cartesian`).
+            num: Number of points along vec1 and vec2.
+            cartesian: True if origin and vectors are in cartesian coordinates.
+            kpoint: k-point in reduced coordinates. If not None, the phase-factor e^{ikr} is included.
+
+        Return: named tuple with
+            points: [num1, num2, 3] array with the points in fractional coords.
+            values: [ndt, num1, num2] array with interpolated values.
+        """
+        if duck.is_intlike(origin):
+            site = self.structure[origin]
+            origin = site.coords if cartesian else site.frac_coords
+
+        origin, vec1, vec2 = [np.reshape(v, (3,)) for v in (origin, vec1, vec2)]
+        if cartesian:
+            red_from_cart = self.structure.lattice.inv_matrix.T
+            origin, vec1, vec2 = [np.dot(red_from_cart, v) for v in (origin, vec1, vec2)]
+
+        if duck.is_intlike(num): num = (num, num)
+        num1, num2 = num
+        s, t = np.meshgrid(np.linspace(0, 1, num=num1), np.linspace(0, 1, num=num2), indexing="ij")
+        points = origin + s[..., None] * vec1 + t[..., None] * vec2
+
+        values = self.eval_points(points, kpoint=kpoint)
+        return dict2namedtuple(points=points, values=np.reshape(values, (self.ndt, num1, num2)))
+
     def eval_points(self, frac_coords, idt=None, cartesian=False, kpoint=None):
         """
         Interpolate values on an arbitrary list of points.
@@ -431,25 +592,33 @@ class BlochRegularGridInterpolator(object):
             kpoint: k-point in reduced coordinates. If not None, the phase-factor e^{ikr} is included.
 
         Return:
-            [ndt, npoints] array or [1, npoints] if idt is not None
+            [ndt, npoints] array or [npoints] if idt is not None
         """
         frac_coords = np.reshape(frac_coords, (-1, 3))
         if cartesian:
-            red_from_cart = self.structure.lattice.inv_matrix.T
-            frac_coords = [np.dot(red_from, v) for v in frac_coords]
-
-        uc_coords = np.reshape(frac_coords, (-1, 3)) % 1
-
-        if idt is None:
-            values = np.empty((self.ndt, len(uc_coords)), dtype=self.dtype)
-            for idt in range(self.ndt):
-                values[idt] = self._interpolators[idt](uc_coords)
-        else:
-            values = self._interpolators[idt](uc_coords)
+            frac_coords = np.dot(frac_coords, self.structure.lattice.inv_matrix)
+
+        uc_coords = frac_coords % 1
+        nx, ny, nz = self.ngfft
+        datar = self.datar if idt is None else self.datar[idt:idt+1]
+        datar = np.reshape(datar, (len(datar), -1))
+        values = np.zeros((len(datar), len(uc_coords)), dtype=self.dtype)
+
+        for start in range(0, len(uc_coords), self.chunksize):
+            stop = start + self.chunksize
+            (ix, iy, iz), (wx, wy, wz) = self._stencil(uc_coords[start:stop])
+            vals = values[:, start:stop]
+            # Accumulate the contributions of the stencil points for all the components at once.
+            for a in range(ix.shape[1]):
+                for b in range(iy.shape[1]):
+                    wab = wx[:, a] * wy[:, b]
+                    iab = (ix[:, a] * ny + iy[:, b]) * nz
+                    for c in range(iz.shape[1]):
+                        vals += (wab * wz[:, c]) * datar[:, iab + iz[:, c]]
 
         if kpoint is not None:
             if hasattr(kpoint, "frac_coords"): kpoint = kpoint.frac_coords
             kpoint = np.reshape(kpoint, (3,))
-            values *= np.exp(2j * np.pi * np.dot(frac_coords, kpoint))
+            values = values * np.exp(2j * np.pi * np.dot(frac_coords, kpoint))
 
-        return values
+        return values[0] if idt is not None else values
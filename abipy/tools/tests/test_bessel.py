@@ -23,3 +23,9 @@ class TestBessels(AbipyTest):
         def primitive(x):
             return -x * np.cos(x) + np.sin(x)
         self.assert_almost_equal(fq[-1], (1 / qmax**3) * (primitive(qmax*rcut) - primitive(0)))
+
+        # Splines are cached.
+        assert bessel.spline_int_jlqr(l, qmax, rcut, numq=1024, numr=1024) is spline
+        assert bessel.spline_int_jlqr(l, qmax, rcut, numq=1024, numr=1024, cache=False) is not spline
+        bessel.clear_spline_cache()
+        assert bessel.spline_int_jlqr(l, qmax, rcut, numq=1024, numr=1024) is not spline
@@ -0,0 +1,133 @@
+# coding: utf-8
+"""Tests for diskcache module."""
+from __future__ import division, print_function, absolute_import, unicode_literals
+
+import os
+import bz2
+import gzip
+import shutil
+import tempfile
+import numpy as np
+import abipy.data as abidata
+
+from abipy import abilab
+from abipy.core.testing import AbipyTest
+from abipy.tools.diskcache import NpzDiskCache, DecompressionCache
+
+
+class NpzDiskCacheTest(AbipyTest):
+
+    def test_npz_disk_cache(self):
+        """Testing NpzDiskCache."""
+        cache = NpzDiskCache(os.path.join(tempfile.mkdtemp(), "cache"))
+        arr = np.arange(12, dtype=np.float).reshape(3, 4)
+        key = cache.hash_data("foo", arr, 2, None)
+        assert key == cache.hash_data("foo", arr.copy(), 2, None)
+        assert key != cache.hash_data("foo", arr.T, 2, None)
+        assert key != cache.hash_data("foo", arr.astype(np.float32), 2, None)
+        assert key != cache.hash_data("bar", arr, 2, None)
+        with self.assertRaises(TypeError):
+            cache.hash_data(np.array([None, 1], dtype=object))
+
+        assert cache.load(key) is None
+        cache.save(key, values=arr, cvalues=arr + 1j, scalar=3.0)
+        data = cache.load(key)
+        self.assert_equal(data["values"], arr)
+        assert data["cvalues"].dtype == np.complex
+        assert float(data["scalar"]) == 3.0
+        stats = cache.get_stats()
+        assert stats["hits"] == 1 and stats["misses"] == 1 and stats["nfiles"] == 1
+        assert str(cache)
+
+        # Corrupted files are removed.
+        with open(cache.path_from_key("corrupted"), "wt") as fh:
+            fh.write("foo")
+        assert cache.load("corrupted") is None
+        assert not os.path.exists(cache.path_from_key("corrupted"))
+
+        # LRU eviction: the oldest entry is removed first.
+        nbytes = os.path.getsize(cache.path_from_key(key))
+        cache.max_nbytes = int(2.5 * nbytes)
+        for i in range(3):
+            k = cache.hash_data("entry", i)
+            cache.save(k, values=arr, cvalues=arr + 1j, scalar=3.0)
+            os.utime(cache.path_from_key(k), (i + 1e9, i + 1e9))
+            os.utime(cache.path_from_key(key), (10 + 1e9, 10 + 1e9))
+        assert cache.evict() == 0
+        assert cache.get_stats()["nfiles"] == 2
+        assert cache.load(key) is not None
+
+        cache.clear()
+        assert cache.get_stats()["nfiles"] == 0 and cache.hits == 0
+
+
+class DecompressionCacheTest(AbipyTest):
+
+    def test_decompression_cache(self):
+        """Testing DecompressionCache."""
+        workdir = tempfile.mkdtemp()
+        cache = DecompressionCache(os.path.join(workdir, "cache"))
+        assert cache.get_stats()["nfiles"] == 0
+        abo_path = abidata.ref_file("refs/si_ebands/run.abo")
+        with open(abo_path, "rb") as fh:
+            ref_data = fh.read()
+
+        gz_path = os.path.join(workdir, "run.abo.gz")
+        with open(abo_path, "rb") as fin, gzip.open(gz_path, "wb") as fout:
+            shutil.copyfileobj(fin, fout)
+        bz2_path = os.path.join(workdir, "run.abo.bz2")
+        with open(abo_path, "rb") as fin, bz2.BZ2File(bz2_path, "wb") as fout:
+            shutil.copyfileobj(fin, fout)
+
+        assert cache.is_compressed(gz_path) and cache.is_compressed(bz2_path)
+        assert not cache.is_compressed(abo_path)
+        with self.assertRaises(ValueError):
+            cache.decompress(abo_path)
+
+        path = cache.decompress(gz_path, chunksize=1024)
+        assert path.endswith("_run.abo") and os.path.dirname(path) == cache.cache_dir
+        with open(path, "rb") as fh:
+            assert fh.read() == ref_data
+        assert cache.decompress(gz_path) == path
+        assert cache.hits == 1 and cache.misses == 1
+
+        bz2_out = cache.decompress(bz2_path)
+        assert bz2_out != path
+        with open(bz2_out, "rb") as fh:
+            assert fh.read() == ref_data
+        stats = cache.get_stats()
+        assert stats["nfiles"] == 2 and stats["nbytes"] == 2 * len(ref_data)
+        assert str(cache)
+
+        # LRU eviction: the file that has just been decompressed is never removed.
+        os.utime(path, (1e9, 1e9))
+        cache.max_nbytes = len(ref_data)
+        assert cache.evict(keep=path) == 1
+        assert cache.get_stats()["nfiles"] == 1 and os.path.exists(path)
+
+        # Pinned entries are not removed.
+        cache.pin(path)
+        cache.max_nbytes = 0
+        assert cache.evict() == 0
+        cache.clear()
+        assert os.path.exists(path)
+        cache.unpin(path)
+        cache.clear()
+        assert cache.get_stats()["nfiles"] == 0 and cache.hits == 0
+
+        # abiopen uses the cache for compressed files. The decompressed files
+        # of the objects that are still open are not evicted.
+        old_cache = abilab._DECOMPRESSION_CACHE
+        try:
+            abo_cache = abilab.set_decompression_cache(cache_dir=os.path.join(workdir, "abiopen_cache"), max_nbytes=0)
+            assert abilab.isabifile(bz2_path)
+            with abilab.abiopen(gz_path) as abo:
+                assert abo.filepath == abo_cache.path_from_filepath(gz_path)
+                with abilab.abiopen(bz2_path) as other:
+                    assert other.run_completed
+                    assert abo_cache.get_stats()["nfiles"] == 2
+                    assert abo.header == other.header
+                assert abo.run_completed
+            assert abo_cache.evict() == 2
+        finally:
+            abilab._DECOMPRESSION_CACHE = old_cache
@@ -3,10 +3,11 @@
 from __future__ import division, print_function, absolute_import, unicode_literals
 
 import os
+import numpy as np
 import abipy.data as abidata
 
 from abipy.core.testing import AbipyTest
-from abipy.tools.fftprof import FFTBenchmark
+from abipy.tools.fftprof import FFTBenchmark, benchmark_mesh3d_fft
 
 
 class FftProfTest(AbipyTest):
@@ -32,3 +33,10 @@ class FftProfTest(AbipyTest):
         if self.has_matplotlib():
             #test0.plot_ax()
             assert bench.plot(show=False)
+
+    def test_benchmark_mesh3d_fft(self):
+        """Testing microbenchmark for Mesh3D FFT backends."""
+        df = benchmark_mesh3d_fft([(8, 8, 8), (12, 12, 12)], nthreads_list=(1, 2), nbatch=2, nrepeat=2)
+        assert "numpy" in df["backend"].values
+        assert np.all(df["wall_time"] >= 0)
+        assert np.allclose(df[df["backend"] == "numpy"]["speedup"], 1.0)
@@ -69,3 +69,85 @@ class TestNumTools(AbipyTest):
 
         assert lorentzian(x=0.0, width=1.0, center=0.0, height=1.0) == 1.0
         self.assert_almost_equal(lorentzian(x=0.0, width=1.0, center=0.0, height=None), 1/np.pi)
+
+    def test_broadened_dos(self):
+        """Testing broadened_dos."""
+        rng = np.random.RandomState(0)
+        mesh = np.linspace(-5, 5, num=501)
+        centers = rng.uniform(low=-6, high=6, size=(10, 4))
+        weights = rng.rand(3, 10, 4)
+        width = 0.2
+
+        for method, func in [("gaussian", gaussian), ("lorentzian", lorentzian)]:
+            # Reference values computed with loops.
+            ref = np.zeros((3, len(mesh)))
+            for iset in range(3):
+                for c, w in zip(centers.ravel(), weights[iset].ravel()):
+                    ref[iset] += w * func(mesh, width, center=c)
+
+            decimal = 6 if method == "gaussian" else 2
+            dos = broadened_dos(mesh, centers, width, weights=weights[0], method=method)
+            assert dos.shape == mesh.shape
+            self.assert_almost_equal(dos, ref[0], decimal=decimal)
+            dos = broadened_dos(mesh, centers, width, weights=weights, method=method)
+            assert dos.shape == (3, len(mesh))
+            self.assert_almost_equal(dos, ref, decimal=decimal)
+
+            # Non-linear mesh.
+            nl_mesh = np.sort(rng.uniform(low=-5, high=5, size=100))
+            self.assert_almost_equal(broadened_dos(nl_mesh, centers, width, method=method),
+                                     sum(func(nl_mesh, width, center=c) for c in centers.ravel()))
+
+        # Integral of the DOS gives the number of states inside the mesh.
+        dos = broadened_dos(mesh, [-1.0, 0.0, 1.0], width)
+        self.assert_almost_equal(np.trapz(dos, x=mesh), 3.0)
+
+        with self.assertRaises(ValueError):
+            broadened_dos(mesh, centers, width, method="tetra")
+        with self.assertRaises(ValueError):
+            broadened_dos(mesh, centers, width, weights=np.ones(3))
+
+    def test_bloch_interpolator(self):
+        """Testing BlochRegularGridInterpolator"""
+        from scipy.interpolate import RegularGridInterpolator
+        from abipy.core.structure import Structure
+        from abipy.tools.numtools import BlochRegularGridInterpolator
+        structure = Structure.cubic(2.5, ["Si"])
+        nx, ny, nz = 6, 5, 4
+        datar = np.random.rand(2, nx, ny, nz) + 1j * np.random.rand(2, nx, ny, nz)
+        points = np.random.rand(50, 3) * 3 - 1
+
+        # Compare trilinear interpolation with scipy on the array with periodic replicas.
+        interp = BlochRegularGridInterpolator(structure, datar)
+        padded = add_periodic_replicas(datar)
+        grid = tuple(np.linspace(0, 1, num=n) for n in padded.shape[-3:])
+        for idt in range(2):
+            ref = RegularGridInterpolator(grid, padded[idt])(points % 1)
+            self.assert_almost_equal(interp.eval_points(points)[idt], ref)
+            self.assert_almost_equal(interp.eval_points(points, idt=idt), ref)
+
+        same_interp = BlochRegularGridInterpolator(structure, padded, add_replicas=False)
+        self.assert_almost_equal(same_interp.eval_points(points), interp.eval_points(points))
+        cart_coords = structure.lattice.get_cartesian_coords(points)
+        self.assert_almost_equal(interp.eval_points(cart_coords, cartesian=True), interp.eval_points(points))
+
+        # Both methods are exact on the grid points.
+        cubic = BlochRegularGridInterpolator(structure, datar, method="cubic")
+        self.assert_almost_equal(cubic.eval_points([[1/nx, 2/ny, 3/nz]])[:, 0], datar[:, 1, 2, 3])
+        # Cubic interpolation is more accurate for smooth periodic functions.
+        xyz = np.meshgrid(*[np.arange(n) / n for n in (nx, ny, nz)], indexing="ij")
+        smooth = np.cos(2 * np.pi * xyz[0]) * np.sin(2 * np.pi * xyz[2])
+        exact = np.cos(2 * np.pi * points[:, 0]) * np.sin(2 * np.pi * points[:, 2])
+        err_lin = np.abs(BlochRegularGridInterpolator(structure, smooth).eval_points(points)[0] - exact).max()
+        err_cub = np.abs(BlochRegularGridInterpolator(structure, smooth, method="cubic").eval_points(points)[0] - exact).max()
+        assert err_cub < err_lin
+
+        r = interp.eval_line(0, [0.5, 0.5, 0.5], num=10, kpoint=[0.5, 0, 0])
+        assert r.values.shape == (2, 10) and r.site1 is not None
+        self.assert_almost_equal(r.dist[-1], structure.lattice.norm([0.5, 0.5, 0.5]))
+        plane = interp.eval_plane([0, 0, 0], [1, 0, 0], [0, 1, 0], num=(7, 3))
+        assert plane.points.shape == (7, 3, 3) and plane.values.shape == (2, 7, 3)
+        self.assert_almost_equal(plane.values[:, 1, 2], interp.eval_points(plane.points[1, 2])[:, 0])
+
+        with self.assertRaises(ValueError):
+            BlochRegularGridInterpolator(structure, datar, method="foo")
@@ -229,9 +229,26 @@ class AbiwanFile(AbinitNcFile, Has_Header, Has_Structure, Has_ElectronBands, Not
         u_matrix = self.reader.read_value("U_matrix", cmode="c")
 
         # complex U_matrix_opt[nsppol, mkpt, mwan, mband]
+        u_matrix_opt = None
         if np.any(self.have_disentangled_spin):
             u_matrix_opt = self.reader.read_value("U_matrix_opt", cmode="c")
 
+        # Try to read H(R) from the disk cache (if enabled).
+        cache = ElectronInterpolator.disk_cache
+        if cache is not None:
+            lwindow = self.lwindow if u_matrix_opt is not None else None
+            cache_key = cache.hash_data("HWanR", kfrac_coords, self.ebands.eigens, u_matrix, u_matrix_opt,
+                                        lwindow, self.bands_in, self.nwan_spin, self.irvec, self.ndegen)
+            data = cache.load(cache_key)
+            if data is not None:
+                for spin in range(self.nsppol):
+                    spin_rmn[spin] = data["rmn_spin%d" % spin]
+                    for ik in range(num_kpts):
+                        spin_vmatrix[spin, ik] = data["vmatrix_spin%d_k%d" % (spin, ik)]
+
+                print("HWanR read from disk cache in %.3f (s)" % (time.time() - start))
+                return HWanR(self.structure, self.nwan_spin, spin_vmatrix, spin_rmn, self.irvec, self.ndegen)
+
         for spin in range(self.nsppol):
             num_wan = self.nwan_spin[spin]
 
@@ -284,6 +301,13 @@ class AbiwanFile(AbinitNcFile, Has_Header, Has_Structure, Has_ElectronBands, Not
             # Save results
             spin_rmn[spin] = rmn
 
+        if cache is not None:
+            data = {"rmn_spin%d" % spin: spin_rmn[spin] for spin in range(self.nsppol)}
+            for spin in range(self.nsppol):
+                for ik in range(num_kpts):
+                    data["vmatrix_spin%d_k%d" % (spin, ik)] = spin_vmatrix[spin, ik]
+            cache.save(cache_key, **data)
+
         print("HWanR built in %.3f (s)" % (time.time() - start))
         return HWanR(self.structure, self.nwan_spin, spin_vmatrix, spin_rmn, self.irvec, self.ndegen)
 
@@ -325,15 +349,18 @@ class AbiwanFile(AbinitNcFile, Has_Header, Has_Structure, Has_ElectronBands, Not
         # Interpolate Hamiltonian for each kpoint and spin.
         start = time.time()
         write_warning = True
+        kfrac_coords = kpoints.frac_coords
+        kblock = self.hwan.get_kblock_size()
         for spin in range(self.nsppol):
             num_wan = self.nwan_spin[spin]
-            for ik, kpt in enumerate(kpoints):
-                oeigs = self.hwan.eval_sk(spin, kpt.frac_coords)
-                eigens[spin, ik, :num_wan] = oeigs
+            for ks in range(0, nk, kblock):
+                ke = min(ks + kblock, nk)
+                oeigs = self.hwan.eval_sk(spin, kfrac_coords[ks:ke])
+                eigens[spin, ks:ke, :num_wan] = oeigs
                 if num_wan < self.mwan:
                     # May have different number of wannier functions if nsppol == 2.
                     # Here I use the last value to fill eigens matrix (not very clean but oh well).
-                    eigens[spin, ik, num_wan:self.mwan] = oeigs[-1]
+                    eigens[spin, ks:ke, num_wan:self.mwan] = oeigs[:, -1:]
                     if write_warning:
                         cprint("Different number of wannier functions for spin. Filling last bands with oeigs[-1]",
                                "yellow")
@@ -423,19 +450,27 @@ class HWanR(ElectronInterpolator):
         self.nband = nwan_spin[0]
         #self.nelect
 
+    def get_kblock_size(self):
+        """
+        Return the number of k-points interpolated in a single call to `eval_sk` by `interp_kpts`.
+        Each k-point requires a [nwan, nwan] matrix for each R-point.
+        """
+        num_wan = max(self.nwan_spin)
+        return max(1, int(self.kblock_max_nbytes // (self.nrpts * num_wan ** 2 * 16)))
+
     def eval_sk(self, spin, kpt, der1=None, der2=None):
         """
-        Interpolate eigenvalues for all bands at a given (spin, k-point).
+        Interpolate eigenvalues for all bands at a given (spin, k-point) or for a block of k-points.
         Optionally compute gradients and Hessian matrices.
 
         Args:
             spin: Spin index.
-            kpt: K-point in reduced coordinates.
+            kpt: K-point in reduced coordinates or [nk, 3] array with a block of k-points.
             der1: If not None, ouput gradient is stored in der1[nband, 3].
             der2: If not None, output Hessian is der2[nband, 3, 3].
 
         Return:
-            oeigs[nband]
+            oeigs[nband] or oeigs[nk, nband] for a block of k-points.
         """
         if der1 is not None or der2 is not None:
             raise NotImplementedError("Derivatives")
@@ -451,13 +486,15 @@ class HWanR(ElectronInterpolator):
         oeigs, _ = np.linalg.eigh(hk_ij)
         """
 
-        # This is a bit faster.
-        jrk = j2pi * np.dot(self.irvec, kpt)
+        # This is a bit faster and treats all the k-points in the block at once.
+        kpts = np.reshape(kpt, (-1, 3))
+        jrk = j2pi * np.matmul(kpts, self.irvec.T)
         phases = np.exp(jrk) / self.ndegen
-        hk_ij = (self.spin_rmn[spin] * phases[:, None, None]).sum(axis=0)
-        oeigs, _ = np.linalg.eigh(hk_ij)
+        # [nk, nr] x [nr, nwan, nwan] --> [nk, nwan, nwan]
+        hk_ij = np.tensordot(phases, self.spin_rmn[spin], axes=(1, 0))
+        oeigs = np.linalg.eigvalsh(hk_ij)
 
-        return oeigs
+        return oeigs if np.ndim(kpt) == 2 else oeigs[0]
 
     # TODO
     #def interpolate_omat(self, omat, kpoints):
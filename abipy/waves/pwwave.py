@@ -18,6 +18,7 @@ from abipy.tools.plotting import add_fig_kwargs, get_ax_fig_plt, get_axarray_fig
 
 __all__ = [
     "PWWaveFunction",
+    "PWWaveFunctionBlock",
 ]
 
 def latex_label_ispinor(ispinor, nspinor):
@@ -261,10 +262,8 @@ class PWWaveFunction(WaveFunction):
         """
         space = space.lower()
 
-        if space == "g":
-            return np.real(np.vdot(self.ug, self.ug))
-        elif space == "gsphere":
-            return np.real(np.vdot(self.ug, self.ug))
+        if space in ("g", "gsphere"):
+            return np.real(self.gsphere.vdot(self.ug, self.ug))
         elif space == "r":
             return np.vdot(self.ur, self.ur) / self.mesh.size
         else:
@@ -290,7 +289,7 @@ class PWWaveFunction(WaveFunction):
             ug2_mesh = other.gsphere.tofftmesh(self.mesh, other.ug) if other is not self else ug1_mesh
             return np.vdot(ug1_mesh, ug2_mesh)
         elif space == "gsphere":
-            return np.vdot(self.ug, other.ug)
+            return self.gsphere.vdot(self.ug, other.ug)
         elif space == "r":
             return np.vdot(self.ur, other.ur) / self.mesh.size
         else:
@@ -579,6 +578,178 @@ class PWWaveFunction(WaveFunction):
     #    return figure
 
 
+class PWWaveFunctionBlock(object):
+    """
+    Block of wavefunctions with the same spin and k-point expressed in a plane-wave basis set.
+    The coefficients are stored in a single array so that the FFT is performed for all bands at once.
+
+    .. rubric:: Inheritance Diagram
+    .. inheritance-diagram:: PWWaveFunctionBlock
+    """
+    def __init__(self, structure, nspinor, spin, bands, gsphere, ug, mesh=None):
+        """
+        Args:
+            structure: |Structure| object.
+            nspinor: number of spinorial components.
+            spin: spin index (only used if collinear-magnetism).
+            bands: List of band indices (>=0)
+            gsphere |GSphere| instance.
+            ug: 3D array containing u[nband, nspinor, G] for G in gsphere. Not copied.
+            mesh: |Mesh3D| object used for the FFT.
+        """
+        self.structure = structure
+        self.nspinor, self.spin = nspinor, spin
+        self.bands = np.array(bands, dtype=np.int)
+        # Sanity check.
+        assert ug.ndim == 3
+        assert ug.shape == (len(self.bands), nspinor, gsphere.npw)
+
+        self._gsphere = gsphere
+        self._ug = ug
+        self._mesh = mesh
+
+    def __len__(self):
+        return len(self.bands)
+
+    def __iter__(self):
+        """Yields |PWWaveFunction| objects."""
+        for i in range(len(self)):
+            yield self[i]
+
+    def __getitem__(self, i):
+        """Return the |PWWaveFunction| for the i-th band of the block."""
+        wave = PWWaveFunction(self.structure, self.nspinor, self.spin, self.bands[i], self.gsphere, self.ug[i])
+        if self.mesh is not None: wave.set_mesh(self.mesh)
+        return wave
+
+    def __repr__(self):
+        return str(self)
+
+    def __str__(self):
+        return self.to_string()
+
+    def to_string(self, verbose=0):
+        """String representation."""
+        lines = []; app = lines.append
+        app("%s: nspinor: %d, spin: %d, bands: [%d, %d]" % (
+            self.__class__.__name__, self.nspinor, self.spin, self.bands[0], self.bands[-1]))
+        app(self.gsphere.to_string(verbose=verbose))
+        if self.mesh is not None:
+            app(self.mesh.to_string(verbose=verbose))
+
+        return "\n".join(lines)
+
+    @property
+    def shape(self):
+        """Shape of ug i.e. (nband, nspinor, npw)"""
+        return self._ug.shape
+
+    @property
+    def gsphere(self):
+        """:class:`GSphere` object"""
+        return self._gsphere
+
+    @property
+    def kpoint(self):
+        """|Kpoint| object"""
+        return self.gsphere.kpoint
+
+    @property
+    def npw(self):
+        """Number of G-vectors."""
+        return len(self.gsphere)
+
+    @property
+    def ug(self):
+        """Periodic part of the wavefunctions in G-space. Array [nband, nspinor, npw]"""
+        return self._ug
+
+    @classmethod
+    def from_waves(cls, waves):
+        """
+        Build a block from a list of |PWWaveFunction| objects with the same spin and G-sphere.
+        """
+        w0 = waves[0]
+        if any(w.spin != w0.spin or w.gsphere != w0.gsphere for w in waves[1:]):
+            raise ValueError("Wavefunctions must have the same spin and G-sphere")
+
+        ug = np.array([w.ug for w in waves])
+        return cls(w0.structure, w0.nspinor, w0.spin, [w.band for w in waves], w0.gsphere, ug,
+                   mesh=getattr(w0, "_mesh", None))
+
+    def gram(self):
+        r"""
+        Gram matrix :math:`\langle u_n|u_m\rangle` for the bands in the block computed on the G-sphere.
+        Return: [nband, nband] array.
+        """
+        return self.gsphere.gemm_vdot(self.ug, self.ug)
+
+    def overlaps(self, other, gshift=None):
+        r"""
+        Matrix of overlaps :math:`\langle u_n|u'_m\rangle` between the bands in self and in other
+        computed with a single matrix-matrix product. If the two blocks have different G-spheres
+        (e.g. :math:`u_{nk}` and :math:`u_{mk+q}`), the sum runs over the G-vectors of both spheres.
+
+        Args:
+            other: |PWWaveFunctionBlock| object.
+            gshift: Optional integer vector. If given, G in self is matched with G + gshift in other.
+                See :meth:`GSphere.get_common_indices`.
+
+        Return: [nband, other.nband] array.
+        """
+        if gshift is None and other.gsphere == self.gsphere:
+            return self.gsphere.gemm_vdot(self.ug, other.ug)
+
+        if self.gsphere.istwfk != 1 or other.gsphere.istwfk != 1:
+            raise NotImplementedError("Overlaps between different G-spheres require istwfk == 1")
+
+        inds, other_inds = self.gsphere.get_common_indices(other.gsphere, gshift=gshift)
+        ug1 = np.reshape(self.ug[..., inds], (len(self), -1))
+        ug2 = np.reshape(other.ug[..., other_inds], (len(other), -1))
+        return np.dot(ug1.conj(), ug2.T)
+
+    def copy(self):
+        """Return a new block that does not share the memory of the coefficients."""
+        return self.__class__(self.structure, self.nspinor, self.spin, self.bands,
+                              self.gsphere, self.ug.copy(), mesh=self.mesh)
+
+    @property
+    def mesh(self):
+        """The mesh used for the FFT."""
+        return self._mesh
+
+    def set_mesh(self, mesh):
+        """Change the FFT mesh. `u(r)` will be computed on this box."""
+        assert isinstance(mesh, Mesh3D)
+        self._mesh = mesh
+
+    def get_ug_mesh(self, mesh=None):
+        """
+        Returns u(G) on the FFT mesh. Array [nband, nspinor, nx, ny, nz]
+
+        Args:
+            mesh: |Mesh3d| object. If mesh is None, the internal mesh is used.
+        """
+        mesh = self.mesh if mesh is None else mesh
+        return self.gsphere.tofftmesh(mesh, self.ug)
+
+    def fft_ug(self, mesh=None):
+        """
+        Performs the FFT transform of :math:`u(g)` for all the bands in the block.
+
+        Args:
+            mesh: |Mesh3d| object. If mesh is None, self.mesh is used.
+
+        Returns:
+            :math:`u(r)` on the real space FFT box. Array [nband, nspinor, nx, ny, nz]
+        """
+        mesh = self.mesh if mesh is None else mesh
+        ug_mesh = self.get_ug_mesh(mesh=mesh)
+        # Single FFT call on a 4D array with (band, spinor) merged in the first dimension.
+        ur = mesh.fft_g2r(mesh.reshape(ug_mesh), fg_ishifted=False)
+        return ur.reshape(self.shape[:2] + tuple(mesh.shape))
+
+
 class PAW_WaveFunction(WaveFunction):
     """
     All the methods that are related to the all-electron representation should start with ae.
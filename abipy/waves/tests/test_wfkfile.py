@@ -5,7 +5,7 @@ import numpy as np
 import abipy.data as abidata
 
 from abipy.core.testing import AbipyTest
-from abipy.waves import WfkFile
+from abipy.waves import WfkFile, PWWaveFunctionBlock
 
 
 class TestWFKFile(AbipyTest):
@@ -86,6 +86,75 @@ class TestWFKFile(AbipyTest):
 
         wave.export_ur2(".xsf")
 
+        # Batched reader.
+        nband = wfk.nband_sk[spin, 0]
+        block = wfk.get_wave_block(spin, kpoint)
+        repr(block); str(block)
+        assert len(block) == nband and block.shape == (nband, wfk.nspinor, wave.npw)
+        assert block[0] == wfk.get_wave(spin, kpoint, 0)
+        self.assert_equal(block.ug[1], other_wave.ug)
+        self.assert_equal(wfk.reader.read_ug_block(spin, kpoint, band_slice=slice(1, 3)), block.ug[1:3])
+        with self.assertRaises(ValueError):
+            wfk.reader.read_ug_block(spin, kpoint, band_slice=slice(0, 4, 2))
+
+        ur_block = block.fft_ug()
+        assert ur_block.shape == (nband, wfk.nspinor) + wave.mesh.shape
+        self.assert_almost_equal(ur_block[0, 0], wave.ur)
+
+        blocks = list(wfk.iter_waves(spin=spin, band_slice=(0, 3), block_size=2, copy=True))
+        assert len(blocks) == 2 * wfk.nkpt
+        assert list(blocks[0].bands) == [0, 1] and list(blocks[1].bands) == [2]
+        self.assert_equal(blocks[0].ug, block.ug[:2])
+        for blk in wfk.iter_waves(kpoints=[0], block_size=3):
+            self.assert_equal(blk.ug, block.ug[blk.bands])
+
+        # Batched overlaps.
+        gram = block.gram()
+        self.assert_almost_equal(gram, np.eye(nband))
+        self.assert_almost_equal(gram[0, 1], wave.braket(other_wave, space="gsphere"))
+        same_block = PWWaveFunctionBlock.from_waves([wave, other_wave])
+        assert list(same_block.bands) == [0, 1]
+        self.assert_almost_equal(same_block.overlaps(block), gram[:2])
+        block1 = wfk.get_wave_block(spin, 1)
+        ovlp = block.overlaps(block1)
+        assert ovlp.shape == (nband, len(block1))
+        inds, inds1 = block.gsphere.get_common_indices(block1.gsphere)
+        self.assert_equal(block.gsphere.gvecs[inds], block1.gsphere.gvecs[inds1])
+        self.assert_almost_equal(ovlp[0, 1], np.vdot(block.ug[0, :, inds], block1.ug[1, :, inds1]))
+
+        report = wfk.get_orthonormality_report()
+        assert len(report) == wfk.nkpt * wfk.nsppol
+        assert report["ok"].all()
+
+        # Out-of-core streaming with memory budget and prefetching.
+        nbytes_band = 16 * wfk.nspinor * max(wfk.npwarr)
+        for prefetch in (True, False):
+            results = list(wfk.stream(kpoints=[0, 1], max_nbytes=4 * nbytes_band, prefetch=prefetch,
+                                      reduce=lambda b: b.ug.copy()))
+            assert all(len(r.bands) <= (2 if prefetch else 4) for r in results)
+            assert [r.kpoint for r in results][0] == 0 and results[-1].kpoint == 1
+            self.assert_equal(np.concatenate([r.data for r in results if r.kpoint == 0]), block.ug)
+
+        # Band blocks of the same k-point share the G-sphere.
+        results = list(wfk.stream(kpoints=[0], max_nbytes=4 * nbytes_band, reduce=lambda b: b.gsphere))
+        assert len(results) > 1 and all(r.data is results[0].data for r in results)
+
+        # The background thread is joined if the loop is interrupted.
+        import threading
+        nthreads = threading.active_count()
+        stream = wfk.stream(max_nbytes=4 * nbytes_band, prefetch=True)
+        next(stream)
+        stream.close()
+        assert threading.active_count() == nthreads
+
+        stream = wfk.stream(reduce="ur2", kpoints=[0])
+        res = next(stream)
+        stream.close()
+        self.assert_almost_equal(res.data[0], wave.ur2)
+        with self.assertRaises(ValueError):
+            list(wfk.stream(max_nbytes=10))
+        assert len(wfk.gspheres) == wfk.nkpt
+
         if self.has_matplotlib():
             assert wave.plot_line(0, 1, num=100, show=False)
             assert wave.plot_line([0, 0, 0], [2, 2, 2], num=100, with_krphase=True, show=False)
@@ -5,13 +5,16 @@ from __future__ import print_function, division, unicode_literals, absolute_impo
 import six
 import numpy as np
 
+from collections import OrderedDict
+
 from monty.functools import lazy_property
+from monty.collections import dict2namedtuple
 from monty.string import marquee # is_string, list_strings,
 from abipy.core import Mesh3D, GSphere, Structure
 from abipy.core.mixins import AbinitNcFile, Has_Header, Has_Structure, Has_ElectronBands, NotebookWriter
-from abipy.iotools import ETSF_Reader, Visualizer
+from abipy.iotools import ETSF_Reader, Visualizer, netcdf_lock
 from abipy.electrons.ebands import ElectronsReader
-from abipy.waves.pwwave import PWWaveFunction
+from abipy.waves.pwwave import PWWaveFunction, PWWaveFunctionBlock
 from abipy.tools import duck
 
 __all__ = [
@@ -62,14 +65,8 @@ class WfkFile(AbinitNcFile, Has_Header, Has_Structure, Has_ElectronBands, Notebo
         # FFT mesh (augmented divisions reported in the WFK file)
         self.fft_mesh = Mesh3D(reader.fft_divs, self.structure.lattice_vectors())
 
-        # Build G-spheres for each k-point
-        gspheres = len(self.kpoints) * [None]
-        ecut = reader.ecut
-        for k, kpoint in enumerate(self.kpoints):
-            gvec_k, istwfk = reader.read_gvecs_istwfk(k)
-            gspheres[k] = GSphere(ecut, self.structure.reciprocal_lattice, kpoint, gvec_k, istwfk=istwfk)
-
-        self._gspheres = tuple(gspheres)
+        # G-spheres are built on demand (the G-vectors of all the k-points may not fit in memory).
+        self._gspheres = len(self.kpoints) * [None]
 
         # Save reference to the reader.
         self.reader = reader
@@ -101,7 +98,22 @@ class WfkFile(AbinitNcFile, Has_Header, Has_Structure, Has_ElectronBands, Notebo
     @property
     def gspheres(self):
         """List of :class:`GSphere` objects ordered by k-points."""
-        return self._gspheres
+        return tuple(self.get_gsphere(ik) for ik in range(self.nkpt))
+
+    def get_gsphere(self, kpoint, cache=True):
+        """
+        Return the :class:`GSphere` for the given k-point. Accepts :class:`Kpoint` object or integer.
+        The G-vectors are read from file the first time, cache=False to avoid storing the object.
+        """
+        ik = self.kindex(kpoint)
+        if self._gspheres[ik] is not None:
+            return self._gspheres[ik]
+
+        gvec_k, istwfk = self.reader.read_gvecs_istwfk(ik)
+        gsphere = GSphere(self.reader.ecut, self.structure.reciprocal_lattice, self.kpoints[ik], gvec_k, istwfk=istwfk)
+        if cache: self._gspheres[ik] = gsphere
+
+        return gsphere
 
     def __str__(self):
         return self.to_string()
@@ -153,11 +165,188 @@ class WfkFile(AbinitNcFile, Has_Header, Has_Structure, Has_ElectronBands, Notebo
 
         # Istantiate the wavefunction object and set the FFT mesh
         # using the divisions reported in the WFK file.
-        wave = PWWaveFunction(self.structure, self.nspinor, spin, band, self.gspheres[ik], ug_skb)
+        wave = PWWaveFunction(self.structure, self.nspinor, spin, band, self.get_gsphere(ik), ug_skb)
         wave.set_mesh(self.fft_mesh)
 
         return wave
 
+    def get_wave_block(self, spin, kpoint, band_slice=None):
+        """
+        Read a block of contiguous bands with the given spin and kpoint.
+
+        Args:
+            spin: spin index. Must be in (0, 1)
+            kpoint: Either :class:`Kpoint` instance or integer giving the sequential index in the IBZ (C-convention).
+            band_slice: slice object or (start, stop) tuple. None to read all bands.
+
+        Return: |PWWaveFunctionBlock| object.
+        """
+        ik = self.kindex(kpoint)
+        if spin not in range(self.nsppol) or ik not in range(self.nkpt):
+            raise ValueError("Wrong (spin, kpt) indices")
+
+        start, stop = self.reader.get_band_range(ik, band_slice)
+        ug = self.reader.read_ug_block(spin, ik, band_slice=(start, stop))
+        return PWWaveFunctionBlock(self.structure, self.nspinor, spin, range(start, stop), self.get_gsphere(ik), ug,
+                                   mesh=self.fft_mesh)
+
+    def iter_waves(self, spin=None, kpoints=None, band_slice=None, block_size=None, copy=False):
+        """
+        Generator yielding |PWWaveFunctionBlock| objects with contiguous bands.
+        Each block is read from file with a single hyperslab operation and all the blocks
+        share the same output buffer.
+
+        Args:
+            spin: spin index. None to loop over all spins.
+            kpoints: List of :class:`Kpoint` objects or integers. None to loop over all k-points.
+            band_slice: slice object or (start, stop) tuple. None for all bands.
+            block_size: Max number of bands in each block. None to read all the bands of the slice at once.
+            copy: By default, the coefficients are overwritten at the next iteration.
+                Use True to get blocks with their own memory.
+
+        Example:
+
+            for block in wfk.iter_waves(block_size=8):
+                ur = block.fft_ug()
+        """
+        spins = range(self.nsppol) if spin is None else [spin]
+        iks = range(self.nkpt) if kpoints is None else [self.kindex(k) for k in kpoints]
+
+        # Compute the list of blocks and the size of the buffer.
+        tasks, bufsize = [], 0
+        for spin in spins:
+            for ik in iks:
+                start, stop = self.reader.get_band_range(ik, band_slice, spin=spin)
+                step = stop - start if block_size is None else block_size
+                for b0 in range(start, stop, max(step, 1)):
+                    b1 = min(b0 + step, stop)
+                    tasks.append((spin, ik, b0, b1))
+                    bufsize = max(bufsize, (b1 - b0) * self.nspinor * self.npwarr[ik])
+
+        buf = np.empty(bufsize, dtype=np.complex)
+        for spin, ik, b0, b1 in tasks:
+            ug = self.reader.read_ug_block(spin, ik, band_slice=(b0, b1), out=buf)
+            if copy: ug = ug.copy()
+            yield PWWaveFunctionBlock(self.structure, self.nspinor, spin, range(b0, b1), self.get_gsphere(ik), ug,
+                                      mesh=self.fft_mesh)
+
+    def stream(self, reduce=None, spin=None, kpoints=None, band_slice=None, max_nbytes=1024**3, prefetch=True):
+        """
+        Out-of-core iteration over the wavefunctions stored in the file.
+        The (spin, k-point) pairs are split in blocks of contiguous bands so that the memory
+        allocated for the wavefunctions does not exceed ``max_nbytes``. If ``prefetch``,
+        the next block is read in a background thread while the current one is processed.
+        The reads are protected by ``abipy.iotools.netcdf_lock`` since netCDF is not thread-safe.
+        For the same reason, ``reduce`` must not access the file as it runs while the next block is read.
+
+        Args:
+            reduce: Function called with the |PWWaveFunctionBlock|. Its return value is yielded in ``data``.
+                "ur2" computes the band-resolved densities :math:`|u_{nk}(r)|^2` (array [nband, nx, ny, nz]).
+                None to yield the block itself.
+            spin: spin index. None to loop over all spins.
+            kpoints: List of :class:`Kpoint` objects or integers. None to loop over all k-points.
+            band_slice: slice object or (start, stop) tuple. None for all bands.
+            max_nbytes: Memory budget in bytes for the wavefunction coefficients including the prefetched block.
+                For ``reduce="ur2"``, the arrays on the FFT box are also taken into account.
+            prefetch: False to read the data in the main thread.
+
+        Yields: namedtuple with (spin, kpoint, bands, data) where kpoint is the index of the k-point.
+            The block is overwritten at the next iteration and must be copied if needed.
+
+        Example:
+
+            # Overlaps <u_nk|u_mk> on the G-sphere.
+            for res in wfk.stream(reduce=lambda b: np.einsum("nsg,msg->nm", b.ug.conj(), b.ug)):
+                print(res.spin, res.kpoint, res.data)
+        """
+        reduce_on_mesh = False
+        if duck.is_string(reduce):
+            if reduce != "ur2":
+                raise ValueError("Invalid value for reduce: %s" % str(reduce))
+            reduce_on_mesh = True
+            def reduce(block):
+                ur = block.fft_ug()
+                return (ur.conj() * ur).real.sum(axis=1)
+
+        nbuf = 2 if prefetch else 1
+        spins = range(self.nsppol) if spin is None else [spin]
+        iks = range(self.nkpt) if kpoints is None else [self.kindex(k) for k in kpoints]
+
+        # Split the bands so that nbuf blocks fit in max_nbytes.
+        tasks, bufsize = [], 0
+        for spin in spins:
+            for ik in iks:
+                start, stop = self.reader.get_band_range(ik, band_slice, spin=spin)
+                nbytes_band = 16 * self.nspinor * self.npwarr[ik]
+                if reduce_on_mesh: nbytes_band += 2 * 16 * self.nspinor * self.fft_mesh.size
+                step = int(max_nbytes // (nbuf * nbytes_band))
+                if step == 0:
+                    raise ValueError("max_nbytes %s is too small. Need at least %s bytes" % (
+                        max_nbytes, nbuf * nbytes_band))
+                for b0 in range(start, stop, step):
+                    b1 = min(b0 + step, stop)
+                    tasks.append((spin, ik, b0, b1))
+                    bufsize = max(bufsize, (b1 - b0) * self.nspinor * self.npwarr[ik])
+
+        # G-sphere of the last k-point. Shared by the band blocks of the same k-point.
+        last_gsphere = {}
+
+        def read(task, buf):
+            spin, ik, b0, b1 = task
+            with netcdf_lock:
+                ug = self.reader.read_ug_block(spin, ik, band_slice=(b0, b1), out=buf)
+                gsphere = last_gsphere.get(ik)
+                if gsphere is None:
+                    last_gsphere.clear()
+                    gsphere = last_gsphere[ik] = self.get_gsphere(ik, cache=False)
+            return PWWaveFunctionBlock(self.structure, self.nspinor, spin, range(b0, b1),
+                                       gsphere, ug, mesh=self.fft_mesh)
+
+        buffers = [np.empty(bufsize, dtype=np.complex) for i in range(nbuf)]
+        blocks = _prefetch_iter(tasks, read, buffers) if prefetch else (read(t, buffers[0]) for t in tasks)
+
+        try:
+            for (spin, ik, b0, b1), block in zip(tasks, blocks):
+                data = block if reduce is None else reduce(block)
+                yield dict2namedtuple(spin=spin, kpoint=ik, bands=block.bands, data=data)
+        finally:
+            # Stop and join the background thread if the caller exits the loop before the end.
+            blocks.close()
+
+    def get_orthonormality_report(self, spin=None, kpoints=None, band_slice=None, atol=1e-6):
+        """
+        Check the orthonormality of the wavefunctions stored in the file.
+        The Gram matrix of each (spin, k-point) is computed with a single matrix-matrix product.
+
+        Args:
+            spin: spin index. None to loop over all spins.
+            kpoints: List of :class:`Kpoint` objects or integers. None to loop over all k-points.
+            band_slice: slice object or (start, stop) tuple. None for all bands.
+            atol: Absolute tolerance used to set the ``ok`` column.
+
+        Return: |pandas-DataFrame| with the max deviation of the norms from one
+            and the max absolute value of the off-diagonal elements (band pair in ``worst_bands``).
+        """
+        rows = []
+        for block in self.iter_waves(spin=spin, kpoints=kpoints, band_slice=band_slice):
+            gram = block.gram()
+            nb = len(block)
+            norm_err = np.abs(gram.diagonal() - 1)
+            offdiag = np.abs(gram - np.diag(gram.diagonal()))
+            i, j = np.unravel_index(np.argmax(offdiag), offdiag.shape)
+            rows.append(OrderedDict([
+                ("spin", block.spin),
+                ("kpoint", self.kindex(block.kpoint)),
+                ("nband", nb),
+                ("max_norm_err", norm_err.max()),
+                ("max_overlap", offdiag[i, j]),
+                ("worst_bands", (block.bands[i], block.bands[j])),
+                ("ok", norm_err.max() <= atol and offdiag[i, j] <= atol),
+            ]))
+
+        import pandas as pd
+        return pd.DataFrame(rows, columns=list(rows[0].keys()) if rows else None)
+
     def export_ur2(self, filepath, spin, kpoint, band, visu=None):
         """
         Export :math:`|u(r)|^2` on file filename.
@@ -322,8 +511,10 @@ class WFK_Reader(ElectronsReader):
         self.nfft2 = self.read_dimvalue("number_of_grid_points_vector2")
         self.nfft3 = self.read_dimvalue("number_of_grid_points_vector3")
 
+        # 1 if the coefficients are real (imaginary part is zero), 2 if complex.
         self.cplex_ug = self.read_dimvalue("real_or_complex_coefficients")
-        assert self.cplex_ug == 2
+        if self.cplex_ug not in (1, 2):
+            raise ValueError("Invalid value for real_or_complex_coefficients: %s" % self.cplex_ug)
 
         self.nspinor = self.read_dimvalue("number_of_spinor_components")
         self.nsppol = self.read_dimvalue("number_of_spins")
@@ -334,9 +525,6 @@ class WFK_Reader(ElectronsReader):
         self.istwfk = self.read_value("istwfk")
         self.npwarr = self.read_value("number_of_coefficients")
 
-        # Store G-vectors
-        self._kg = self.read_value("reduced_coordinates_of_plane_waves")
-
     @lazy_property
     def basis_set(self):
         """String defining the basis set."""
@@ -374,16 +562,120 @@ class WFK_Reader(ElectronsReader):
         """
         ik = self.kindex(kpoint)
         npw_k, istwfk = self.npwarr[ik], self.istwfk[ik]
-        return self._kg[ik, :npw_k, :], istwfk
+        # Read only the G-vectors of this k-point.
+        var = self.rootgrp.variables["reduced_coordinates_of_plane_waves"]
+        return var[ik, :npw_k, :], istwfk
 
     def read_ug(self, spin, kpoint, band):
         """Read the Fourier components of the wavefunction."""
         ik = self.kindex(kpoint)
         npw_k, istwfk = self.npwarr[ik], self.istwfk[ik]
-        if self.cplex_ug != 2:
-            raise NotImplementedError("")
 
         # Read data from file (we don't store the full block full block in memory!).
         var = self.rootgrp.variables["coefficients_of_wavefunctions"]
         value = var[spin, ik, band, :, :npw_k, :]
+        if self.cplex_ug == 1:
+            return value[..., 0] + 0j
         return value[..., 0] + 1j*value[..., 1]  # Build complex array
+
+    def get_band_range(self, kpoint, band_slice, spin=None):
+        """
+        Convert band_slice into (start, stop) for the given k-point.
+
+        Args:
+            kpoint: :class:`Kpoint` object or integer.
+            band_slice: slice object with unit step or (start, stop) tuple. None for all bands.
+            spin: spin index used to get the number of bands. None to use the max over spins.
+        """
+        ik = self.kindex(kpoint)
+        nband_k = self.nband_sk[:, ik].max() if spin is None else self.nband_sk[spin, ik]
+        if band_slice is None:
+            return 0, int(nband_k)
+        if not isinstance(band_slice, slice):
+            band_slice = slice(*band_slice)
+
+        start, stop, step = band_slice.indices(nband_k)
+        if step != 1:
+            raise ValueError("Only contiguous band blocks are supported while step is %s" % step)
+
+        return start, max(start, stop)
+
+    def read_ug_block(self, spin, kpoint, band_slice=None, out=None):
+        """
+        Read the Fourier components of a block of contiguous bands with a single hyperslab operation.
+
+        Args:
+            spin: spin index.
+            kpoint: :class:`Kpoint` object or integer.
+            band_slice: slice object or (start, stop) tuple. None to read all bands.
+            out: Optional complex buffer used to store the results. Must be C-contiguous
+                with at least nband * nspinor * npw_k elements. Can be reused for different k-points.
+
+        Return: complex array of shape [nband, nspinor, npw_k] (a view of out if out is given).
+        """
+        ik = self.kindex(kpoint)
+        npw_k = self.npwarr[ik]
+
+        start, stop = self.get_band_range(ik, band_slice, spin=spin)
+        shape = (stop - start, self.nspinor, npw_k)
+        if out is None:
+            out = np.empty(shape, dtype=np.complex)
+        else:
+            size = np.prod(shape)
+            if out.dtype != np.complex or out.size < size or not out.flags.c_contiguous:
+                raise ValueError("Buffer must be a C-contiguous complex array with at least %d elements" % size)
+            out = out.reshape(-1)[:size].reshape(shape)
+
+        var = self.rootgrp.variables["coefficients_of_wavefunctions"]
+        value = var[spin, ik, start:stop, :, :npw_k, :]
+        out.real[...] = value[..., 0]
+        # Real coefficients are stored with cplex_ug == 1.
+        out.imag[...] = value[..., 1] if self.cplex_ug == 2 else 0.0
+
+        return out
+
+
+def _prefetch_iter(tasks, read, buffers):
+    """
+    Generator calling ``read(task, buf)`` for each task in a background thread.
+    The output of the previous call is processed while the next one is computed.
+    Buffers are recycled in round-robin fashion and a buffer is reused only
+    after the consumer has moved to the next item.
+    The thread is joined when the generator is exhausted or closed.
+    """
+    from threading import Thread, Event
+    try:
+        from Queue import Queue # py2k
+    except ImportError:
+        from queue import Queue # py3k
+
+    free_q, data_q, stop = Queue(), Queue(), Event()
+    for buf in buffers:
+        free_q.put(buf)
+
+    def worker():
+        try:
+            for task in tasks:
+                buf = free_q.get()
+                if stop.is_set(): return
+                data_q.put((buf, read(task, buf), None))
+        except Exception as exc:
+            data_q.put((None, None, exc))
+
+    t = Thread(target=worker)
+    t.daemon = True
+    t.start()
+
+    try:
+        for i in range(len(tasks)):
+            buf, item, exc = data_q.get()
+            if exc is not None: raise exc
+            yield item
+            free_q.put(buf)
+    finally:
+        # Unblock the worker if the consumer stops before the end and wait
+        # for the completion of the current read so that the file can be safely closed.
+        stop.set()
+        for buf in buffers:
+            free_q.put(buf)
+        t.join()
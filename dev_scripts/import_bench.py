@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+"""
+Benchmark the startup time of abipy: time needed to import abipy.abilab and to open
+a GSR file with abiopen in a fresh interpreter. Each measurement is repeated in a new process
+and the best time is reported. The script returns a non-zero exit status if the best times
+exceed the thresholds or if heavy modules are imported, so that it can be used to detect regressions.
+"""
+from __future__ import print_function, division, unicode_literals, absolute_import
+
+import sys
+import argparse
+import subprocess
+
+from tabulate import tabulate
+
+# Modules that should not be imported by `from abipy import abilab` followed by abiopen of a GSR file.
+HEAVY_MODULES = ["abipy.dfpt", "abipy.eph", "abipy.wannier90", "abipy.electrons.lobster",
+                 "abipy.abio.abivars_db", "abipy.abio.factories", "abipy.abio.inputs"]
+
+SCRIPT = """\
+import sys, time
+start = time.time()
+from abipy import abilab
+import_time = time.time() - start
+with abilab.abiopen(%r) as gsr:
+    gsr.energy
+total_time = time.time() - start
+heavy = [m for m in sys.modules if any(m == h or m.startswith(h + ".") for h in %r)]
+print(import_time, total_time, ",".join(heavy))
+"""
+
+
+def run_once(filepath):
+    """Run the script in a new interpreter. Return (import_time, total_time, list_of_heavy_modules)."""
+    out = subprocess.check_output([sys.executable, "-c", SCRIPT % (filepath, HEAVY_MODULES)])
+    tokens = out.decode("utf-8").split()
+    return float(tokens[0]), float(tokens[1]), tokens[2].split(",") if len(tokens) > 2 else []
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", "--nrun", type=int, default=5, help="Number of runs.")
+    parser.add_argument("--max-import-time", type=float, default=1.0,
+                        help="Max time (s) for `from abipy import abilab`.")
+    parser.add_argument("--max-total-time", type=float, default=10.0,
+                        help="Max time (s) for the import followed by abiopen of a GSR file.")
+    options = parser.parse_args()
+
+    import abipy.data as abidata
+    filepath = abidata.ref_file("si_scf_GSR.nc")
+
+    rows, heavy = [], set()
+    for irun in range(options.nrun):
+        import_time, total_time, loaded = run_once(filepath)
+        rows.append([irun, import_time, total_time])
+        heavy.update(loaded)
+
+    print(tabulate(rows, headers=["run", "import_time (s)", "total_time (s)"], floatfmt=".3f"))
+    best_import, best_total = min(r[1] for r in rows), min(r[2] for r in rows)
+    print("\nBest import time: %.3f (s), best total time: %.3f (s)" % (best_import, best_total))
+
+    retcode = 0
+    if heavy:
+        print("Heavy modules imported by abiopen:", sorted(heavy))
+        retcode += 1
+    if best_import > options.max_import_time:
+        print("Import time %.3f exceeds %.3f (s)" % (best_import, options.max_import_time))
+        retcode += 1
+    if best_total > options.max_total_time:
+        print("Total time %.3f exceeds %.3f (s)" % (best_total, options.max_total_time))
+        retcode += 1
+
+    return retcode
+
+
+if __name__ == "__main__":
+    sys.exit(main())
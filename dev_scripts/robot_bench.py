@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+"""
+Benchmark the construction of a GsrRobot from many GSR files.
+Compare the eager mode (all files opened by the constructor) with the lazy mode
+(files opened on first access, at most ``--max-open`` files open at the same time)
+and with a refresh of the results store written by ``Robot.export_results``
+(lazy files are not opened if their rows are still valid).
+"""
+from __future__ import print_function, division, unicode_literals, absolute_import
+
+import sys
+import os
+import time
+import shutil
+import tempfile
+import argparse
+
+from tabulate import tabulate
+
+
+def best_time(func, nrun):
+    """Call func nrun times. Return the best wall-time in seconds."""
+    times = []
+    for i in range(nrun):
+        start = time.time()
+        func()
+        times.append(time.time() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-f", "--nfiles", type=int, default=100, help="Number of GSR files.")
+    parser.add_argument("-n", "--nrun", type=int, default=3, help="Number of runs.")
+    parser.add_argument("--max-open", type=int, default=10,
+                        help="Max number of files kept open at the same time in lazy mode.")
+    options = parser.parse_args()
+
+    from abipy import abilab
+    import abipy.data as abidata
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        src = abidata.ref_file("si_scf_GSR.nc")
+        filepaths = []
+        for i in range(options.nfiles):
+            filepaths.append(os.path.join(tmpdir, "f%d_GSR.nc" % i))
+            shutil.copy(src, filepaths[-1])
+        store = os.path.join(tmpdir, "results.h5")
+
+        def eager_open():
+            with abilab.GsrRobot.from_files(filepaths) as robot:
+                return len(robot)
+
+        def eager_dataframe():
+            with abilab.GsrRobot.from_files(filepaths) as robot:
+                return robot.get_dataframe(with_geo=False)
+
+        def lazy_open():
+            with abilab.GsrRobot.from_files(filepaths, lazy=True, max_open=options.max_open) as robot:
+                return len(robot)
+
+        def lazy_dataframe():
+            with abilab.GsrRobot.from_files(filepaths, lazy=True, max_open=options.max_open) as robot:
+                return robot.get_dataframe(with_geo=False)
+
+        def lazy_refresh():
+            with abilab.GsrRobot.from_files(filepaths, lazy=True, max_open=options.max_open) as robot:
+                return robot.export_results(store, with_geo=False)
+
+        # Write the store so that lazy_refresh only reads it.
+        lazy_refresh()
+
+        rows = []
+        ref = None
+        for name, func in [("eager", eager_open), ("eager + get_dataframe", eager_dataframe),
+                           ("lazy", lazy_open), ("lazy + get_dataframe", lazy_dataframe),
+                           ("lazy + export_results refresh", lazy_refresh)]:
+            t = best_time(func, options.nrun)
+            if ref is None: ref = t
+            rows.append([name, t, ref / t])
+
+        print("nfiles: %d, max_open: %d\n" % (options.nfiles, options.max_open))
+        print(tabulate(rows, headers=["mode", "best time (s)", "speedup wrt eager"], floatfmt=".3f"))
+
+    finally:
+        shutil.rmtree(tmpdir)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+"""
+Benchmark the construction of the SKW interpolator (fit time as a function of nkpt and lpratio).
+Energies are obtained from a nearest-neighbour tight-binding model for the fcc lattice
+so that the script does not require external files.
+"""
+from __future__ import print_function, division, unicode_literals, absolute_import
+
+import sys
+import time
+import argparse
+import numpy as np
+
+from tabulate import tabulate
+from abipy.core.skw import SkwInterpolator
+
+
+def fcc_model(ngkpt, nband):
+    """
+    Return (cell, symrel, ibz, eigens) for a fcc lattice (Si) sampled with a Gamma-centered `ngkpt` mesh.
+    """
+    import spglib
+    a = 5.43
+    lattice = 0.5 * a * np.array([[0, 1, 1], [1, 0, 1], [1, 1, 0]], dtype=np.float)
+    cell = (lattice, [[0, 0, 0], [0.25, 0.25, 0.25]], [14, 14])
+    symrel = spglib.get_symmetry(cell)["rotations"]
+
+    mapping, grid = spglib.get_ir_reciprocal_mesh(ngkpt, cell, is_shift=[0, 0, 0])
+    ibz = grid[np.unique(mapping)] / np.asarray(ngkpt, dtype=np.float)
+
+    # Nearest-neighbour vectors in reduced coordinates.
+    nn = np.array([[1, 0, 0], [0, 1, 0], [0, 0, 1], [1, -1, 0], [1, 0, -1], [0, 1, -1]])
+    nn = np.concatenate((nn, -nn))
+    tb = np.cos(2 * np.pi * np.matmul(ibz, nn.T)).sum(axis=1)
+    eigens = np.array([2.0 * band + (1.0 + 0.1 * band) * tb for band in range(nband)]).T
+
+    return cell, symrel, ibz, eigens[None, :, :]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", "--ngkpts", type=int, nargs="+", default=[8, 12, 16, 24],
+                        help="Divisions of the (cubic) k-meshes used to generate the ab-initio IBZ.")
+    parser.add_argument("-l", "--lpratios", type=int, nargs="+", default=[5, 10],
+                        help="List of lpratio values.")
+    parser.add_argument("-b", "--nband", type=int, default=8, help="Number of bands.")
+    parser.add_argument("-s", "--single-precision", action="store_true", default=False,
+                        help="Store star functions and coefficients in single precision.")
+    parser.add_argument("-o", "--output", default=None, help="Save results to file in CSV format.")
+    options = parser.parse_args()
+
+    rows = []
+    for ndiv in options.ngkpts:
+        cell, symrel, ibz, eigens = fcc_model(3 * [ndiv], options.nband)
+        for lpratio in options.lpratios:
+            start = time.time()
+            skw = SkwInterpolator(lpratio, ibz, eigens, 0.0, 8, cell, symrel, True,
+                                  single_precision=options.single_precision, verbose=0)
+            fit_time = time.time() - start
+
+            start = time.time()
+            skw.interp_kpts(np.random.rand(10000, 3))
+            interp_time = time.time() - start
+            rows.append([ndiv, len(ibz), lpratio, skw.nr, fit_time, interp_time, skw.mae])
+
+    headers = ["ngkpt", "nkpt", "lpratio", "nr", "fit_time (s)", "interp_10k (s)", "mae (meV)"]
+    print(tabulate(rows, headers=headers, floatfmt=".3f"))
+
+    if options.output is not None:
+        import pandas as pd
+        pd.DataFrame(rows, columns=headers).to_csv(options.output, index=False)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
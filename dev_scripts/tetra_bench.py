@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+"""
+Compare the convergence of the electron DOS computed with the linear tetrahedron method and
+with gaussian broadening as a function of the k-mesh. Energies are obtained with the SKW
+interpolation of the Si band structure stored in the GSR file. The reference DOS is computed
+with the tetrahedron method on a dense k-mesh.
+"""
+from __future__ import print_function, division, unicode_literals, absolute_import
+
+import sys
+import time
+import argparse
+import numpy as np
+
+from tabulate import tabulate
+from abipy.core.skw import SkwInterpolator
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", "--ngkpts", type=int, nargs="+", default=[8, 12, 16, 24, 32],
+                        help="Divisions of the (cubic) k-meshes used to compute the DOS.")
+    parser.add_argument("-r", "--ref-ngkpt", type=int, default=48, help="Divisions of the k-mesh used for the reference DOS.")
+    parser.add_argument("-w", "--width", type=float, default=0.2, help="Gaussian broadening in eV.")
+    parser.add_argument("-l", "--lpratio", type=int, default=5, help="lpratio used for the SKW interpolation.")
+    parser.add_argument("-o", "--output", default=None, help="Save results to file in CSV format.")
+    options = parser.parse_args()
+
+    import abipy.data as abidata
+    from abipy.abilab import abiopen
+    with abiopen(abidata.ref_file("si_scf_GSR.nc")) as gsr:
+        structure, ebands = gsr.structure, gsr.ebands
+        cell = (structure.lattice.matrix, structure.frac_coords, structure.atomic_numbers)
+        abispg = structure.abi_spacegroup
+        fm_symrel = [s for (s, afm) in zip(abispg.symrel, abispg.symafm) if afm == 1]
+        skw = SkwInterpolator(options.lpratio, ebands.kpoints.frac_coords, ebands.eigens, ebands.fermie,
+                              ebands.nelect, cell, fm_symrel, True, verbose=0)
+
+    wmesh = np.arange(ebands.eigens.min() - 1, ebands.eigens.max() + 1, step=0.02)
+    ref = skw.get_edos(3 * [options.ref_ngkpt], method="tetra", wmesh=wmesh).values[0]
+
+    rows = []
+    for ndiv in options.ngkpts:
+        row = [ndiv]
+        for method in ("tetra", "gaussian"):
+            start = time.time()
+            edos = skw.get_edos(3 * [ndiv], method=method, width=options.width, wmesh=wmesh)
+            row.extend([np.trapz(np.abs(edos.values[0] - ref), x=wmesh), time.time() - start])
+        rows.append(row)
+
+    headers = ["ngkpt", "tetra_L1", "tetra_time (s)", "gauss_L1", "gauss_time (s)"]
+    print(tabulate(rows, headers=headers, floatfmt=".3f"))
+
+    if options.output is not None:
+        import pandas as pd
+        pd.DataFrame(rows, columns=headers).to_csv(options.output, index=False)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())